@@ -0,0 +1,135 @@
+"""
+@@@ Name  : Frame Recorder
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+@@@ MCU   : STM32H743
+"""
+
+"""
+Remark:
+1. Records raw QVGA RGB565 frames with timestamps into a frame log
+   (format in host/frame_log.py) for tuning and benchmarking on the host.
+2. record_to_sd = True  -> written to record_path on the SD card.
+   record_to_sd = False -> streamed over USB, store it on the host with
+   "python -m host.frame_log capture /dev/ttyACM0 out.flog".
+3. Each record is a 16 byte head (FREC, index, ticks_ms, exposure_us)
+   followed by the frame buffer as it is in memory (little endian RGB565).
+4. record_blobs = True (SD card only) also writes the find_blobs() result of
+   every frame to blob_path, to validate host.blob_engine against the camera:
+   "python -m host.blob_engine validate frames.flog frames.blobs.jsonl"
+"""
+
+import sensor, image, time
+import pyb
+import ustruct
+import ujson
+
+#System wakeup GPIO
+ready = pyb.Pin("P2",pyb.Pin.OUT_PP)
+ready.high()
+
+#Camera sensor setup (same as the classifiers)
+sensor.reset()
+sensor.set_pixformat(sensor.RGB565)
+sensor.set_framesize(sensor.QVGA)
+sensor.skip_frames(time = 2000)
+
+#FPS Clock
+clock = time.clock()
+
+#Recording Control Variables
+record_to_sd = True               # SD card (False -> USB virtual COM port)
+record_path = "/sd/frames.flog"   # Output file on the SD card
+max_frames = 600                  # Frames to record (0 -> until reset)
+frame_interval_ms = 0             # Minimum time between two records
+metadata = {"script":"frame_recorder.py","rotation":[False,False,False]}
+
+#Blob sidecar (validation of host.blob_engine)
+record_blobs = False
+blob_path = "/sd/frames.blobs.jsonl"
+blob_thresholds = [(44, 100, 70, -124, 28, 80)]
+blob_rois = [(22,84,38,30),(96,84,38,30),(172,84,38,30),(250,84,38,30)]
+if record_blobs:
+    metadata["blob_thresholds"] = blob_thresholds
+    metadata["blob_rois"] = blob_rois
+    metadata["blob_options"] = {"pixels_threshold":1,"area_threshold":1,"merge":True}
+
+#Frame log header
+log_version = 1
+log_header_size = 512
+log_pixformat = 2                 # 1 = grayscale, 2 = RGB565
+log_byte_order = 0                # 0 = little endian
+frame_w,frame_h = sensor.width(),sensor.height()
+frame_bytes = frame_w*frame_h*2
+record_head = bytearray(16)
+record_size = len(record_head)+frame_bytes
+
+log_header = bytearray(log_header_size)
+ustruct.pack_into("<8sHHHHBBHII",log_header,0,b"OMVFLOG1",log_version,log_header_size, \
+                  frame_w,frame_h,log_pixformat,log_byte_order,0,record_size,frame_bytes)
+text = ujson.dumps(metadata)
+log_header[28:28+len(text)] = text.encode()
+
+#Output stream
+if record_to_sd:
+    out = open(record_path,"wb")
+else:
+    out = pyb.USB_VCP()
+    out.setinterrupt(-1)   # Raw bytes, no Ctrl-C handling
+if record_blobs:
+    blob_out = open(blob_path,"w")
+
+#Recording LED -> RED
+record_led = pyb.LED(1)
+frame_index = 0
+last_ms = 0
+
+
+#Capture one frame and append its record
+def step():
+    global frame_index,last_ms
+
+    clock.tick()
+    img = sensor.snapshot()
+    now = time.ticks_ms()
+    if(frame_interval_ms and time.ticks_diff(now,last_ms) < frame_interval_ms):
+        return img
+    last_ms = now
+
+    ustruct.pack_into("<4sIII",record_head,0,b"FREC",frame_index,now & 0xFFFFFFFF, \
+                      sensor.get_exposure_us())
+    out.write(record_head)
+    out.write(img.bytearray())
+
+    if record_blobs:
+        rois = []
+        for roi in blob_rois:
+            blobs = []
+            for blob in img.find_blobs(blob_thresholds,roi=roi,pixels_threshold=1, \
+                                       area_threshold=1,merge=True):
+                blobs.append([blob.x(),blob.y(),blob.w(),blob.h(),blob.pixels(), \
+                              blob.cx(),blob.cy(),blob.code()])
+            rois.append(blobs)
+        blob_out.write(ujson.dumps({"frame":frame_index,"blobs":rois}))
+        blob_out.write("\n")
+    frame_index += 1
+    record_led.toggle()
+    return img
+
+
+#Capture and Loop
+def main():
+    ready.low()
+    out.write(log_header)
+    while(max_frames == 0 or frame_index < max_frames):
+        step()
+    if record_to_sd:
+        out.close()
+    if record_blobs:
+        blob_out.close()
+    record_led.off()
+    print("Recorded {} frames, {:.1f} FPS".format(frame_index,clock.fps()))
+
+
+if __name__ == "__main__":
+    main()
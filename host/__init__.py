@@ -0,0 +1,5 @@
+"""
+@@@ Name  : Host-side tools for the COVID-19 Tester
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
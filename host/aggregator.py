@@ -0,0 +1,385 @@
+"""
+@@@ Name  : Multi-Camera Aggregator (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. One asyncio process reads the UART streams of a whole bench of testers
+   (host.uart_decoder.SerialReader per port, ASCII packages or binary frames)
+   and keeps the latest reading of every device in one table. The number
+   of values of an ASCII reading is learned from the stream unless --wells
+   is given.
+2. Every device has a bounded queue between the decoder and the table
+   update. When the queue is full the port is paused (no more reads, the
+   stream waits in the kernel tty buffer) and resumed once half of it is
+   drained; if a single read still overflows it, the oldest reading is
+   dropped and counted.
+3. The table is published as JSON lines on a local socket (Unix or TCP):
+   a full snapshot on connect, then every publish interval the devices
+   that changed. Clients that do not keep up are skipped and get a full
+   snapshot once their buffer is drained.
+4. Unplugged devices are marked offline and reopened every retry seconds.
+5. --store DIR also appends every reading to a host.result_store
+   directory, one record per well with the values in the --metric column
+   (blob_area for quad_sample_classifier.py, intensity for
+   quad_sample_intensity.py), flushed every publish interval. Binary frames
+   with several values per well (quad_sample_pipeline.py) take one column
+   per value, e.g. --metric blob_area,intensity ("-" skips a value, extra
+   values are dropped, call takes the early decision call code).
+6. --simulate N runs N simulated testers on pty pairs in the same process
+   (even devices binary frames, odd devices ASCII packages) and reports
+   throughput, drops and event loop lag.
+
+Usage:
+    python -m host.aggregator /dev/ttyACM0 /dev/ttyACM1 --unix /tmp/omv_aggregator.sock
+    python -m host.aggregator /dev/ttyACM0 --store results/ --metric intensity
+    python -m host.aggregator /dev/ttyACM0 --store results/ --metric blob_area,intensity
+    python -m host.aggregator --simulate 128 --period 0.25 --duration 10
+    python -m host.aggregator --watch /tmp/omv_aggregator.sock
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from .uart_decoder import FRAME_READING,PacketDecoder,SerialReader,encode_ascii,encode_frame, \
+                          open_pty_pair
+
+DEFAULT_SOCKET = "/tmp/omv_aggregator.sock"
+STORE_COLUMNS = ("blob_area","intensity","intensity_var","call","-")
+CALL_NAMES = ("none","positive","negative")      # result_store.CALLS, device call codes
+
+
+class Device:
+    """
+    One tester: serial reader -> bounded queue -> aggregator table.
+    """
+
+    def __init__(self,path,baudrate=115200,name=None,queue_size=64,ascii_wells=None,retry=2.0):
+        self.path = path
+        self.baudrate = baudrate
+        self.name = name or os.path.basename(path)
+        self.queue_size = queue_size
+        self.ascii_wells = ascii_wells
+        self.retry = retry
+        self.reader = None
+        self.queue = None
+        self.paused = False
+
+        #Counters
+        self.pauses = 0
+        self.overflows = 0
+
+    def _on_frame(self,reader,frame):
+        queue = self.queue
+        if queue.full():
+            queue.get_nowait()
+            self.overflows += 1
+        queue.put_nowait((time.time(),frame))
+        if(not self.paused and queue.qsize() >= self.queue_size):
+            reader.pause()
+            self.paused = True
+            self.pauses += 1
+
+    def _on_closed(self,_):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.overflows += 1
+        self.queue.put_nowait(None)
+
+    async def run(self,aggregator):
+        while True:
+            self.queue = asyncio.Queue(self.queue_size)
+            self.paused = False
+            self.reader = SerialReader(self.path,self.baudrate,PacketDecoder(self.ascii_wells),
+                                       self._on_frame,self.name)
+            try:
+                await self.reader.start()
+            except OSError:
+                aggregator.set_online(self,False)
+                await asyncio.sleep(self.retry)
+                continue
+            aggregator.set_online(self,True)
+            self.reader.closed.add_done_callback(self._on_closed)
+            await self._drain(aggregator)
+            aggregator.set_online(self,False)
+            await asyncio.sleep(self.retry)
+
+    async def _drain(self,aggregator):
+        queue = self.queue
+        low = self.queue_size//2
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            aggregator.update(self,*item)
+            if(self.paused and queue.qsize() <= low):
+                self.paused = False
+                self.reader.resume()
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+
+
+#Result store columns of the values of one well ("-" skips a value)
+def parse_metrics(metric):
+    names = tuple(name.strip() for name in metric.split(","))
+    for name in names:
+        if name not in STORE_COLUMNS:
+            raise ValueError("unknown metric column %r (expected %s)" % (name,", ".join(STORE_COLUMNS)))
+    return names
+
+
+class Aggregator:
+    """
+    Latest-state table of every device, published on a local socket.
+    """
+
+    def __init__(self,devices,interval=0.25,client_buffer=1 << 20,store=None,metric="blob_area"):
+        self.devices = devices
+        self.store = store
+        self.metrics = parse_metrics(metric)
+        self.interval = interval
+        self.client_buffer = client_buffer
+        self.table = {}
+        self.readings = 0
+        self._dirty = set()
+        self._clients = {}
+        for device in devices:
+            self.table[device.name] = {"path":device.path,"online":False,"t":None,"seq":None,
+                                       "values":None,"readings":0,"other_frames":0}
+
+    def set_online(self,device,online):
+        self.table[device.name]["online"] = online
+        self._dirty.add(device.name)
+
+    def update(self,device,t,frame):
+        state = self.table[device.name]
+        if(frame.type == FRAME_READING):
+            state["t"] = t
+            state["seq"] = frame.seq
+            state["values"] = frame.values
+            state["readings"] += 1
+            self.readings += 1
+            if self.store is not None:
+                n = max(1,len(frame.values)//max(1,frame.count))
+                for well in range(len(frame.values)//n):
+                    row = frame.values[well*n:(well+1)*n]
+                    columns = {name:value for name,value in zip(self.metrics,row) if name != "-"}
+                    if "call" in columns:
+                        columns["call"] = CALL_NAMES[columns["call"]] if columns["call"] < 3 else "none"
+                    self.store.append(t,device.name,well+1,seq=frame.seq,**columns)
+        else:
+            state["other_frames"] += 1
+        self._dirty.add(device.name)
+
+    #Counters of the decoder and the queue of every device
+    def stats(self):
+        out = {}
+        for device in self.devices:
+            d = device.reader.decoder if device.reader is not None else None
+            out[device.name] = {"crc_errors":d.crc_errors if d else 0,"resyncs":d.resyncs if d else 0,
+                                "dropped":d.dropped if d else 0,"pauses":device.pauses,
+                                "overflows":device.overflows}
+        return out
+
+    def _message(self,names):
+        return (json.dumps({"t":time.time(),"devices":{n:self.table[n] for n in names}}) + "\n").encode()
+
+    async def _client(self,reader,writer):
+        self._clients[writer] = False
+        writer.write(self._message(self.table))
+        try:
+            while(await reader.read(1024)):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            del self._clients[writer]
+            writer.close()
+
+    async def publish(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.store is not None:
+                self.store.flush()
+            if not self._dirty or not self._clients:
+                self._dirty.clear()
+                continue
+            delta = self._message(self._dirty)
+            full = None
+            self._dirty = set()
+            for writer,stale in self._clients.items():
+                if(writer.transport.get_write_buffer_size() > self.client_buffer):
+                    self._clients[writer] = True
+                elif stale:
+                    full = full or self._message(self.table)
+                    writer.write(full)
+                    self._clients[writer] = False
+                else:
+                    writer.write(delta)
+
+    async def serve(self,unix=None,tcp=None):
+        if tcp:
+            host,port = tcp.rsplit(":",1)
+            server = await asyncio.start_server(self._client,host,int(port))
+        else:
+            if os.path.exists(unix):
+                os.unlink(unix)
+            server = await asyncio.start_unix_server(self._client,unix)
+        tasks = [asyncio.ensure_future(device.run(self)) for device in self.devices]
+        tasks.append(asyncio.ensure_future(self.publish()))
+        return server,tasks
+
+
+#Event loop lag: how late a periodic sleep wakes up (s)
+async def loop_lag(samples,period=0.01):
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(period)
+        samples.append(loop.time()-t0-period)
+
+
+#One simulated tester writing a reading every period into a pty master
+async def simulate_device(master,index,period,wells,sent):
+    loop = asyncio.get_running_loop()
+    seq = 0
+    next_t = loop.time()
+    while True:
+        values = [(seq*7+index+k) % 1000 for k in range(wells)]
+        if(index & 1):
+            data = b"".join(encode_ascii(values))
+        else:
+            data = encode_frame(values,seq)
+        while data:
+            try:
+                data = data[os.write(master,data):]
+            except BlockingIOError:
+                await asyncio.sleep(0.001)
+        sent[index] += 1
+        seq += 1
+        next_t += period
+        await asyncio.sleep(max(0.0,next_t-loop.time()))
+
+
+async def simulate(n,period,duration,wells=4,queue_size=64,socket_path=DEFAULT_SOCKET):
+    ptys = [open_pty_pair() for _ in range(n)]
+    devices = [Device(path,name="sim%03d" % i,queue_size=queue_size,ascii_wells=wells)
+               for i,(_,_,path) in enumerate(ptys)]
+    aggregator = Aggregator(devices)
+    server,tasks = await aggregator.serve(unix=socket_path)
+    await asyncio.sleep(0.1)
+    for _,slave,_ in ptys:
+        os.close(slave)
+
+    sent = [0]*n
+    lag = []
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    tasks.append(asyncio.ensure_future(loop_lag(lag)))
+    tasks += [asyncio.ensure_future(simulate_device(master,i,period,wells,sent))
+              for i,(master,_,_) in enumerate(ptys)]
+    await asyncio.sleep(duration)
+    for task in tasks[-n:]:
+        task.cancel()
+    await asyncio.sleep(max(0.5,4*period))
+    dt = time.perf_counter()-t0
+    cpu = time.process_time()-cpu0
+
+    for task in tasks:
+        task.cancel()
+    for device in devices:
+        device.close()
+    for master,_,_ in ptys:
+        os.close(master)
+    server.close()
+
+    stats = aggregator.stats().values()
+    lag.sort()
+    print("devices:{} sent:{} received:{} -> {:.0f} readings/s".format(
+          n,sum(sent),aggregator.readings,aggregator.readings/dt))
+    print("dropped:{} crc_errors:{} pauses:{} overflows:{}".format(
+          sum(s["dropped"] for s in stats),sum(s["crc_errors"] for s in stats),
+          sum(s["pauses"] for s in stats),sum(s["overflows"] for s in stats)))
+    print("cpu:{:.1f}% loop lag p50:{:.2f}ms p99:{:.2f}ms max:{:.2f}ms".format(
+          100*cpu/dt,1000*lag[len(lag)//2],1000*lag[int(len(lag)*0.99)],1000*lag[-1]))
+
+
+#Print the table published by a running aggregator
+async def watch(path):
+    if ":" in path:
+        host,port = path.rsplit(":",1)
+        reader,_ = await asyncio.open_connection(host,int(port))
+    else:
+        reader,_ = await asyncio.open_unix_connection(path,limit=1 << 24)
+    table = {}
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        table.update(json.loads(line)["devices"])
+        online = sum(1 for s in table.values() if s["online"])
+        print("devices:{} online:{}".format(len(table),online))
+        for name,state in sorted(table.items()):
+            print("  {:<12} {:<8} #{} {}".format(name,"online" if state["online"] else "offline",
+                                               state["seq"],state["values"]))
+
+
+async def run(ports,baudrate,unix,tcp,interval,queue_size,wells,store=None,metric="blob_area"):
+    devices = [Device(port,baudrate,queue_size=queue_size,ascii_wells=wells) for port in ports]
+    writer = None
+    if store:
+        from .result_store import ResultWriter
+        writer = ResultWriter(store)
+    aggregator = Aggregator(devices,interval,store=writer,metric=metric)
+    server,tasks = await aggregator.serve(unix=unix,tcp=tcp)
+    try:
+        async with server:
+            await asyncio.gather(*tasks)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate the UART streams of many testers")
+    parser.add_argument("ports",nargs="*",help="serial devices")
+    parser.add_argument("--baud",type=int,default=115200)
+    parser.add_argument("--unix",default=DEFAULT_SOCKET,help="Unix socket to publish on")
+    parser.add_argument("--tcp",metavar="HOST:PORT",help="publish on TCP instead")
+    parser.add_argument("--interval",type=float,default=0.25,help="publish interval (s)")
+    parser.add_argument("--queue-size",type=int,default=64,help="readings queued per device")
+    parser.add_argument("--wells",type=int,
+                        help="values per ASCII reading (default: learned from the stream, 4 when simulating)")
+    parser.add_argument("--store",metavar="DIR",help="append the readings to a result store")
+    parser.add_argument("--metric",default="blob_area",
+                        help="result store column(s) of the values of a well, comma separated "
+                             "(blob_area, intensity, intensity_var, call, -)")
+    parser.add_argument("--simulate",type=int,metavar="N",help="N simulated testers on pty pairs")
+    parser.add_argument("--period",type=float,default=0.25,help="simulated reading period (s)")
+    parser.add_argument("--duration",type=float,default=10.0,help="simulation time (s)")
+    parser.add_argument("--watch",metavar="SOCKET",help="print the table of a running aggregator")
+    args = parser.parse_args()
+    try:
+        parse_metrics(args.metric)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.watch:
+        asyncio.run(watch(args.watch))
+    elif args.simulate:
+        asyncio.run(simulate(args.simulate,args.period,args.duration,args.wells or 4,args.queue_size,args.unix))
+    elif args.ports:
+        asyncio.run(run(args.ports,args.baud,args.unix,args.tcp,args.interval,args.queue_size,args.wells,
+                        args.store,args.metric))
+    else:
+        parser.error("ports, --simulate or --watch is required")
+
+
+if __name__ == "__main__":
+    main()
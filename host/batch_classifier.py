@@ -0,0 +1,218 @@
+"""
+@@@ Name  : Batch Classifier (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Re-scores archives of captures with host.classify (same ROI, LAB
+   threshold blob logic and intensity metric as the camera scripts).
+2. Inputs: directories / files of images (.npy, .rgb565, Pillow formats),
+   frame logs (.flog) and videos (OpenCV, optional dependency).
+3. Work is split into chunks of frames (paths or frame ranges), processed
+   by a multiprocessing pool; workers load their own frames so only the
+   small work descriptions and result rows cross process boundaries.
+4. Results are streamed to CSV (or Parquet with pyarrow) as chunks finish.
+
+Usage:
+    python -m host.batch_classifier archive/ -o results.csv --workers 8
+    python -m host.batch_classifier runs/*.flog -o results.parquet --mode quad --config thresh.json
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from . import classify
+from .emulator import frame_paths,load_frame
+
+VIDEO_EXTS = (".mp4",".avi",".mkv",".mov",".mjpeg")
+FIELDS = {
+    "quad":["source","frame","well","blob_area","intensity","intensity_var","call"],
+    "single":["source","frame","well","blob_area","p_area","n_area","call"],
+}
+
+_config = None
+_mode = None
+
+
+def _init_worker(mode,config):
+    global _mode,_config
+    _mode,_config = mode,config
+
+
+#Number of frames of a frame log / video
+def _frame_count(path):
+    if path.endswith(".flog"):
+        from .frame_log import FrameLog
+        log = FrameLog(path)
+        n = len(log)
+        log.close()
+        return n
+    import cv2
+    cap = cv2.VideoCapture(path)
+    n = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return n
+
+
+#Video frame (BGR) -> QVGA RGB565
+def _bgr_to_rgb565(bgr):
+    import cv2
+    from .colorspace import rgb888_to_rgb565
+    bgr = cv2.resize(bgr,(320,240),interpolation=cv2.INTER_AREA)
+    return rgb888_to_rgb565(bgr[:,:,2],bgr[:,:,1],bgr[:,:,0])
+
+
+#Frames of one work unit -> (source, frame index, frame)
+def _unit_frames(unit):
+    kind = unit[0]
+    if(kind == "files"):
+        #Frame index = position in the list of image files
+        _,files,start = unit
+        for i,path in enumerate(files,start):
+            yield path,i,load_frame(path)
+    elif(kind == "flog"):
+        from .frame_log import FrameLog
+        _,path,start,stop = unit
+        log = FrameLog(path)
+        for i in range(start,stop):
+            yield path,i,log[i]
+        log.close()
+    else:
+        import cv2
+        _,path,start,stop = unit
+        cap = cv2.VideoCapture(path)
+        cap.set(cv2.CAP_PROP_POS_FRAMES,start)
+        for i in range(start,stop):
+            ok,bgr = cap.read()
+            if not ok:
+                break
+            yield path,i,_bgr_to_rgb565(bgr)
+        cap.release()
+
+
+#Worker: classify every frame of a unit
+def _run_unit(unit):
+    fn = classify.classify_quad if _mode == "quad" else classify.classify_single
+    rows = []
+    try:
+        for source,index,frame in _unit_frames(unit):
+            for row in fn(np.asarray(frame),_config):
+                row["source"] = source
+                row["frame"] = index
+                rows.append(row)
+    except SystemExit as e:
+        #SystemExit would end a pool worker without a result and stall the pool
+        raise RuntimeError(str(e)) from None
+    return rows
+
+
+#Split the inputs into chunks of about chunk_size frames
+def make_units(paths,chunk_size):
+    units = []
+    files = []
+    for path in paths:
+        lower = path.lower()
+        if lower.endswith(".flog") or lower.endswith(VIDEO_EXTS):
+            kind = "flog" if lower.endswith(".flog") else "video"
+            n = _frame_count(path)
+            for start in range(0,n,chunk_size):
+                units.append((kind,path,start,min(n,start+chunk_size)))
+        else:
+            files.append(path)
+    for start in range(0,len(files),chunk_size):
+        units.append(("files",files[start:start+chunk_size],start))
+    return units
+
+
+class CsvSink:
+
+    def __init__(self,path,fields):
+        self._f = open(path,"w",newline="") if path != "-" else sys.stdout
+        self._w = csv.DictWriter(self._f,fieldnames=fields,extrasaction="ignore")
+        self._w.writeheader()
+
+    def write(self,rows):
+        self._w.writerows(rows)
+
+    def close(self):
+        if self._f is not sys.stdout:
+            self._f.close()
+
+
+class ParquetSink:
+
+    def __init__(self,path,fields):
+        import pyarrow
+        import pyarrow.parquet
+        self._pa = pyarrow
+        self._fields = fields
+        self._writer = None
+        self._path = path
+
+    def write(self,rows):
+        if not rows:
+            return
+        table = self._pa.table({k:[r.get(k) for r in rows] for k in self._fields})
+        if self._writer is None:
+            import pyarrow.parquet
+            self._writer = pyarrow.parquet.ParquetWriter(self._path,table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def run(paths,out,mode="quad",config=None,workers=None,chunk_size=64):
+    config = config or classify.load_config(mode)
+    units = make_units(paths,chunk_size)
+    fields = FIELDS[mode]
+    sink = ParquetSink(out,fields) if out.endswith(".parquet") else CsvSink(out,fields)
+    workers = workers or os.cpu_count()
+    frames = 0
+    t0 = time.perf_counter()
+    try:
+        if(workers == 1):
+            _init_worker(mode,config)
+            for rows in map(_run_unit,units):
+                sink.write(rows)
+                frames += len({(r["source"],r["frame"]) for r in rows})
+        else:
+            #Leaving the block terminates the workers, also on an exception
+            with multiprocessing.Pool(workers,initializer=_init_worker,initargs=(mode,config)) as pool:
+                for rows in pool.imap_unordered(_run_unit,units):
+                    sink.write(rows)
+                    frames += len({(r["source"],r["frame"]) for r in rows})
+    finally:
+        sink.close()
+    return frames,time.perf_counter()-t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score image/video archives offline")
+    parser.add_argument("inputs",nargs="+",help="files or directories")
+    parser.add_argument("-o","--out",default="-",help="output .csv/.parquet (default stdout CSV)")
+    parser.add_argument("--mode",choices=("quad","single"),default="quad")
+    parser.add_argument("--config",help="JSON file overriding the thresholds/ROIs")
+    parser.add_argument("--workers",type=int,help="processes (default: all cores)")
+    parser.add_argument("--chunk-size",type=int,default=64,help="frames per work unit")
+    args = parser.parse_args()
+
+    config = classify.load_config(args.mode,args.config)
+    try:
+        frames,dt = run(frame_paths(args.inputs),args.out,args.mode,config,args.workers,args.chunk_size)
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    print("frames:{} {:.1f}s -> {:.1f} frames/s".format(frames,dt,frames/dt if dt else 0),file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+@@@ Name  : Blob Engine (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. NumPy version of img.find_blobs() as used by the classifiers:
+   - threshold mask by lookup: every LAB threshold becomes a 65536 entry
+     boolean table indexed by the RGB565 pixel (256 entries for grayscale)
+   - 4-connected components from run-length encoded rows (one union-find
+     over overlapping runs of neighbouring rows)
+   - rect / pixels / centroid / rotation per blob from run moments (bincount)
+   - OpenMV filtering (pixels_threshold, area_threshold = w*h, threshold_cb)
+     before merging, merge of overlapping rects (expanded by margin) with
+     merge_cb, code OR and count sum
+2. find_blobs_rois() labels many ROIs in one pass: the ROI masks are stacked
+   into one canvas separated by empty rows, so components never cross ROIs.
+3. Thresholds are (Lmin, Lmax, Amin, Amax, Bmin, Bmax), swapped min/max are
+   accepted like on the camera; grayscale thresholds are (min, max).
+
+Usage:
+    python -m host.blob_engine bench --rois 96
+    python -m host.blob_engine validate frames.flog frames.blobs.jsonl
+"""
+
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from .colorspace import lab_table
+
+_mask_tables = {}
+
+
+class Blob:
+    """
+    Same accessors as the OpenMV blob object; blob[4] is the pixel count.
+    """
+
+    __slots__ = ("_t",)
+
+    def __init__(self,x,y,w,h,pixels,cx,cy,rotation,code,count):
+        self._t = (x,y,w,h,pixels,cx,cy,rotation,code,count)
+
+    def __getitem__(self,i):
+        return self._t[i]
+
+    def __len__(self):
+        return 10
+
+    def __eq__(self,other):
+        return isinstance(other,Blob) and self._t == other._t
+
+    def __repr__(self):
+        return "{{\"x\":{}, \"y\":{}, \"w\":{}, \"h\":{}, \"pixels\":{}, \"cx\":{}, \"cy\":{}, " \
+               "\"rotation\":{:f}, \"code\":{}, \"count\":{}}}".format(*self._t)
+
+    def rect(self):
+        return self._t[0:4]
+
+    def x(self):
+        return self._t[0]
+
+    def y(self):
+        return self._t[1]
+
+    def w(self):
+        return self._t[2]
+
+    def h(self):
+        return self._t[3]
+
+    def pixels(self):
+        return self._t[4]
+
+    def cx(self):
+        return self._t[5]
+
+    def cy(self):
+        return self._t[6]
+
+    def rotation(self):
+        return self._t[7]
+
+    def code(self):
+        return self._t[8]
+
+    def count(self):
+        return self._t[9]
+
+    def area(self):
+        return self._t[2]*self._t[3]
+
+    def density(self):
+        return self._t[4]/self.area()
+
+
+#Boolean lookup table of one threshold (65536 entries RGB565, 256 grayscale)
+def threshold_table(threshold,grayscale=False,invert=False):
+    key = (tuple(threshold),grayscale,invert)
+    table = _mask_tables.get(key)
+    if table is not None:
+        return table
+    if grayscale:
+        channels = (np.arange(256),)
+    else:
+        channels = lab_table()
+    table = np.ones(len(channels[0]),dtype=bool)
+    for c in range(len(channels)):
+        if(2*c+1 < len(threshold)):
+            lo,hi = sorted((threshold[2*c],threshold[2*c+1]))
+            table &= (channels[c] >= lo) & (channels[c] <= hi)
+    if invert:
+        table = ~table
+    _mask_tables[key] = table
+    return table
+
+
+#Run-length encoding of a mask -> (y, x0, x1) with x1 exclusive, row-major
+def _runs(mask):
+    h,w = mask.shape
+    padded = np.zeros((h,w+2),dtype=np.int8)
+    padded[:,1:-1] = mask
+    d = np.diff(padded,axis=1)
+    ys,x0 = np.nonzero(d == 1)
+    _,x1 = np.nonzero(d == -1)
+    return ys,x0,x1
+
+
+#Component id of every run (4-connectivity), ids in scan order
+def _label_runs(ys,x0,x1,width):
+    n = len(ys)
+    stride = width+1
+    start_keys = ys*stride + x0
+    end_keys = ys*stride + x1
+
+    #Runs of the row above overlapping each run: index range [lo, hi]
+    above = (ys-1)*stride
+    lo = np.searchsorted(end_keys,above+x0,side="right")
+    hi = np.searchsorted(start_keys,above+x1,side="left")-1
+    counts = np.maximum(hi-lo+1,0)
+    b = np.repeat(np.arange(n),counts)
+    offsets = np.arange(len(b)) - np.repeat(np.cumsum(counts)-counts,counts)
+    a = np.repeat(lo,counts) + offsets
+
+    #Hook and compress until every edge joins one root
+    labels = np.arange(n)
+    while len(a):
+        la,lb = labels[a],labels[b]
+        diff = la != lb
+        if not diff.any():
+            break
+        la,lb = la[diff],lb[diff]
+        m = np.minimum(la,lb)
+        np.minimum.at(labels,la,m)
+        np.minimum.at(labels,lb,m)
+        while True:
+            nxt = labels[labels]
+            if np.array_equal(nxt,labels):
+                break
+            labels = nxt
+    roots,comp = np.unique(labels,return_inverse=True)
+    return comp,len(roots)
+
+
+#Per component moments: x0 y0 x1 y1 n sx sy sxx syy sxy (float64 arrays)
+def _moments(ys,x0,x1,comp,count):
+    length = (x1-x0).astype(np.float64)
+    yf = ys.astype(np.float64)
+    sx_run = (x0+x1-1)*length/2.0
+    last,first = (x1-1).astype(np.float64),(x0-1).astype(np.float64)
+    sxx_run = (last*(last+1)*(2*last+1) - first*(first+1)*(2*first+1))/6.0
+
+    def acc(w):
+        return np.bincount(comp,weights=w,minlength=count)
+
+    bx0 = np.full(count,np.iinfo(np.int64).max)
+    by0 = np.full(count,np.iinfo(np.int64).max)
+    bx1 = np.zeros(count,dtype=np.int64)
+    by1 = np.zeros(count,dtype=np.int64)
+    np.minimum.at(bx0,comp,x0)
+    np.minimum.at(by0,comp,ys)
+    np.maximum.at(bx1,comp,x1)
+    np.maximum.at(by1,comp,ys+1)
+    return (bx0,by0,bx1,by1,acc(length),acc(sx_run),acc(yf*length),acc(sxx_run),
+            acc(yf*yf*length),acc(yf*sx_run))
+
+
+#Blob from accumulated moments
+def _make_blob(x0,y0,x1,y1,n,sx,sy,sxx,syy,sxy,code,count):
+    mx,my = sx/n,sy/n
+    a = sxx/n - mx*mx
+    b = sxy/n - mx*my
+    c = syy/n - my*my
+    rotation = (0.5*math.atan2(2*b,a-c)) % math.pi
+    return Blob(int(x0),int(y0),int(x1-x0),int(y1-y0),int(n),int(math.floor(mx+0.5)),
+                int(math.floor(my+0.5)),rotation,code,count)
+
+
+#Merge blobs whose rects overlap after expanding by margin (OpenMV order)
+def _merge(items,margin,merge_cb):
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for m in items:
+            for i,o in enumerate(out):
+                if((o[0]-margin < m[2]) and (m[0] < o[2]+margin) and \
+                   (o[1]-margin < m[3]) and (m[1] < o[3]+margin)):
+                    if merge_cb is not None and not merge_cb(_make_blob(*o),_make_blob(*m)):
+                        continue
+                    out[i] = (min(o[0],m[0]),min(o[1],m[1]),max(o[2],m[2]),max(o[3],m[3]),
+                              o[4]+m[4],o[5]+m[5],o[6]+m[6],o[7]+m[7],o[8]+m[8],o[9]+m[9],
+                              o[10] | m[10],o[11]+m[11])
+                    merged = True
+                    break
+            else:
+                out.append(m)
+        items = out
+    return items
+
+
+#Normalize a roi to (x, y, w, h) inside the image
+def clip_roi(roi,width,height):
+    if roi is None:
+        return 0,0,width,height
+    x,y,w,h = roi
+    x0,y0 = max(0,x),max(0,y)
+    x1,y1 = min(width,x+w),min(height,y+h)
+    if(x1 <= x0 or y1 <= y0):
+        raise ValueError("roi {} is outside the image".format(roi))
+    return x0,y0,x1-x0,y1-y0
+
+
+def find_blobs_rois(pixels,thresholds,rois,invert=False,area_threshold=10,pixels_threshold=10, \
+                    merge=False,margin=0,threshold_cb=None,merge_cb=None):
+    """
+    pixels: 2D uint16 RGB565 or uint8 grayscale frame
+    rois  : list of (x, y, w, h)
+    Returns one list of Blobs per roi (frame coordinates), like calling
+    img.find_blobs(thresholds, roi=roi, ...) for every roi.
+    """
+    grayscale = pixels.dtype != np.uint16
+    H,W = pixels.shape
+    rois = [clip_roi(r,W,H) for r in rois]
+
+    #Stack every roi into one canvas, one empty row between rois
+    offsets = np.cumsum([0]+[h+1 for _,_,_,h in rois])
+    width = max(w for _,_,w,_ in rois)
+    row_roi = np.full(offsets[-1],-1,dtype=np.int64)
+    canvas = np.zeros((offsets[-1],width),dtype=pixels.dtype)
+    valid = np.zeros(canvas.shape,dtype=bool)
+    for k,(x,y,w,h) in enumerate(rois):
+        canvas[offsets[k]:offsets[k]+h,:w] = pixels[y:y+h,x:x+w]
+        valid[offsets[k]:offsets[k]+h,:w] = True
+        row_roi[offsets[k]:offsets[k]+h] = k
+    roi_dx = np.array([x for x,_,_,_ in rois],dtype=np.int64)
+    roi_dy = np.array([y for _,y,_,_ in rois],dtype=np.int64)-offsets[:-1]
+
+    found = [[] for _ in rois]
+    for index,threshold in enumerate(thresholds):
+        mask = threshold_table(threshold,grayscale,invert)[canvas] & valid
+        ys,x0,x1 = _runs(mask)
+        if not len(ys):
+            continue
+        comp,count = _label_runs(ys,x0,x1,width)
+        bx0,by0,bx1,by1,n,sx,sy,sxx,syy,sxy = _moments(ys,x0,x1,comp,count)
+
+        #Back to frame coordinates
+        k = row_roi[by0]
+        dx,dy = roi_dx[k],roi_dy[k]
+        bx0,bx1,by0,by1 = bx0+dx,bx1+dx,by0+dy,by1+dy
+        sxy = sxy + dx*sy + dy*sx + dx*dy*n
+        sxx = sxx + 2*dx*sx + dx*dx*n
+        syy = syy + 2*dy*sy + dy*dy*n
+        sx,sy = sx+dx*n,sy+dy*n
+
+        keep = (n >= pixels_threshold) & ((bx1-bx0)*(by1-by0) >= area_threshold)
+        code = 1 << index
+        for i in np.nonzero(keep)[0]:
+            item = (bx0[i],by0[i],bx1[i],by1[i],n[i],sx[i],sy[i],sxx[i],syy[i],sxy[i],code,1)
+            if threshold_cb is not None and not threshold_cb(_make_blob(*item)):
+                continue
+            found[k[i]].append(item)
+
+    result = []
+    for items in found:
+        if merge:
+            items = _merge(items,margin,merge_cb)
+        result.append([_make_blob(*item) for item in items])
+    return result
+
+
+#find_blobs() on a stack of precomputed threshold masks
+def find_blobs_masks(masks,area_threshold=10,pixels_threshold=10,merge=False,margin=0,code=1):
+    """
+    masks: (N, h, w) bool, one thresholded roi per entry
+    Returns one list of Blobs per mask (mask coordinates).
+    """
+    count_masks,h,w = masks.shape
+    canvas = np.zeros((count_masks,h+1,w),dtype=bool)
+    canvas[:,:h] = masks
+    ys,x0,x1 = _runs(canvas.reshape(-1,w))
+    found = [[] for _ in range(count_masks)]
+    if not len(ys):
+        return found
+    comp,count = _label_runs(ys,x0,x1,w)
+    bx0,by0,bx1,by1,n,sx,sy,sxx,syy,sxy = _moments(ys,x0,x1,comp,count)
+
+    #Back to mask coordinates
+    k = by0//(h+1)
+    dy = k*(h+1)
+    by0,by1 = by0-dy,by1-dy
+    sxy = sxy - dy*sx
+    syy = syy - 2*dy*sy + dy*dy*n
+    sy = sy - dy*n
+
+    keep = (n >= pixels_threshold) & ((bx1-bx0)*(by1-by0) >= area_threshold)
+    for i in np.nonzero(keep)[0]:
+        found[k[i]].append((bx0[i],by0[i],bx1[i],by1[i],n[i],sx[i],sy[i],sxx[i],syy[i],sxy[i],code,1))
+    result = []
+    for items in found:
+        if(merge and len(items) > 1):
+            items = _merge(items,margin,None)
+        result.append([_make_blob(*item) for item in items])
+    return result
+
+
+#img.find_blobs() on a pixel array
+def find_blobs(pixels,thresholds,invert=False,roi=None,x_stride=2,y_stride=1,area_threshold=10, \
+               pixels_threshold=10,merge=False,margin=0,threshold_cb=None,merge_cb=None):
+    return find_blobs_rois(pixels,thresholds,[roi],invert,area_threshold,pixels_threshold, \
+                           merge,margin,threshold_cb,merge_cb)[0]
+
+
+#Compare with the blobs recorded by frame_recorder.py (record_blobs = True)
+def validate(log_path,blobs_path,tolerance=1):
+    from .frame_log import FrameLog
+    log = FrameLog(log_path)
+    meta = log.metadata
+    thresholds = meta["blob_thresholds"]
+    rois = meta["blob_rois"]
+    options = meta.get("blob_options",{})
+    compared = exact = close = 0
+    with open(blobs_path) as f:
+        for line in f:
+            entry = json.loads(line)
+            host = find_blobs_rois(np.asarray(log[entry["frame"]]),thresholds,rois,**options)
+            for k,device in enumerate(entry["blobs"]):
+                mine = [list(b.rect())+[b.pixels(),b.cx(),b.cy(),b.code()] for b in host[k]]
+                compared += 1
+                if(mine == device):
+                    exact += 1
+                elif(len(mine) == len(device) and all(
+                     max(abs(p-q) for p,q in zip(a,b)) <= tolerance for a,b in zip(mine,device))):
+                    close += 1
+    log.close()
+    print("rois:{} exact:{:.1f}% within {}px:{:.1f}%".format(compared,100.0*exact/max(compared,1),
+          tolerance,100.0*(exact+close)/max(compared,1)))
+
+
+#Time find_blobs_rois on one QVGA frame
+def bench(num_rois,repeat=50):
+    from .emulator import synthetic_frames
+    frame = next(synthetic_frames(1))
+    if(num_rois > 96):
+        raise SystemExit("at most 96 rois fit in one QVGA frame")
+    rois = [(10+25*(i % 12),10+28*(i//12),22,16) for i in range(num_rois)]
+    thresholds = [(44,100,70,-124,28,80)]
+    lab_table()
+    find_blobs_rois(frame,thresholds,rois,pixels_threshold=1,area_threshold=1,merge=True)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        find_blobs_rois(frame,thresholds,rois,pixels_threshold=1,area_threshold=1,merge=True)
+    dt = (time.perf_counter()-t0)/repeat
+    print("rois:{} {:.3f}ms per frame, {:.1f}us per roi".format(num_rois,dt*1000,dt*1e6/num_rois))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy find_blobs engine")
+    sub = parser.add_subparsers(dest="cmd",required=True)
+    p = sub.add_parser("bench")
+    p.add_argument("--rois",type=int,default=4)
+    p = sub.add_parser("validate")
+    p.add_argument("log")
+    p.add_argument("blobs")
+    p.add_argument("--tolerance",type=int,default=1)
+    args = parser.parse_args()
+    if(args.cmd == "bench"):
+        bench(args.rois)
+    else:
+        validate(args.log,args.blobs,args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+@@@ Name  : Frame Classification (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Per-frame versions of the camera logic for offline re-scoring:
+   - classify_quad()   : quad_sample_classifier.py measure_well() (largest blob
+                         area per well) + quad_sample_intensity.py intensity
+   - classify_single() : single_sample_classifier.py step()
+2. Image operations go through the shim image module (host/openmv), so the
+   find_blobs/gaussian/lens_corr calls are the same as on the camera. The
+   shims are installed by the first call, not at import.
+3. Frames are 2D uint16 RGB565 arrays (QVGA).
+4. The quad call is "negative" when the averaged blob area reaches
+   area_thresh_n, otherwise "positive".
+"""
+
+import copy
+import json
+
+from .emulator import install
+from .luma_engine import roi_luma_stats
+
+
+#Defaults copied from the camera scripts
+QUAD_CONFIG = {
+    "well_rois":[(22,84,38,30),(96,84,38,30),(172,84,38,30),(250,84,38,30)],
+    "intensity_rois":[(33,95,38,20),(106,95,38,20),(184,95,38,20),(257,95,38,20)],
+    "chemical_thresh":[(44,100,70,-124,28,80)],
+    "area_thresh_n":200,
+    "intensity_config":4,
+    "rotation":(False,False,False),
+}
+
+SINGLE_CONFIG = {
+    "roi":(110,210,110,42),
+    "blob_roi":(0,0,110,42),
+    "chemicals_p_thresh":[(40,90,-1,90,-85,-22)],
+    "chemicals_n_thresh":[(59,100,26,-48,-44,49)],
+    "p_pixels_threshold":1,"p_area_threshold":300,"p_area_range":(300,1000),
+    "n_pixels_threshold":20,"n_area_threshold":80,"n_area_range":(80,500),
+    "enable_gaus_smooth":True,
+    "enable_lens_corr":True,
+    "lens_corr_strength":2.2,
+    "enable_lens_remap":False,
+    "rotation":(False,True,True),
+}
+
+
+#Defaults of a mode updated with a JSON config file
+def load_config(mode,path=None):
+    config = copy.deepcopy(QUAD_CONFIG if mode == "quad" else SINGLE_CONFIG)
+    if path:
+        with open(path) as f:
+            config.update(json.load(f))
+    return config
+
+
+#Shim image module, installed on first use so importing this module leaves sys.path, time and gc alone
+def _omv_image():
+    install()
+    import image
+    return image
+
+
+def _rotate(img,rotation):
+    vflip,hmirror,transpose = rotation
+    return img.replace(img,vflip=vflip,hmirror=hmirror,transpose=transpose)
+
+
+#Largest blob area of every well
+def well_blob_areas(img,rois,thresholds):
+    areas = []
+    for roi in rois:
+        blob_area_max = 0
+        for blob in img.find_blobs(thresholds,roi=roi,pixels_threshold=1, \
+                                   area_threshold=1,merge=True):
+            if(blob[4] > blob_area_max):
+                blob_area_max = blob[4]
+        areas.append(blob_area_max)
+    return areas
+
+
+#Frame -> image the quad wells are measured on
+def prepare_quad(frame,config=QUAD_CONFIG):
+    return _rotate(_omv_image().Image(frame.astype("uint16",copy=True)),config["rotation"])
+
+
+#Frame -> cropped, smoothed and lens corrected image of the single sample
+def prepare_single(frame,config=SINGLE_CONFIG):
+    img = _rotate(_omv_image().Image(frame.astype("uint16",copy=True)),config["rotation"])
+    img = img.crop(config["roi"])
+    if config["enable_gaus_smooth"]:
+        img = img.gaussian(1)
+    if(config["enable_lens_corr"] and not config.get("enable_lens_remap")):
+        img.lens_corr(config["lens_corr_strength"])
+    return img
+
+
+#Detection roi and (pixels, area, min, max) filters of the single sample,
+#with enable_lens_remap the roi is mapped into the uncorrected image
+def single_detection(config=SINGLE_CONFIG):
+    roi = tuple(config["blob_roi"])
+    p_filter = (config["p_pixels_threshold"],config["p_area_threshold"])+tuple(config["p_area_range"])
+    n_filter = (config["n_pixels_threshold"],config["n_area_threshold"])+tuple(config["n_area_range"])
+    if(config["enable_lens_corr"] and config.get("enable_lens_remap")):
+        src_x,src_y = _omv_image().lens_corr_map(config["roi"][2],config["roi"][3],config["lens_corr_strength"])
+        x,y,w,h = roi
+        src_x,src_y = src_x[y:y+h,x:x+w],src_y[y:y+h,x:x+w]
+        x0,y0 = int(src_x.min()),int(src_y.min())
+        roi = (x0,y0,int(src_x.max())-x0+1,int(src_y.max())-y0+1)
+        scale = (w*h)/(roi[2]*roi[3])
+        p_filter = tuple(max(1,int(v/scale)) for v in p_filter)
+        n_filter = tuple(max(1,int(v/scale)) for v in n_filter)
+    return roi,p_filter,n_filter
+
+
+#positive / negative / none from the p and n blob areas
+def single_call(p_area,n_area):
+    if(p_area > 0 and n_area == 0):
+        return "positive"
+    if(p_area > 0 and n_area > 0):
+        return "negative"
+    return "none"
+
+
+#One row per well: blob area, intensity, call
+def classify_quad(frame,config=QUAD_CONFIG):
+    img = prepare_quad(frame,config)
+    areas = well_blob_areas(img,config["well_rois"],config["chemical_thresh"])
+    mean,var = roi_luma_stats(img.pixels,config["intensity_rois"],config["intensity_config"])
+    rows = []
+    for well,area in enumerate(areas):
+        rows.append({"well":well+1,"blob_area":area,"intensity":int(mean[well]),
+                     "intensity_var":float(var[well]),
+                     "call":"negative" if area >= config["area_thresh_n"] else "positive"})
+    return rows
+
+
+#One row with the positive/negative decision of single_sample_classifier.py
+def classify_single(frame,config=SINGLE_CONFIG):
+    img = prepare_single(frame,config)
+
+    roi,p_filter,n_filter = single_detection(config)
+    p_area = n_area = 0
+    for blob in img.find_blobs(config["chemicals_p_thresh"],roi=roi,pixels_threshold=p_filter[0], \
+                               area_threshold=p_filter[1],merge=True):
+        if(p_filter[2] < blob[4] < p_filter[3]):
+            p_area = blob[4]
+    for blob in img.find_blobs(config["chemicals_n_thresh"],roi=roi,pixels_threshold=n_filter[0], \
+                               area_threshold=n_filter[1],merge=True):
+        if(n_filter[2] < blob[4] < n_filter[3]):
+            n_area = blob[4]
+
+    call = single_call(p_area,n_area)
+    return [{"well":1,"blob_area":n_area if call == "negative" else p_area,"p_area":p_area,
+             "n_area":n_area,"call":call}]
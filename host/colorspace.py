@@ -0,0 +1,205 @@
+"""
+@@@ Name  : Colour Space Conversions (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Frames are 2D uint16 NumPy arrays of RGB565 pixels (row major).
+2. RGB565 -> RGB888 uses the OpenMV rounding.
+3. Y is the OpenMV luma (0.299R + 0.587G + 0.114B, 0-255), i.e. the first
+   element of image.rgb_to_yuv() and the value of a grayscale pixel.
+4. LAB is CIE L*a*b* (sRGB, D65) rounded to int, the space of the
+   find_blobs() colour thresholds.
+5. RGB565 has only 65536 values, so frame conversions are a gather from
+   precomputed tables (lab_table(), yuv_table()). The tables are built once
+   with the float math below, saved as .npy files in LUT_DIR (OMV_LUT_DIR
+   environment variable, default ~/.cache/omv_luts) and memory-mapped on
+   later runs, so they are shared by all processes of a batch job.
+
+Usage:
+    python -m host.colorspace build      # (re)build the cached tables
+    python -m host.colorspace bench
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+LUT_DIR = os.environ.get("OMV_LUT_DIR",os.path.join(os.path.expanduser("~"),".cache","omv_luts"))
+LUT_VERSION = 1
+
+_tables = {}
+
+
+#RGB565 -> RGB888 channels with the OpenMV rounding
+def rgb565_to_rgb888(frame):
+    frame = np.asarray(frame,dtype=np.uint16)
+    r5 = (frame >> 11) & 0x1F
+    g6 = (frame >> 5) & 0x3F
+    b5 = frame & 0x1F
+    r8 = (r5.astype(np.uint32)*255 + 15)//31
+    g8 = (g6.astype(np.uint32)*255 + 31)//63
+    b8 = (b5.astype(np.uint32)*255 + 15)//31
+    return r8,g8,b8
+
+
+#RGB888 channels -> RGB565 frame
+def rgb888_to_rgb565(r8,g8,b8):
+    r8,g8,b8 = (np.asarray(c,dtype=np.uint16) for c in (r8,g8,b8))
+    return ((r8 >> 3) << 11) | ((g8 >> 2) << 5) | (b8 >> 3)
+
+
+#RGB888 channels -> Y (uint8)
+def rgb888_to_luma(r8,g8,b8):
+    return ((r8*38 + g8*75 + b8*15) >> 7).astype(np.uint8)
+
+
+#RGB888 channels -> Y, U, V (OpenMV image.rgb_to_yuv(), int16 arrays)
+def rgb888_to_yuv(r8,g8,b8):
+    r8,g8,b8 = (np.asarray(c,dtype=np.int32) for c in (r8,g8,b8))
+    y = (r8*38 + g8*75 + b8*15) >> 7
+    u = (b8*128 - r8*43 - g8*85) >> 8
+    v = (r8*128 - g8*107 - b8*21) >> 8
+    return y.astype(np.int16),u.astype(np.int16),v.astype(np.int16)
+
+
+#RGB888 channels -> L, A, B (int8 arrays)
+def rgb888_to_lab(r8,g8,b8):
+    def linear(c):
+        c = np.asarray(c,dtype=np.float64)/255.0
+        return np.where(c <= 0.04045,c/12.92,((c+0.055)/1.055)**2.4)
+
+    def f(t):
+        return np.where(t > 0.008856,np.cbrt(t),7.787*t + 16.0/116.0)
+
+    r,g,b = linear(r8),linear(g8),linear(b8)
+    x = (r*0.4124 + g*0.3576 + b*0.1805)/0.95047
+    y = r*0.2126 + g*0.7152 + b*0.0722
+    z = (r*0.0193 + g*0.1192 + b*0.9505)/1.08883
+    fx,fy,fz = f(x),f(y),f(z)
+    l = np.floor(116.0*fy - 16.0 + 0.5)
+    a = np.floor(500.0*(fx-fy) + 0.5)
+    b = np.floor(200.0*(fy-fz) + 0.5)
+    return l.astype(np.int8),a.astype(np.int8),b.astype(np.int8)
+
+
+#Every RGB565 value, in table order
+def _all_rgb565():
+    return np.arange(65536,dtype=np.uint32).astype(np.uint16)
+
+
+_BUILDERS = {
+    "lab":lambda: np.stack(rgb888_to_lab(*rgb565_to_rgb888(_all_rgb565()))),
+    "yuv":lambda: np.stack(rgb888_to_yuv(*rgb565_to_rgb888(_all_rgb565()))),
+}
+_DTYPES = {"lab":np.int8,"yuv":np.int16}
+
+
+def lut_path(name):
+    return os.path.join(LUT_DIR,"rgb565_{}_v{}.npy".format(name,LUT_VERSION))
+
+
+#Build a table and save it atomically (a failed save only loses the cache)
+def build_table(name):
+    table = _BUILDERS[name]().astype(_DTYPES[name])
+    try:
+        os.makedirs(LUT_DIR,exist_ok=True)
+        fd,tmp = tempfile.mkstemp(dir=LUT_DIR,suffix=".npy")
+        with os.fdopen(fd,"wb") as f:
+            np.save(f,table)
+        os.replace(tmp,lut_path(name))
+    except OSError:
+        pass
+    return table
+
+
+#(3,65536) table of one conversion, memory-mapped from the cache when possible
+def rgb565_table(name):
+    table = _tables.get(name)
+    if table is not None:
+        return table
+    try:
+        table = np.load(lut_path(name),mmap_mode="r")
+        if(table.shape != (3,65536) or table.dtype != _DTYPES[name]):
+            table = None
+    except (OSError,ValueError):
+        table = None
+    if table is None:
+        table = build_table(name)
+    table = np.asarray(table)
+    _tables[name] = table
+    return table
+
+
+#L, A, B (int8) of every RGB565 value
+def lab_table():
+    return rgb565_table("lab")
+
+
+#Y, U, V (int16) of every RGB565 value
+def yuv_table():
+    return rgb565_table("yuv")
+
+
+#Y (uint8) of every RGB565 value
+def luma_table():
+    table = _tables.get("luma")
+    if table is None:
+        table = _tables["luma"] = yuv_table()[0].astype(np.uint8)
+    return table
+
+
+#RGB565 frame -> Y channel (uint8)
+def rgb565_to_luma(frame):
+    return luma_table()[np.asarray(frame,dtype=np.uint16)]
+
+
+#RGB565 frame -> Y, U, V (int16 arrays)
+def rgb565_to_yuv(frame):
+    frame = np.asarray(frame,dtype=np.uint16)
+    table = yuv_table()
+    return table[0][frame],table[1][frame],table[2][frame]
+
+
+#RGB565 frame -> L, A, B (int8 arrays)
+def rgb565_to_lab(frame):
+    frame = np.asarray(frame,dtype=np.uint16)
+    table = lab_table()
+    return table[0][frame],table[1][frame],table[2][frame]
+
+
+#Table lookup vs direct float conversion of one QVGA frame
+def bench(repeat=20):
+    frame = np.random.default_rng(0).integers(0,65536,size=(240,320),dtype=np.uint32).astype(np.uint16)
+    for name,direct,lookup in (("lab",lambda f: rgb888_to_lab(*rgb565_to_rgb888(f)),rgb565_to_lab),
+                               ("luma",lambda f: rgb888_to_luma(*rgb565_to_rgb888(f)),rgb565_to_luma)):
+        lookup(frame)
+        times = []
+        for fn in (direct,lookup):
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                fn(frame)
+            times.append((time.perf_counter()-t0)/repeat*1000)
+        print("{:<5} direct:{:.3f}ms lookup:{:.3f}ms".format(name,*times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RGB565 conversion tables")
+    parser.add_argument("cmd",choices=("build","bench"))
+    args = parser.parse_args()
+    if(args.cmd == "build"):
+        for name in _BUILDERS:
+            t0 = time.perf_counter()
+            build_table(name)
+            print("{} {:.1f}ms".format(lut_path(name),(time.perf_counter()-t0)*1000))
+    else:
+        bench()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+@@@ Name  : UART Command Channel (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Reconfigures a running quad_sample_pipeline.py without reflashing: the
+   commands are binary frames of the README format sent to the camera
+   UART, TYPE 0x10..0x17 (COMMANDS), u16 values.
+2. The camera answers every command with an ack frame (TYPE 3) holding the
+   command type, the command SEQ and a status (STATUS).
+3. roi / luma-roi take one x,y,w,h per well in full frame coordinates (the
+   camera keeps its well count and sensor window), thresh one LAB
+   threshold per argument, set name=value pairs of PARAMS (scaled to u16).
+4. The camera only polls commands with enable_commands = True.
+5. --out appends the encoded command to a file instead of a port, e.g. for
+   host.emulator --uart-in.
+6. calibrate relocates the wells on a full frame (see enable_auto_roi in
+   quad_sample_pipeline.py) and answers "bad value" when they cannot be
+   found.
+
+Usage:
+    python -m host.command --port /dev/ttyACM0 set dwell_frames=5 decision_z=2.5
+    python -m host.command --port /dev/ttyACM0 thresh 44,100,70,-124,28,80
+    python -m host.command --port /dev/ttyACM0 roi 22,84,38,30 96,84,38,30 172,84,38,30 250,84,38,30
+    python -m host.command --port /dev/ttyACM0 telemetry
+    python -m host.command --port /dev/ttyACM0 calibrate
+    python -m host.command --out /tmp/cmd.bin pause
+"""
+
+import argparse
+import asyncio
+
+from .uart_decoder import FRAME_ACK,FRAME_TELEMETRY,SerialReader,encode_frame
+
+#Command frame types (cmd_* in quad_sample_pipeline.py)
+COMMANDS = {"roi":0x10,"luma-roi":0x11,"thresh":0x12,"set":0x13,"telemetry":0x14,"pause":0x15,"resume":0x16,
+            "calibrate":0x17}
+STATUS = ("ok","bad length","bad value","unknown command")
+
+#command_params of quad_sample_pipeline.py: name -> (index, scale, minimum, maximum of the scaled value)
+PARAMS = {"dwell_frames":(0,1,1,255),"intensity_config":(1,1,1,8),"decision_thresh":(2,1,0,2047),
+          "decision_z":(3,100,1,1000),"decision_min_frames":(4,1,2,255),"decision_max_frames":(5,1,1,255),
+          "ema_alpha":(6,1000,1,1000),"telemetry_every":(7,1,0,1000),"stream_mode":(8,1,0,1),
+          "frame_budget":(9,1,1,10000)}
+
+
+#Comma separated integers of one argument
+def _ints(text,n):
+    values = [int(v) for v in text.split(",")]
+    if(len(values) != n):
+        raise ValueError("expected %d values, got %r" % (n,text))
+    return values
+
+
+#(frame type, count, values) of one command line
+def parse_command(name,args):
+    cmd = COMMANDS[name]
+    if name in ("roi","luma-roi"):
+        values = [v for a in args for v in _ints(a,4)]
+        return cmd,len(args),values
+    if(name == "thresh"):
+        values = [v & 0xFFFF for a in args for v in _ints(a,6)]
+        return cmd,len(args),values
+    if(name == "set"):
+        values = []
+        for a in args:
+            key,_,value = a.partition("=")
+            if key not in PARAMS:
+                raise ValueError("unknown parameter %r (expected %s)" % (key,", ".join(PARAMS)))
+            index,scale,lo,hi = PARAMS[key]
+            scaled = int(round(float(value)*scale))
+            if not lo <= scaled <= hi:
+                raise ValueError("%s must be in %g..%g" % (key,lo/scale,hi/scale))
+            values += [index,scaled]
+        return cmd,len(args),values
+    if args:
+        raise ValueError("%s takes no arguments" % name)
+    return cmd,0,[]
+
+
+#Encoded command frame
+def encode_command(name,args,seq=0):
+    cmd,count,values = parse_command(name,args)
+    if not count and name in ("roi","luma-roi","thresh","set"):
+        raise ValueError("%s needs at least one argument" % name)
+    return encode_frame(values,seq,frame_type=cmd,count=count)
+
+
+#Send one command and wait for its ack (and the telemetry frame it asked for)
+async def send(path,baudrate,name,args,seq=0,timeout=2.0):
+    from .telemetry import decode_telemetry,format_table
+    cmd = COMMANDS[name]
+    reader = await SerialReader(path,baudrate).start()
+    try:
+        await reader.write(encode_command(name,args,seq))
+        acked = False
+        while True:
+            frame = await asyncio.wait_for(reader.__anext__(),timeout)
+            if(frame.type == FRAME_ACK and frame.values[:2] == (cmd,seq & 0xFFFF)):
+                status = frame.values[2]
+                print("%s: %s" % (name,STATUS[status] if status < len(STATUS) else status))
+                if(status != 0 or name != "telemetry"):
+                    return status
+                acked = True
+            elif(acked and frame.type == FRAME_TELEMETRY):
+                print(format_table(frame.seq,decode_telemetry(frame)))
+                return 0
+    except asyncio.TimeoutError:
+        raise SystemExit("no answer from %s" % path)
+    finally:
+        reader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a command to a running camera")
+    parser.add_argument("command",choices=sorted(COMMANDS))
+    parser.add_argument("args",nargs="*",help="x,y,w,h per well / L,L,A,A,B,B per threshold / name=value")
+    parser.add_argument("--port",help="serial device or pty path")
+    parser.add_argument("--baud",type=int,default=115200)
+    parser.add_argument("--out",metavar="FILE",help="append the command frame to FILE instead")
+    parser.add_argument("--seq",type=int,default=0,help="command sequence number")
+    parser.add_argument("--timeout",type=float,default=2.0,help="ack timeout (s)")
+    args = parser.parse_args()
+    try:
+        frame = encode_command(args.command,args.args,args.seq)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.out:
+        with open(args.out,"ab") as f:
+            f.write(frame)
+    elif args.port:
+        status = asyncio.run(send(args.port,args.baud,args.command,args.args,args.seq,args.timeout))
+        raise SystemExit(1 if status else 0)
+    else:
+        parser.error("--port or --out is required")
+
+
+if __name__ == "__main__":
+    main()
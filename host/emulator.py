@@ -0,0 +1,209 @@
+"""
+@@@ Name  : OpenMV Script Emulator (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Runs the camera scripts on Linux with the shim modules in host/openmv
+   (sensor, image, pyb, ustruct and the MicroPython time functions).
+   pyb timer callbacks fire after every step for the time the step took.
+2. The script is imported without starting main(); step() is then called
+   once per recorded frame. Modules next to the script (quad_sample_common.py)
+   are importable, as on the camera flash / SD card.
+3. Frame files: .flog frame logs (host.frame_log, memory-mapped), .npy
+   (2D uint16 RGB565), .rgb565 (raw little endian RGB565, QVGA) or any
+   image Pillow can open (optional dependency).
+4. Reports per-step latency, FPS and the time spent in every shimmed call,
+   the remainder is interpreted script time.
+5. --uart-out FILE saves the bytes the script wrote to the UART, for
+   host.uart_decoder / host.telemetry. --uart-in FILE feeds bytes to the
+   camera UART before frame --uart-in-frame (e.g. host.command --out).
+6. --uart-timing makes UART writes take the line time of the baud rate
+   (blocking writes spin as on the camera). Timer interrupts replayed after
+   a step are added to that step's latency.
+
+Usage:
+    python -m host.emulator quad_sample_classifier.py frames/ --repeat 10
+    python -m host.emulator quad_sample_intensity.py --synthetic 200
+    python -m host.emulator quad_sample_pipeline.py --synthetic 500 --uart-out /tmp/uart.bin
+    python -m host.emulator quad_sample_pipeline.py --synthetic 500 --uart-timing
+"""
+
+import argparse
+import glob
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+
+SHIM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),"openmv")
+QVGA = (240,320)
+
+
+#Put the shim modules in front of sys.path
+def install():
+    if SHIM_DIR not in sys.path:
+        sys.path.insert(0,SHIM_DIR)
+    import _shim
+    _shim.patch_time()
+    _shim.patch_gc()
+    return _shim
+
+
+#Load one frame file as a 2D uint16 RGB565 array
+def load_frame(path,shape=QVGA):
+    ext = os.path.splitext(path)[1].lower()
+    if(ext == ".npy"):
+        return np.load(path).astype(np.uint16)
+    if(ext == ".rgb565"):
+        return np.fromfile(path,dtype="<u2").reshape(shape)
+    try:
+        from PIL import Image
+    except ImportError:
+        raise SystemExit("Pillow is required to read {}".format(path))
+    from .colorspace import rgb888_to_rgb565
+    rgb = np.asarray(Image.open(path).convert("RGB").resize((shape[1],shape[0])))
+    return rgb888_to_rgb565(rgb[:,:,0],rgb[:,:,1],rgb[:,:,2])
+
+
+#Expand files/directories into a sorted list of frame files
+def frame_paths(sources):
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(sorted(glob.glob(os.path.join(source,"*"))))
+        else:
+            paths.append(source)
+    return paths
+
+
+#Frames of every path, repeated (frames are loaded/mapped once)
+def iter_frames(paths,repeat=1):
+    from .frame_log import FrameLog
+    sources = []
+    for p in paths:
+        if p.endswith(".flog"):
+            sources.append(FrameLog(p))
+        else:
+            sources.append((load_frame(p),))
+    for _ in range(repeat):
+        for source in sources:
+            for frame in source:
+                yield frame
+
+
+#Random RGB565 frames with bright wells, for smoke tests without recordings
+def synthetic_frames(n,seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0,0x2000,size=QVGA,dtype=np.uint16)
+    for i in range(n):
+        frame = base.copy()
+        frame[95:115,33:300] = 0xF81F ^ (i & 0x0F)
+        yield frame
+
+
+#Import a camera script without running its main loop
+def load_script(path,frames):
+    shim = install()
+    import sensor
+    sensor.set_source(frames)
+    name = os.path.splitext(os.path.basename(path))[0]
+    #Modules next to the script (quad_sample_common.py), as on the camera
+    script_dir = os.path.dirname(os.path.abspath(path))
+    if script_dir not in sys.path:
+        sys.path.insert(1,script_dir)
+    spec = importlib.util.spec_from_file_location(name,path)
+    module = importlib.util.module_from_spec(spec)
+    shim.reset_stage_times()
+    spec.loader.exec_module(module)
+    shim.reset_stage_times()
+    return module
+
+
+#Call step() until the frames run out, returns the step latencies (s)
+#(uart_in bytes are received by the script before frame uart_in_frame)
+def replay(module,max_frames=None,uart_in=None,uart_in_frame=0):
+    import pyb
+    import sensor
+    latencies = []
+    while max_frames is None or len(latencies) < max_frames:
+        if uart_in and len(latencies) == uart_in_frame:
+            module.uart.feed(uart_in)
+        t0 = time.perf_counter()
+        try:
+            module.step()
+        except sensor.NoMoreFrames:
+            break
+        latencies.append(time.perf_counter()-t0)
+        t0 = time.perf_counter()
+        pyb.run_timers(latencies[-1])
+        latencies[-1] += time.perf_counter()-t0
+    return latencies
+
+
+def report(latencies,stage_times,uart_bytes=0):
+    lat = np.array(latencies)*1000.0
+    total = lat.sum()
+    print("frames:{} mean:{:.3f}ms p50:{:.3f}ms p99:{:.3f}ms max:{:.3f}ms -> {:.1f} FPS".format(
+          len(lat),lat.mean(),np.percentile(lat,50),np.percentile(lat,99),lat.max(),1000.0*len(lat)/total))
+    print("{:<24}{:>10}{:>14}{:>10}".format("stage","calls","mean(us)","share"))
+    shimmed = 0.0
+    for name,(calls,seconds) in sorted(stage_times.items(),key=lambda kv: -kv[1][1]):
+        shimmed += seconds*1000.0
+        print("{:<24}{:>10}{:>14.1f}{:>9.1f}%".format(name,calls,1e6*seconds/calls,100*seconds*1000.0/total))
+    print("{:<24}{:>10}{:>14.1f}{:>9.1f}%".format("script",len(lat),1000.0*(total-shimmed)/len(lat),
+                                                  100*(total-shimmed)/total))
+    print("uart bytes:",uart_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded frames through a camera script")
+    parser.add_argument("script",help="camera script, e.g. quad_sample_classifier.py")
+    parser.add_argument("frames",nargs="*",help="frame files or directories")
+    parser.add_argument("--repeat",type=int,default=1,help="replay the frames N times")
+    parser.add_argument("--synthetic",type=int,default=0,help="use N synthetic frames")
+    parser.add_argument("--max-frames",type=int)
+    parser.add_argument("--quiet",action="store_true",help="hide the script prints")
+    parser.add_argument("--uart-out",metavar="FILE",help="save the UART output of the script")
+    parser.add_argument("--uart-in",metavar="FILE",help="bytes received by the script (commands)")
+    parser.add_argument("--uart-in-frame",type=int,default=0,help="frame before which --uart-in arrives")
+    parser.add_argument("--uart-timing",action="store_true",help="UART writes take the line time")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        frames = synthetic_frames(args.synthetic)
+    else:
+        frames = iter_frames(frame_paths(args.frames),args.repeat)
+
+    stdout = sys.stdout
+    if args.quiet:
+        sys.stdout = open(os.devnull,"w")
+    try:
+        install()
+        import pyb
+        pyb.set_line_timing(args.uart_timing)
+        module = load_script(args.script,frames)
+        uart_in = None
+        if args.uart_in:
+            with open(args.uart_in,"rb") as f:
+                uart_in = f.read()
+        latencies = replay(module,args.max_frames,uart_in,args.uart_in_frame)
+    finally:
+        sys.stdout = stdout
+    if not latencies:
+        raise SystemExit("no frames")
+
+    import _shim
+    uart = getattr(module,"uart",None)
+    report(latencies,_shim.stage_times,len(uart.tx) if uart is not None else 0)
+    if args.uart_out and uart is not None:
+        with open(args.uart_out,"wb") as f:
+            f.write(uart.tx)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+@@@ Name  : Frame Log (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Container written by frame_recorder.py on the camera (SD card or USB).
+2. Layout (little endian):
+   - file header, header_size bytes:
+     MAGIC(8s "OMVFLOG1") VERSION(u16) HEADER_SIZE(u16) WIDTH(u16) HEIGHT(u16)
+     PIXFORMAT(u8, 1 = grayscale, 2 = RGB565) BYTE_ORDER(u8, 0 = little, 1 = big)
+     RESERVED(u16) RECORD_SIZE(u32) FRAME_BYTES(u32), then JSON metadata padded with NUL
+   - fixed size records, RECORD_SIZE bytes each:
+     MAGIC(4s "FREC") INDEX(u32) TICKS_MS(u32) EXPOSURE_US(u32) | FRAME_BYTES pixels
+3. FrameLog memory-maps the records as one NumPy structured array, so
+   log[i] is a zero-copy (height, width) view of frame i.
+4. A truncated last record (recording stopped mid-write) is ignored.
+5. capture stops after --frames records, at the end of the stream or on
+   Ctrl-C, and returns the number of complete records written.
+
+Usage:
+    python -m host.frame_log info frames.flog
+    python -m host.frame_log convert frames/ out.flog
+    python -m host.frame_log capture /dev/ttyACM0 out.flog --frames 600
+    python -m host.frame_log bench frames.flog
+"""
+
+import argparse
+import errno
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"OMVFLOG1"
+RECORD_MAGIC = b"FREC"
+VERSION = 1
+HEADER_SIZE = 256
+HEADER = struct.Struct("<8sHHHHBBHII")
+RECORD_HEAD = struct.Struct("<4sIII")
+
+GRAYSCALE = 1
+RGB565 = 2
+
+
+#Parse a file header -> dict
+def parse_header(data):
+    magic,version,header_size,width,height,pixformat,byte_order,_,record_size,frame_bytes = \
+        HEADER.unpack_from(data,0)
+    if(magic != MAGIC):
+        raise ValueError("not a frame log (magic {!r})".format(magic))
+    if(version != VERSION):
+        raise ValueError("unsupported frame log version {}".format(version))
+    text = bytes(data[HEADER.size:header_size]).rstrip(b"\0")
+    return {"header_size":header_size,"width":width,"height":height,"pixformat":pixformat,
+            "byte_order":byte_order,"record_size":record_size,"frame_bytes":frame_bytes,
+            "metadata":json.loads(text) if text else {}}
+
+
+#Build a file header
+def make_header(width,height,pixformat=RGB565,metadata=None,byte_order=0):
+    frame_bytes = width*height*(2 if pixformat == RGB565 else 1)
+    record_size = RECORD_HEAD.size+frame_bytes
+    header = bytearray(HEADER_SIZE)
+    HEADER.pack_into(header,0,MAGIC,VERSION,HEADER_SIZE,width,height,pixformat,byte_order,0,
+                     record_size,frame_bytes)
+    text = json.dumps(metadata or {},separators=(",",":")).encode()
+    if(len(text) > HEADER_SIZE-HEADER.size):
+        raise ValueError("metadata is {} bytes, at most {} fit".format(len(text),HEADER_SIZE-HEADER.size))
+    header[HEADER.size:HEADER.size+len(text)] = text
+    return bytes(header)
+
+
+#Structured dtype of one record
+def record_dtype(info):
+    if(info["pixformat"] == RGB565):
+        pixel = ">u2" if info["byte_order"] else "<u2"
+    else:
+        pixel = "u1"
+    fields = [("magic","S4"),("index","<u4"),("ticks_ms","<u4"),("exposure_us","<u4"),
+              ("pixels",pixel,(info["height"],info["width"]))]
+    dtype = np.dtype(fields)
+    if(dtype.itemsize != info["record_size"]):
+        raise ValueError("record size {} does not match {}x{} frames".format(
+                         info["record_size"],info["width"],info["height"]))
+    return dtype
+
+
+class FrameLog:
+    """
+    Read-only, memory-mapped frame log.
+
+    len(log) frames, log[i] -> (height, width) pixel view, log.records is
+    the structured array (index, ticks_ms, exposure_us, pixels).
+    """
+
+    def __init__(self,path):
+        self.path = path
+        with open(path,"rb") as f:
+            head = f.read(HEADER_SIZE)
+            info = parse_header(head)
+            if(info["header_size"] > HEADER_SIZE):
+                f.seek(0)
+                info = parse_header(f.read(info["header_size"]))
+        self.info = info
+        self.metadata = info["metadata"]
+        self.width,self.height = info["width"],info["height"]
+        dtype = record_dtype(info)
+        count = (os.path.getsize(path)-info["header_size"])//dtype.itemsize
+        if(count > 0):
+            self.records = np.memmap(path,dtype=dtype,mode="r",offset=info["header_size"],shape=(count,))
+        else:
+            self.records = np.zeros(0,dtype=dtype)
+        self.frames = self.records["pixels"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self,i):
+        return self.frames[i]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def ticks_ms(self):
+        return self.records["ticks_ms"]
+
+    #Frames between two ticks_ms values (records are in capture order)
+    def time_slice(self,start_ms,stop_ms):
+        ticks = self.records["ticks_ms"]
+        i0,i1 = np.searchsorted(ticks,(start_ms,stop_ms))
+        return self.frames[i0:i1]
+
+    def close(self):
+        mm = getattr(self.records,"_mmap",None)
+        self.records = self.frames = None
+        if mm is not None:
+            mm.close()
+
+
+class FrameLogWriter:
+
+    def __init__(self,path,width=320,height=240,pixformat=RGB565,metadata=None):
+        self._f = open(path,"wb")
+        self._f.write(make_header(width,height,pixformat,metadata))
+        self.shape = (height,width)
+        self.dtype = np.dtype("<u2" if pixformat == RGB565 else "u1")
+        self.index = 0
+
+    def write(self,frame,ticks_ms=None,exposure_us=0):
+        frame = np.asarray(frame)
+        if(frame.shape != self.shape):
+            raise ValueError("frame is {}, log is {}".format(frame.shape,self.shape))
+        if ticks_ms is None:
+            ticks_ms = int(time.monotonic()*1000)
+        self._f.write(RECORD_HEAD.pack(RECORD_MAGIC,self.index,ticks_ms & 0xFFFFFFFF,exposure_us))
+        self._f.write(np.ascontiguousarray(frame,dtype=self.dtype).tobytes())
+        self.index += 1
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+
+#Copy frame files (see host.emulator.load_frame) into one log
+def convert(paths,out,metadata=None):
+    from .emulator import load_frame
+    with FrameLogWriter(out,metadata=metadata) as writer:
+        for i,path in enumerate(paths):
+            writer.write(load_frame(path),ticks_ms=i)
+    return writer.index
+
+
+#Store the stream of frame_recorder.py (record_to_sd = False) into a file
+def capture(port,out,frames=None,baudrate=115200):
+    from .uart_decoder import open_tty
+    fd = open_tty(port,baudrate)
+    os.set_blocking(fd,True)
+
+    def read_exact(n):
+        chunks = []
+        while n:
+            try:
+                data = os.read(fd,n)
+            except OSError as e:
+                #EIO: pty master closed / device unplugged
+                if(e.errno != errno.EIO):
+                    raise
+                data = b""
+            if not data:
+                raise EOFError("port closed")
+            chunks.append(data)
+            n -= len(data)
+        return b"".join(chunks)
+
+    try:
+        #Skip anything printed before the header
+        window = b""
+        while not window.endswith(MAGIC):
+            window = (window+read_exact(1))[-len(MAGIC):]
+        #Fixed fields first, then the rest of the header_size the recorder wrote
+        head = MAGIC+read_exact(HEADER.size-len(MAGIC))
+        header_size = HEADER.unpack_from(head,0)[2]
+        if(header_size < HEADER.size):
+            raise ValueError("bad header size {}".format(header_size))
+        head += read_exact(header_size-len(head))
+        info = parse_header(head)
+        count = 0
+        with open(out,"wb") as f:
+            f.write(head)
+            #Until frames records, the end of the stream or Ctrl-C (a partial record is dropped)
+            try:
+                while frames is None or count < frames:
+                    record = read_exact(info["record_size"])
+                    if(record[:4] != RECORD_MAGIC):
+                        raise ValueError("lost record alignment after {} frames".format(count))
+                    f.write(record)
+                    count += 1
+            except (EOFError,KeyboardInterrupt):
+                pass
+    finally:
+        os.close(fd)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame log tools")
+    sub = parser.add_subparsers(dest="cmd",required=True)
+    p = sub.add_parser("info")
+    p.add_argument("log")
+    p = sub.add_parser("convert")
+    p.add_argument("frames",nargs="+",help="frame files or directories")
+    p.add_argument("out")
+    p = sub.add_parser("capture")
+    p.add_argument("port")
+    p.add_argument("out")
+    p.add_argument("--frames",type=int)
+    p = sub.add_parser("bench",help="replay every frame through the luma engine")
+    p.add_argument("log")
+    p.add_argument("--roi",type=int,nargs=4,action="append",metavar=("X","Y","W","H"))
+    args = parser.parse_args()
+
+    if(args.cmd == "info"):
+        log = FrameLog(args.log)
+        info = dict(log.info,frames=len(log))
+        print(json.dumps(info,indent=2))
+    elif(args.cmd == "convert"):
+        from .emulator import frame_paths
+        print("frames:",convert(frame_paths(args.frames),args.out))
+    elif(args.cmd == "capture"):
+        print("frames:",capture(args.port,args.out,args.frames))
+    elif(args.cmd == "bench"):
+        from .luma_engine import roi_luma_stats
+        log = FrameLog(args.log)
+        rois = args.roi or log.metadata.get("rois") or [(0,0,log.width,log.height)]
+        t0 = time.perf_counter()
+        for frame in log:
+            roi_luma_stats(frame,rois)
+        dt = time.perf_counter()-t0
+        print("frames:{} {:.1f} frames/s ({:.1f} MB/s)".format(
+              len(log),len(log)/dt,len(log)*log.info["frame_bytes"]/dt/1e6))
+
+
+if __name__ == "__main__":
+    main()
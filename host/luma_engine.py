@@ -0,0 +1,55 @@
+"""
+@@@ Name  : Luma Engine (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Host equivalent of measure_well() in quad_sample_intensity.py.
+2. Frames are 2D uint16 NumPy arrays of RGB565 pixels (row major), Y is
+   computed with host.colorspace.rgb565_to_luma().
+3. Results are normalized with intensity_config exactly like the camera:
+   mean * intensity_config and variance * intensity_config^2.
+"""
+
+import numpy as np
+
+from .colorspace import rgb565_to_luma
+
+#Default multiple of average intensity (same as quad_sample_intensity.py)
+INTENSITY_CONFIG = 4
+
+
+#Summed-area table with a zero first row/column
+def integral_image(channel):
+    table = np.zeros((channel.shape[0]+1,channel.shape[1]+1),dtype=np.float64)
+    np.cumsum(channel,axis=0,out=table[1:,1:])
+    np.cumsum(table[1:,1:],axis=1,out=table[1:,1:])
+    return table
+
+
+#Sum of every (x,y,w,h) roi inside a summed-area table
+def roi_sums(table,rois):
+    x0,y0,w,h = rois[:,0],rois[:,1],rois[:,2],rois[:,3]
+    x1,y1 = x0+w,y0+h
+    return table[y1,x1] - table[y0,x1] - table[y1,x0] + table[y0,x0]
+
+
+#Normalized mean and variance of Y inside each roi
+def roi_luma_stats(frame,rois,intensity_config=INTENSITY_CONFIG,luma=None):
+    """
+    frame: RGB565 frame (ignored when a precomputed luma channel is given)
+    rois : sequence of (x,y,w,h)
+    Returns (mean, variance) arrays with one entry per roi.
+    """
+    if luma is None:
+        luma = rgb565_to_luma(frame)
+    rois = np.asarray(rois,dtype=np.int64).reshape(-1,4)
+    y = luma.astype(np.float64)
+    area = (rois[:,2]*rois[:,3]).astype(np.float64)
+
+    mean = roi_sums(integral_image(y),rois)/area
+    var = roi_sums(integral_image(y*y),rois)/area - mean*mean
+    np.maximum(var,0,out=var)
+    return mean*intensity_config,var*intensity_config*intensity_config
@@ -0,0 +1,92 @@
+"""
+@@@ Name  : Shared state of the OpenMV host shim
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. stage_times collects [calls, total seconds] per shimmed API call
+   (snapshot, find_blobs, get_statistics, uart.write ...), so a replay
+   can split a frame into camera / vision / UART / interpreted script time.
+2. patch_time() adds the MicroPython time functions used on the camera
+   (clock, ticks_us, ticks_ms, ticks_diff, ticks_add, sleep_ms, sleep_us)
+   to the host time module.
+3. patch_gc() adds the MicroPython gc functions (mem_alloc, mem_free,
+   threshold) to the host gc module. mem_alloc counts the interpreter's
+   allocated blocks, so a replay shows whether a frame allocates, not the
+   byte count of the camera heap.
+"""
+
+import gc
+import sys
+import time
+from functools import wraps
+
+stage_times = {}
+
+
+#Decorator recording the time spent inside a shimmed call
+def timed(name):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args,**kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args,**kwargs)
+            finally:
+                entry = stage_times.get(name)
+                if entry is None:
+                    entry = stage_times[name] = [0,0.0]
+                entry[0] += 1
+                entry[1] += time.perf_counter()-t0
+        return wrapper
+    return decorator
+
+
+def reset_stage_times():
+    stage_times.clear()
+
+
+#FPS clock of the camera (time.clock)
+class Clock:
+
+    def __init__(self):
+        self._t0 = None
+        self._last = 0.0
+        self._frames = 0
+        self._total = 0.0
+
+    def tick(self):
+        now = time.perf_counter()
+        if self._t0 is not None:
+            self._last = now-self._t0
+            self._total += self._last
+            self._frames += 1
+        self._t0 = now
+
+    def fps(self):
+        return (1.0/self._last) if self._last else 0.0
+
+    def avg(self):
+        return (1000.0*self._total/self._frames) if self._frames else 0.0
+
+
+def patch_time():
+    if getattr(time,"ticks_us",None) is not None:
+        return
+    time.clock = Clock
+    time.ticks_us = lambda: time.perf_counter_ns()//1000
+    time.ticks_ms = lambda: time.perf_counter_ns()//1000000
+    time.ticks_diff = lambda new,old: new-old
+    time.ticks_add = lambda ticks,delta: ticks+delta
+    time.sleep_ms = lambda ms: time.sleep(ms/1000.0)
+    time.sleep_us = lambda us: time.sleep(us/1000000.0)
+
+
+def patch_gc():
+    if getattr(gc,"mem_alloc",None) is not None:
+        return
+    gc.mem_alloc = sys.getallocatedblocks
+    gc.mem_free = lambda: 0
+    gc.threshold = lambda *args: -1
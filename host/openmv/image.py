@@ -0,0 +1,266 @@
+"""
+@@@ Name  : OpenMV image module (host shim)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Image wraps a 2D NumPy array: uint16 RGB565 pixels or uint8 grayscale.
+2. In place operations (replace, crop, to_grayscale, gaussian, lens_corr,
+   draw_*) modify the wrapped array and return the same Image, like the
+   frame buffer on the camera.
+3. draw_string() does not render glyphs.
+4. find_blobs() is host.blob_engine; x_stride/y_stride only affect speed
+   on the camera and are ignored here.
+"""
+
+import math
+
+import numpy as np
+
+from _shim import timed
+from host.blob_engine import Blob,clip_roi as _clip_roi,find_blobs as _find_blobs
+from host.colorspace import rgb565_to_rgb888,rgb565_to_luma,rgb565_to_lab, \
+                            rgb888_to_rgb565,rgb888_to_lab
+
+#Pixel formats
+GRAYSCALE = 1
+RGB565 = 2
+
+
+#RGB888 tuple -> YUV tuple
+def rgb_to_yuv(rgb):
+    r,g,b = rgb
+    y = (r*38 + g*75 + b*15) >> 7
+    u = ((b*128 - r*43 - g*85) >> 8)
+    v = ((r*128 - g*107 - b*21) >> 8)
+    return (y,u,v)
+
+
+#RGB888 tuple -> LAB tuple
+def rgb_to_lab(rgb):
+    l,a,b = rgb888_to_lab(*(np.array([c]) for c in rgb))
+    return (int(l[0]),int(a[0]),int(b[0]))
+
+
+#RGB888 tuple -> grayscale value
+def rgb_to_grayscale(rgb):
+    return (rgb[0]*38 + rgb[1]*75 + rgb[2]*15) >> 7
+
+
+#Source coordinates of lens_corr() for every destination pixel
+def lens_corr_map(w,h,strength=1.8,zoom=1.0):
+    half_w,half_h = w//2,h//2
+    k = strength/math.sqrt(w*w + h*h)
+    dx = np.arange(w)-half_w
+    dy = np.arange(h)-half_h
+    x,y = np.meshgrid(dx,dy)
+    r = k*np.sqrt(x*x + y*y)
+    theta = np.ones_like(r)
+    nz = r > 1e-7
+    theta[nz] = np.arctan(r[nz])/r[nz]
+    src_x = half_w + np.rint(theta*x/zoom).astype(np.int32)
+    src_y = half_h + np.rint(theta*y/zoom).astype(np.int32)
+    return np.clip(src_x,0,w-1),np.clip(src_y,0,h-1)
+
+
+class Statistics:
+
+    def __init__(self,channels):
+        self._c = {}
+        for prefix,values in channels:
+            v = values.astype(np.int32).ravel()
+            lq,median,uq = np.percentile(v,(25,50,75),method="lower")
+            self._c[prefix] = (int(v.mean()),int(median),int(np.bincount(v-v.min()).argmax()+v.min()),
+                               int(v.std()),int(v.min()),int(v.max()),int(lq),int(uq))
+
+    def _get(self,prefix,i):
+        return self._c[prefix][i]
+
+    def __getitem__(self,i):
+        values = []
+        for prefix in self._c:
+            values.extend(self._c[prefix])
+        return values[i]
+
+    def mean(self):
+        return self._get(next(iter(self._c)),0)
+
+    def median(self):
+        return self._get(next(iter(self._c)),1)
+
+    def mode(self):
+        return self._get(next(iter(self._c)),2)
+
+    def stdev(self):
+        return self._get(next(iter(self._c)),3)
+
+    def min(self):
+        return self._get(next(iter(self._c)),4)
+
+    def max(self):
+        return self._get(next(iter(self._c)),5)
+
+    def lq(self):
+        return self._get(next(iter(self._c)),6)
+
+    def uq(self):
+        return self._get(next(iter(self._c)),7)
+
+
+for _i,_name in enumerate(("mean","median","mode","stdev","min","max","lq","uq")):
+    for _prefix in ("l","a","b"):
+        setattr(Statistics,"{}_{}".format(_prefix,_name), \
+                (lambda i,p: lambda self: self._get(p,i))(_i,_prefix))
+
+
+class Image:
+
+    def __init__(self,pixels):
+        self.pixels = pixels
+
+    def width(self):
+        return self.pixels.shape[1]
+
+    def height(self):
+        return self.pixels.shape[0]
+
+    def format(self):
+        return RGB565 if self.pixels.dtype == np.uint16 else GRAYSCALE
+
+    def size(self):
+        return self.pixels.nbytes
+
+    def __len__(self):
+        return self.pixels.size
+
+    def __getitem__(self,i):
+        return self._pixel_value(self.pixels.flat[i])
+
+    def _pixel_value(self,p):
+        if(self.pixels.dtype == np.uint16):
+            r,g,b = rgb565_to_rgb888(np.array([p],dtype=np.uint16))
+            return (int(r[0]),int(g[0]),int(b[0]))
+        return int(p)
+
+    def _color(self,color):
+        if color is None:
+            color = (255,255,255)
+        if(self.pixels.dtype == np.uint16):
+            if isinstance(color,int):
+                return color
+            return int(rgb888_to_rgb565(*color))
+        if isinstance(color,int):
+            return color
+        return rgb_to_grayscale(color)
+
+    def get_pixel(self,x,y):
+        return self._pixel_value(self.pixels[y,x])
+
+    def set_pixel(self,x,y,color):
+        self.pixels[y,x] = self._color(color)
+        return self
+
+    def copy(self,roi=None):
+        x,y,w,h = _clip_roi(roi,self.width(),self.height())
+        return Image(self.pixels[y:y+h,x:x+w].copy())
+
+    def replace(self,image=None,vflip=False,hmirror=False,transpose=False):
+        p = self.pixels if image is None else image.pixels
+        if vflip:
+            p = p[::-1,:]
+        if hmirror:
+            p = p[:,::-1]
+        if transpose:
+            p = p.T
+        self.pixels = np.ascontiguousarray(p)
+        return self
+
+    @timed("image.crop")
+    def crop(self,roi=None,copy=False):
+        x,y,w,h = _clip_roi(roi,self.width(),self.height())
+        pixels = self.pixels[y:y+h,x:x+w].copy()
+        if copy:
+            return Image(pixels)
+        self.pixels = pixels
+        return self
+
+    @timed("image.to_grayscale")
+    def to_grayscale(self,copy=False):
+        pixels = self.pixels
+        if(pixels.dtype == np.uint16):
+            pixels = rgb565_to_luma(pixels)
+        if copy:
+            return Image(pixels.copy())
+        self.pixels = pixels
+        return self
+
+    @timed("image.get_statistics")
+    def get_statistics(self,roi=None,**kwargs):
+        x,y,w,h = _clip_roi(roi,self.width(),self.height())
+        p = self.pixels[y:y+h,x:x+w]
+        if(p.dtype == np.uint16):
+            return Statistics(zip(("l","a","b"),rgb565_to_lab(p)))
+        return Statistics((("l",p),))
+
+    @timed("image.gaussian")
+    def gaussian(self,size,**kwargs):
+        k = np.array([math.comb(2*size,i) for i in range(2*size+1)],dtype=np.float64)
+        k /= k.sum()
+
+        def blur(channel):
+            c = np.pad(channel.astype(np.float64),size,mode="edge")
+            c = sum(k[i]*c[:,i:i+channel.shape[1]] for i in range(len(k)))
+            c = sum(k[i]*c[i:i+channel.shape[0],:] for i in range(len(k)))
+            return np.rint(c)
+
+        if(self.pixels.dtype == np.uint16):
+            r5 = blur((self.pixels >> 11) & 0x1F).astype(np.uint16)
+            g6 = blur((self.pixels >> 5) & 0x3F).astype(np.uint16)
+            b5 = blur(self.pixels & 0x1F).astype(np.uint16)
+            self.pixels = (r5 << 11) | (g6 << 5) | b5
+        else:
+            self.pixels = blur(self.pixels).astype(np.uint8)
+        return self
+
+    @timed("image.lens_corr")
+    def lens_corr(self,strength=1.8,zoom=1.0,**kwargs):
+        src_x,src_y = lens_corr_map(self.width(),self.height(),strength,zoom)
+        self.pixels = self.pixels[src_y,src_x]
+        return self
+
+    def draw_rectangle(self,x,y=None,w=None,h=None,color=None,thickness=1,fill=False):
+        if y is None:
+            x,y,w,h = x
+        c = self._color(color)
+        H,W = self.pixels.shape
+        x0,y0,x1,y1 = max(0,x),max(0,y),min(W,x+w),min(H,y+h)
+        if(x1 <= x0 or y1 <= y0):
+            return self
+        if fill:
+            self.pixels[y0:y1,x0:x1] = c
+            return self
+        t = thickness
+        self.pixels[y0:min(y1,y0+t),x0:x1] = c
+        self.pixels[max(y0,y1-t):y1,x0:x1] = c
+        self.pixels[y0:y1,x0:min(x1,x0+t)] = c
+        self.pixels[y0:y1,max(x0,x1-t):x1] = c
+        return self
+
+    def draw_cross(self,x,y=None,color=None,size=5,thickness=1):
+        if y is None:
+            x,y = x
+        self.draw_rectangle(x-size,y,2*size+1,1,color=color,fill=True)
+        self.draw_rectangle(x,y-size,1,2*size+1,color=color,fill=True)
+        return self
+
+    def draw_string(self,x,y,text,color=None,scale=1,**kwargs):
+        return self
+
+    @timed("image.find_blobs")
+    def find_blobs(self,thresholds,invert=False,roi=None,x_stride=2,y_stride=1, \
+                   area_threshold=10,pixels_threshold=10,merge=False,margin=0, \
+                   threshold_cb=None,merge_cb=None):
+        return _find_blobs(self.pixels,thresholds,invert,roi,x_stride,y_stride,area_threshold, \
+                           pixels_threshold,merge,margin,threshold_cb,merge_cb)
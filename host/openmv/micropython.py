@@ -0,0 +1,13 @@
+"""
+@@@ Name  : MicroPython micropython module (host shim)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def const(value):
+    return value
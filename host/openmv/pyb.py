@@ -0,0 +1,243 @@
+"""
+@@@ Name  : OpenMV pyb module (host shim)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Pin and LED only remember their state.
+2. UART.write() appends to UART.tx and, if set_uart_sink() was called, also
+   forwards the bytes (e.g. to a pty so host.uart_decoder can read them).
+3. UART.feed() queues bytes for any()/read() on the camera side.
+4. Timer callbacks do not run on their own: run_timers(seconds) (called by
+   host.emulator after every step with the step time) fires each active
+   callback freq x seconds times, as the interrupts would have, each at its
+   own point of the step (irq_now()).
+5. set_line_timing(True) models the wire: a character takes 10/baudrate s,
+   write()/writechar() wait (spin, like the camera) until the data register
+   is free, txdone() is False while characters are still shifting out.
+   Waits inside a replayed interrupt cannot stall the step and are counted
+   under "uart.irq_wait" instead.
+"""
+
+import time
+
+from _shim import stage_times,timed
+
+_uart_sink = None
+_line_timing = False
+_irq_now = None
+
+
+#Model the UART line rate in write() / writechar() / txdone()
+def set_line_timing(enable=True):
+    global _line_timing
+    _line_timing = enable
+
+
+#Camera time: the tick of the replayed interrupt, or now
+def irq_now():
+    return _irq_now if _irq_now is not None else time.perf_counter()
+
+
+#Forward every UART write to sink(bytes) (None -> keep in UART.tx only)
+def set_uart_sink(sink):
+    global _uart_sink
+    _uart_sink = sink
+
+
+def millis():
+    return time.perf_counter_ns()//1000000
+
+
+def micros():
+    return time.perf_counter_ns()//1000
+
+
+def elapsed_millis(start):
+    return millis()-start
+
+
+def elapsed_micros(start):
+    return micros()-start
+
+
+def delay(ms):
+    time.sleep(ms/1000.0)
+
+
+class Pin:
+    IN = 0
+    OUT_PP = 1
+    OUT_OD = 17
+    PULL_NONE = 0
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    def __init__(self,name,mode=IN,pull=PULL_NONE):
+        self.name = name
+        self.mode = mode
+        self._value = 0
+
+    def high(self):
+        self._value = 1
+
+    def low(self):
+        self._value = 0
+
+    def value(self,v=None):
+        if v is None:
+            return self._value
+        self._value = 1 if v else 0
+
+
+_timers = []
+
+
+#Fire the timer callbacks due in seconds of camera time (ticks spread over those seconds)
+def run_timers(seconds):
+    global _irq_now
+    end = time.perf_counter()
+    try:
+        for timer in _timers:
+            timer._due += timer._freq*seconds
+            ticks = int(timer._due)
+            for k in range(ticks):
+                if timer._callback is None:
+                    break
+                timer._due -= 1
+                _irq_now = end-(ticks-1-k)/timer._freq
+                timer._callback(timer)
+            if timer._callback is None:
+                timer._due = 0
+    finally:
+        _irq_now = None
+
+
+class Timer:
+
+    def __init__(self,id,freq=None,**kwargs):
+        self.id = id
+        self._freq = freq or 0
+        self._callback = None
+        self._due = 0.0
+        _timers.append(self)
+
+    def init(self,freq=None,**kwargs):
+        self._freq = freq or 0
+
+    def freq(self,value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def callback(self,fn):
+        self._callback = fn
+
+    def deinit(self):
+        self._callback = None
+        if self in _timers:
+            _timers.remove(self)
+
+
+class LED:
+
+    def __init__(self,index):
+        self.index = index
+        self.state = False
+
+    def on(self):
+        self.state = True
+
+    def off(self):
+        self.state = False
+
+    def toggle(self):
+        self.state = not self.state
+
+
+class UART:
+
+    def __init__(self,bus,baudrate=115200,**kwargs):
+        self.bus = bus
+        self.baudrate = baudrate
+        self.tx = bytearray()
+        self.rx = bytearray()
+        self.keep_tx = True
+        self._busy_until = 0.0
+
+    def init(self,baudrate=115200,**kwargs):
+        self.baudrate = baudrate
+
+    #Line model: queue n characters, return once the last one is in the data register
+    def _line(self,n):
+        if not _line_timing:
+            return
+        char = 10.0/self.baudrate
+        now = irq_now()
+        self._busy_until = max(self._busy_until,now)+n*char
+        until = self._busy_until-2*char
+        if(until <= now):
+            return
+        if _irq_now is not None:
+            entry = stage_times.setdefault("uart.irq_wait",[0,0.0])
+            entry[0] += 1
+            entry[1] += until-now
+            return
+        while time.perf_counter() < until:
+            pass
+
+    def txdone(self):
+        return not _line_timing or irq_now() >= self._busy_until
+
+    @timed("uart.write")
+    def write(self,data):
+        if isinstance(data,str):
+            data = data.encode()
+        data = bytes(data)
+        self._line(len(data))
+        if self.keep_tx:
+            self.tx += data
+        if _uart_sink is not None:
+            _uart_sink(data)
+        return len(data)
+
+    @timed("uart.writechar")
+    def writechar(self,c):
+        data = bytes((c & 0xFF,))
+        self._line(1)
+        if self.keep_tx:
+            self.tx += data
+        if _uart_sink is not None:
+            _uart_sink(data)
+
+    #Host only: bytes received by the camera
+    def feed(self,data):
+        self.rx += data
+
+    def any(self):
+        return len(self.rx)
+
+    def read(self,n=None):
+        if not self.rx:
+            return None
+        if n is None:
+            n = len(self.rx)
+        data = bytes(self.rx[:n])
+        del self.rx[:n]
+        return data
+
+    def readchar(self):
+        if not self.rx:
+            return -1
+        c = self.rx[0]
+        del self.rx[0]
+        return c
+
+    def readinto(self,buf,n=None):
+        data = self.read(len(buf) if n is None else n)
+        if data is None:
+            return None
+        buf[:len(data)] = data
+        return len(data)
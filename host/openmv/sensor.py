@@ -0,0 +1,137 @@
+"""
+@@@ Name  : OpenMV sensor module (host shim)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Frames come from set_source(iterable) as 2D uint16 RGB565 arrays of the
+   configured frame size (see host.emulator for file loaders).
+2. snapshot() raises NoMoreFrames when the source is exhausted.
+3. skip_frames() does not consume recorded frames.
+"""
+
+import numpy as np
+
+import image
+from _shim import timed
+from host.colorspace import rgb565_to_luma
+
+#Pixel formats
+RGB565 = image.RGB565
+GRAYSCALE = image.GRAYSCALE
+
+#Frame sizes (width, height)
+QQVGA = 1
+QVGA = 2
+VGA = 3
+_FRAME_SIZES = {QQVGA:(160,120),QVGA:(320,240),VGA:(640,480)}
+
+_pixformat = RGB565
+_framesize = QVGA
+_windowing = None
+_framebuffers = 1
+_source = None
+
+
+class NoMoreFrames(Exception):
+    pass
+
+
+#Feed recorded frames into snapshot()
+def set_source(frames):
+    global _source
+    _source = iter(frames)
+
+
+def reset():
+    global _pixformat,_framesize,_windowing,_framebuffers
+    _pixformat,_framesize,_windowing,_framebuffers = RGB565,QVGA,None,1
+
+
+def set_pixformat(pixformat):
+    global _pixformat
+    _pixformat = pixformat
+
+
+def get_pixformat():
+    return _pixformat
+
+
+def set_framesize(framesize):
+    global _framesize,_windowing
+    _framesize = framesize
+    _windowing = None
+
+
+def get_framesize():
+    return _framesize
+
+
+def set_windowing(roi):
+    global _windowing
+    if(len(roi) == 2):
+        w,h = roi
+        fw,fh = _FRAME_SIZES[_framesize]
+        roi = ((fw-w)//2,(fh-h)//2,w,h)
+    _windowing = tuple(roi)
+
+
+def get_windowing():
+    if _windowing is None:
+        return (0,0)+_FRAME_SIZES[_framesize]
+    return _windowing
+
+
+def set_framebuffers(count):
+    global _framebuffers
+    _framebuffers = count
+
+
+def get_framebuffers():
+    return _framebuffers
+
+
+def width():
+    return get_windowing()[2]
+
+
+def height():
+    return get_windowing()[3]
+
+
+def skip_frames(n=None,time=None):
+    pass
+
+
+def set_auto_gain(enable,**kwargs):
+    pass
+
+
+def set_auto_whitebal(enable,**kwargs):
+    pass
+
+
+def set_auto_exposure(enable,**kwargs):
+    pass
+
+
+@timed("sensor.snapshot")
+def snapshot():
+    if _source is None:
+        raise NoMoreFrames("no frame source, call sensor.set_source()")
+    try:
+        frame = next(_source)
+    except StopIteration:
+        raise NoMoreFrames()
+
+    fw,fh = _FRAME_SIZES[_framesize]
+    if(frame.shape != (fh,fw)):
+        raise ValueError("frame is {}x{}, sensor is set to {}x{}".format( \
+                         frame.shape[1],frame.shape[0],fw,fh))
+    x,y,w,h = get_windowing()
+    frame = frame[y:y+h,x:x+w]
+    if(_pixformat == GRAYSCALE):
+        return image.Image(rgb565_to_luma(frame))
+    return image.Image(np.array(frame,dtype=np.uint16))
@@ -0,0 +1,7 @@
+"""
+@@@ Name  : OpenMV ujson module (host shim)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+from json import *
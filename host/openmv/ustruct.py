@@ -0,0 +1,7 @@
+"""
+@@@ Name  : OpenMV ustruct module (host shim)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+from struct import *
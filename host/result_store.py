@@ -0,0 +1,388 @@
+"""
+@@@ Name  : Result Store (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Append-only store of per-frame / per-message measurements:
+   time, device, well, sequence, blob area, intensity, intensity variance, call.
+2. Layout of a store directory:
+   - devices.json : device name -> id
+   - YYYYMMDD.res : one partition per UTC day, HEADER_SIZE bytes header
+                    MAGIC(8s "OMVRES01") VERSION(u16) RECORD_SIZE(u16) BLOCK(u32)
+                    then fixed 32 byte records (RECORD, little endian)
+   - YYYYMMDD.idx : (t_min, t_max) of every complete BLOCK of records
+3. ResultStore memory-maps the partitions; query() only opens the days of
+   the range and only reads the blocks whose (t_min, t_max) overlap it, so
+   records may arrive slightly out of order (several devices).
+4. A truncated last record (writer killed mid-write) is ignored, a missing
+   index tail is rebuilt by the next writer. One writer at a time.
+
+Usage:
+    python -m host.result_store info results/
+    python -m host.result_store query results/ --start 2026-10-01 --stop 2026-10-08 --device bench01
+    python -m host.result_store bench /tmp/results --records 5000000
+"""
+
+import argparse
+import calendar
+import glob
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"OMVRES01"
+VERSION = 1
+HEADER = struct.Struct("<8sHHI")
+HEADER_SIZE = 64
+BLOCK = 4096
+DAY = 86400
+
+RECORD = np.dtype([("t","<f8"),("device","<u2"),("well","u1"),("call","u1"),("seq","<u2"),
+                   ("reserved","<u2"),("blob_area","<u4"),("intensity","<f4"),("intensity_var","<f4"),
+                   ("pad","<u4")])
+INDEX = np.dtype([("t_min","<f8"),("t_max","<f8")])
+
+#call column
+CALLS = ("none","positive","negative")
+CALL_CODES = {name:code for code,name in enumerate(CALLS)}
+
+
+def _partition(store,day):
+    return os.path.join(store,time.strftime("%Y%m%d",time.gmtime(day*DAY)))
+
+
+#Records of a partition file (memory-mapped, truncated tail ignored)
+def _map(path):
+    with open(path,"rb") as f:
+        magic,version,record_size,block = HEADER.unpack(f.read(HEADER.size))
+    if(magic != MAGIC or version != VERSION or record_size != RECORD.itemsize):
+        raise ValueError("{} is not a version {} result partition".format(path,VERSION))
+    n = (os.path.getsize(path)-HEADER_SIZE)//RECORD.itemsize
+    if(n <= 0):
+        return np.zeros(0,dtype=RECORD)
+    return np.memmap(path,dtype=RECORD,mode="r",offset=HEADER_SIZE,shape=(n,))
+
+
+#(t_min, t_max) of every complete block
+def _block_index(records):
+    full = len(records)//BLOCK
+    t = np.asarray(records["t"][:full*BLOCK]).reshape(full,BLOCK)
+    index = np.empty(full,dtype=INDEX)
+    index["t_min"] = t.min(axis=1)
+    index["t_max"] = t.max(axis=1)
+    return index
+
+
+def _load_devices(store):
+    path = os.path.join(store,"devices.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+class ResultWriter:
+    """
+    Buffers records and appends them to the day partitions on flush().
+    """
+
+    def __init__(self,store,buffer_size=65536):
+        self.store = store
+        os.makedirs(store,exist_ok=True)
+        self.devices = _load_devices(store)
+        self.buffer_size = buffer_size
+        self._buf = np.zeros(buffer_size,dtype=RECORD)
+        self._n = 0
+        self._files = {}
+
+    def device_id(self,name):
+        code = self.devices.get(name)
+        if code is None:
+            code = self.devices[name] = len(self.devices)
+            tmp = os.path.join(self.store,"devices.json.tmp")
+            with open(tmp,"w") as f:
+                json.dump(self.devices,f)
+            os.replace(tmp,os.path.join(self.store,"devices.json"))
+        return code
+
+    #One record, e.g. a host.classify row
+    def append(self,t,device,well,blob_area=0,intensity=0.0,intensity_var=0.0,call="none",seq=0):
+        if(self._n == self.buffer_size):
+            self.flush()
+        r = self._buf[self._n]
+        r["t"],r["device"],r["well"],r["call"],r["seq"] = t,self.device_id(device),well,CALL_CODES[call],seq
+        r["blob_area"],r["intensity"],r["intensity_var"] = blob_area,intensity,intensity_var
+        self._n += 1
+
+    #Structured array of RECORD (bulk import)
+    def append_records(self,records):
+        self.flush()
+        self._write(np.asarray(records,dtype=RECORD))
+
+    def flush(self):
+        if self._n:
+            self._write(self._buf[:self._n])
+            self._n = 0
+
+    def _write(self,records):
+        days = (records["t"]//DAY).astype(np.int64)
+        if(len(days) and days[0] == days[-1] and (days == days[0]).all()):
+            self._file(days[0]).write(records)
+            return
+        for day in np.unique(days):
+            self._file(day).write(records[days == day])
+
+    def _file(self,day):
+        f = self._files.get(day)
+        if f is None:
+            f = self._files[day] = _PartitionWriter(_partition(self.store,day))
+        return f
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+
+class _PartitionWriter:
+
+    def __init__(self,path):
+        self.path = path
+        if not os.path.exists(path + ".res"):
+            with open(path + ".res","wb") as f:
+                f.write(HEADER.pack(MAGIC,VERSION,RECORD.itemsize,BLOCK).ljust(HEADER_SIZE,b"\0"))
+
+        #Drop a truncated record, rebuild the index, reload the open block
+        records = _map(path + ".res")
+        n = len(records)
+        if(os.path.getsize(path + ".res") != HEADER_SIZE+n*RECORD.itemsize):
+            os.truncate(path + ".res",HEADER_SIZE+n*RECORD.itemsize)
+        index = _block_index(records)
+        with open(path + ".idx","wb") as f:
+            f.write(index.tobytes())
+        self._block = np.array(records[len(index)*BLOCK:])
+        del records
+
+        self._data = open(path + ".res","ab")
+        self._index = open(path + ".idx","ab")
+
+    def write(self,records):
+        self._data.write(records.tobytes())
+        block = np.concatenate((self._block,records))
+        full = len(block)//BLOCK
+        if full:
+            self._index.write(_block_index(block[:full*BLOCK]).tobytes())
+            block = block[full*BLOCK:]
+        self._block = block
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+
+class ResultStore:
+    """
+    Memory-mapped reader. query() returns a RECORD structured array, so
+    every column is a NumPy array: r["blob_area"], r["t"], ...
+    """
+
+    def __init__(self,store):
+        self.store = store
+        self.devices = _load_devices(store)
+        self.device_names = {code:name for name,code in self.devices.items()}
+        self.partitions = sorted(os.path.splitext(p)[0] for p in glob.glob(os.path.join(store,"*.res")))
+
+    def __len__(self):
+        return sum(len(_map(p + ".res")) for p in self.partitions)
+
+    def _days(self,start,stop):
+        for path in self.partitions:
+            day = calendar.timegm(time.strptime(os.path.basename(path),"%Y%m%d"))
+            if((start is None or day+DAY > start) and (stop is None or day < stop)):
+                yield path
+
+    #Ranges of records whose block may hold times in [start, stop)
+    def _ranges(self,path,records,start,stop):
+        n = len(records)
+        index = np.fromfile(path + ".idx",dtype=INDEX) if os.path.exists(path + ".idx") else \
+                np.zeros(0,dtype=INDEX)
+        index = index[:n//BLOCK]
+        keep = np.ones(len(index),dtype=bool)
+        if start is not None:
+            keep &= index["t_max"] >= start
+        if stop is not None:
+            keep &= index["t_min"] < stop
+        ranges = []
+        for b in np.flatnonzero(keep):
+            lo = int(b)*BLOCK
+            if(ranges and ranges[-1][1] == lo):
+                ranges[-1][1] = lo+BLOCK
+            else:
+                ranges.append([lo,lo+BLOCK])
+        #Blocks without index entry are always scanned
+        lo = len(index)*BLOCK
+        if(lo < n):
+            if(ranges and ranges[-1][1] == lo):
+                ranges[-1][1] = n
+            else:
+                ranges.append([lo,n])
+        return ranges
+
+    def query(self,start=None,stop=None,device=None,well=None):
+        """
+        start/stop: unix time (s), stop excluded
+        device    : device name (or None for all)
+        well      : well number (or None for all)
+        """
+        if device is not None:
+            device = self.devices.get(device,-1)
+        parts = []
+        for path in self._days(start,stop):
+            records = _map(path + ".res")
+            for lo,hi in self._ranges(path,records,start,stop):
+                chunk = records[lo:hi]
+                keep = np.ones(len(chunk),dtype=bool)
+                if start is not None:
+                    keep &= chunk["t"] >= start
+                if stop is not None:
+                    keep &= chunk["t"] < stop
+                if device is not None:
+                    keep &= chunk["device"] == device
+                if well is not None:
+                    keep &= chunk["well"] == well
+                parts.append(np.asarray(chunk[keep]))
+        if not parts:
+            return np.zeros(0,dtype=RECORD)
+        return np.concatenate(parts)
+
+    #Per device and well: count, mean blob area / intensity, share of each call
+    def summary(self,records):
+        keys = records["device"].astype(np.int64)*256 + records["well"]
+        uniq,inverse = np.unique(keys,return_inverse=True)
+        count = np.bincount(inverse,minlength=len(uniq))
+        area = np.bincount(inverse,weights=records["blob_area"],minlength=len(uniq))/np.maximum(count,1)
+        intensity = np.bincount(inverse,weights=records["intensity"],minlength=len(uniq))/np.maximum(count,1)
+        calls = np.bincount(inverse*len(CALLS)+records["call"],minlength=len(uniq)*len(CALLS))
+        calls = calls.reshape(-1,len(CALLS))/np.maximum(count,1)[:,None]
+        rows = []
+        for i,key in enumerate(uniq):
+            row = {"device":self.device_names.get(int(key >> 8),int(key >> 8)),"well":int(key & 0xFF),
+                   "count":int(count[i]),"blob_area":float(area[i]),"intensity":float(intensity[i])}
+            for code,name in enumerate(CALLS):
+                row[name] = float(calls[i,code])
+            rows.append(row)
+        return rows
+
+
+def parse_time(text):
+    if text is None:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S","%Y-%m-%dT%H:%M:%S","%Y-%m-%d"):
+        try:
+            return float(calendar.timegm(time.strptime(text,fmt)))
+        except ValueError:
+            pass
+    raise SystemExit("bad time {!r} (unix seconds or YYYY-MM-DD[ HH:MM:SS] UTC)".format(text))
+
+
+def info(store):
+    s = ResultStore(store)
+    print("devices:{} partitions:{} records:{}".format(len(s.devices),len(s.partitions),len(s)))
+    for path in s.partitions:
+        records = _map(path + ".res")
+        if len(records):
+            print("  {} records:{} {} .. {}".format(os.path.basename(path),len(records),
+                  time.strftime("%H:%M:%S",time.gmtime(records["t"].min())),
+                  time.strftime("%H:%M:%S",time.gmtime(records["t"].max()))))
+
+
+#Write synthetic records (100 devices x 4 wells, 30 days) and time the queries
+def bench(store,n):
+    rng = np.random.default_rng(0)
+    t0 = calendar.timegm((2026,9,1,0,0,0))
+    records = np.zeros(n,dtype=RECORD)
+    records["t"] = np.sort(t0 + rng.uniform(0,30*DAY,n))
+    records["device"] = rng.integers(0,100,n)
+    records["well"] = rng.integers(1,5,n)
+    records["blob_area"] = rng.integers(0,400,n)
+    records["intensity"] = rng.uniform(0,1020,n)
+    records["call"] = np.where(records["blob_area"] >= 200,CALL_CODES["negative"],CALL_CODES["positive"])
+
+    t = time.perf_counter()
+    with ResultWriter(store) as w:
+        for i in range(100):
+            w.device_id("bench%02d" % i)
+        for lo in range(0,n,1 << 20):
+            w.append_records(records[lo:lo+(1 << 20)])
+    print("write {} records: {:.2f}s".format(n,time.perf_counter()-t))
+
+    s = ResultStore(store)
+    for name,start,stop,device in (("1 hour",t0+10*DAY,t0+10*DAY+3600,None),
+                                   ("1 day, 1 device",t0+10*DAY,t0+11*DAY,"bench07"),
+                                   ("30 days",None,None,None),
+                                   ("30 days, 1 device",None,None,"bench07")):
+        t = time.perf_counter()
+        r = s.query(start,stop,device)
+        area = r["blob_area"].mean() if len(r) else 0
+        print("query {:<18} records:{:<10} mean area:{:.1f} {:.3f}s".format(
+              name,len(r),area,time.perf_counter()-t))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append-only measurement store")
+    sub = parser.add_subparsers(dest="cmd",required=True)
+    p = sub.add_parser("info")
+    p.add_argument("store")
+    p = sub.add_parser("query")
+    p.add_argument("store")
+    p.add_argument("--start",help="unix time or YYYY-MM-DD[ HH:MM:SS] (UTC)")
+    p.add_argument("--stop")
+    p.add_argument("--device")
+    p.add_argument("--well",type=int)
+    p.add_argument("--csv",help="write the matching records to a CSV file")
+    p = sub.add_parser("bench")
+    p.add_argument("store")
+    p.add_argument("--records",type=int,default=5000000)
+    args = parser.parse_args()
+
+    if(args.cmd == "info"):
+        info(args.store)
+    elif(args.cmd == "bench"):
+        bench(args.store,args.records)
+    else:
+        s = ResultStore(args.store)
+        r = s.query(parse_time(args.start),parse_time(args.stop),args.device,args.well)
+        if args.csv:
+            with open(args.csv,"w") as f:
+                f.write("t,device,well,seq,blob_area,intensity,intensity_var,call\n")
+                for rec in r:
+                    f.write("{:.3f},{},{},{},{},{:.3f},{:.3f},{}\n".format(
+                            rec["t"],s.device_names.get(int(rec["device"])),rec["well"],rec["seq"],
+                            rec["blob_area"],rec["intensity"],rec["intensity_var"],CALLS[rec["call"]]))
+        print("{:<12}{:>6}{:>10}{:>12}{:>12}{:>10}{:>10}".format(
+              "device","well","count","blob_area","intensity","positive","negative"))
+        for row in s.summary(r):
+            print("{:<12}{:>6}{:>10}{:>12.1f}{:>12.1f}{:>9.1f}%{:>9.1f}%".format(
+                  row["device"],row["well"],row["count"],row["blob_area"],row["intensity"],
+                  100*row["positive"],100*row["negative"]))
+
+
+if __name__ == "__main__":
+    main()
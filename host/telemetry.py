@@ -0,0 +1,107 @@
+"""
+@@@ Name  : Profiler Telemetry Viewer (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Decodes the telemetry frames (TYPE 2) of quad_sample_pipeline.py: one
+   record per profiler stage (COUNT) with min / mean / p99 / max in us
+   over the last profile_window frames on the camera.
+2. Stage names follow profile_stages of the camera script (STAGES here),
+   extra stages are shown by index.
+3. Readings and ASCII packages in the same stream are counted and skipped,
+   so the viewer can share a port with the normal output.
+4. --file decodes a raw UART capture (e.g. host.emulator --uart-out) and
+   prints the last telemetry frame, --port prints every frame as it arrives.
+
+Usage:
+    python -m host.telemetry --port /dev/ttyACM0
+    python -m host.telemetry --file /tmp/uart.bin --all
+"""
+
+import argparse
+import asyncio
+
+from .uart_decoder import FRAME_TELEMETRY,PacketDecoder,SerialReader
+
+#Stage order of profile_stages in quad_sample_pipeline.py
+STAGES = ("snapshot","color","gray","estimators","draw","send","gc","frame")
+FIELDS = ("min","mean","p99","max")
+
+
+#{stage:{min,mean,p99,max}} of one telemetry frame
+def decode_telemetry(frame,stages=STAGES):
+    n = len(frame.values)//max(frame.count,1)
+    if(frame.type != FRAME_TELEMETRY or n != len(FIELDS)):
+        raise ValueError("not a telemetry frame (type %d, %d values per record)" % (frame.type,n))
+    out = {}
+    for s in range(frame.count):
+        name = stages[s] if s < len(stages) else "stage%d" % s
+        out[name] = dict(zip(FIELDS,frame.values[s*n:(s+1)*n]))
+    return out
+
+
+#Table of one telemetry frame (share = mean of the stage / mean frame time)
+def format_table(seq,stats):
+    frame = stats.get("frame",{}).get("mean",0)
+    lines = ["telemetry #%d" % seq,
+             "{:<12}{:>8}{:>8}{:>8}{:>8}{:>8}".format("stage","min","mean","p99","max","share")]
+    for name,row in stats.items():
+        share = 100.0*row["mean"]/frame if frame and name != "frame" else 100.0
+        lines.append("{:<12}{:>8}{:>8}{:>8}{:>8}{:>7.1f}%".format(name,row["min"],row["mean"],
+                                                                 row["p99"],row["max"],share))
+    if frame:
+        lines.append("mean frame %.2f ms -> %.1f FPS" % (frame/1000.0,1e6/frame))
+    return "\n".join(lines)
+
+
+#Telemetry frames of a raw UART capture
+def read_file(path,chunk=1 << 16):
+    decoder = PacketDecoder()
+    frames = []
+    skipped = 0
+    with open(path,"rb") as f:
+        while True:
+            data = f.read(chunk)
+            if not data:
+                break
+            for frame in decoder.feed(data):
+                if(frame.type == FRAME_TELEMETRY):
+                    frames.append(frame)
+                else:
+                    skipped += 1
+    return frames,skipped,decoder
+
+
+#Print every telemetry frame of a serial port
+async def watch_port(path,baudrate):
+    reader = await SerialReader(path,baudrate).start()
+    async for frame in reader:
+        if(frame.type == FRAME_TELEMETRY):
+            print(format_table(frame.seq,decode_telemetry(frame)))
+            print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the profiler telemetry of a camera")
+    parser.add_argument("--port",help="serial device or pty path")
+    parser.add_argument("--baud",type=int,default=115200)
+    parser.add_argument("--file",help="raw UART capture")
+    parser.add_argument("--all",action="store_true",help="print every telemetry frame of --file")
+    args = parser.parse_args()
+    if args.file:
+        frames,skipped,decoder = read_file(args.file)
+        print("%d telemetry frames, %d other frames, %d CRC errors" % (len(frames),skipped,decoder.crc_errors))
+        for frame in (frames if args.all else frames[-1:]):
+            print(format_table(frame.seq,decode_telemetry(frame)))
+            print()
+    elif args.port:
+        asyncio.run(watch_port(args.port,args.baud))
+    else:
+        parser.error("--port or --file is required")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+@@@ Name  : Threshold Tuner (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Searches the LAB thresholds (and area limits) of the camera scripts
+   against labeled frames and writes the best config as JSON, usable with
+   --config of host.classify / host.batch_classifier.
+   - quad  : chemical_thresh, area_thresh_n is solved exactly for every
+             candidate (best cut of the largest blob areas)
+   - single: chemicals_p_thresh, chemicals_n_thresh, p_area_range, n_area_range
+2. Labels are a CSV with source, frame, well and label (or call) columns,
+   e.g. a corrected host.batch_classifier output. Sources are images or
+   frame logs, labels positive / negative (and none for single).
+3. The labeled wells are prepared once (rotation, crop, gaussian, lens_corr
+   like host.classify), converted to LAB with the cached lookup table and
+   stored in a cache directory of .npy files; worker processes memory-map
+   them, so every candidate is only threshold compares + blob labeling
+   (host.blob_engine.find_blobs_masks) over all wells at once.
+4. Search: a grid of +-step around the start point for each threshold,
+   then coordinate descent with halving steps down to 1. All neighbours
+   of a step are scored in parallel by a multiprocessing pool.
+5. --holdout keeps a fraction of the frames out of the search to report
+   the accuracy on unseen frames.
+
+Usage:
+    python -m host.tuner labels.csv -o thresh.json --mode quad --workers 8
+    python -m host.tuner labels.csv -o single.json --mode single --step 8 --holdout 0.2
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import zlib
+
+import numpy as np
+
+from . import classify
+from .blob_engine import find_blobs_masks
+from .colorspace import lab_table
+from .emulator import load_frame
+from .result_store import CALL_CODES,CALLS
+
+#LAB bounds of (Lmin, Lmax, Amin, Amax, Bmin, Bmax)
+LAB_BOUNDS = [(0,100),(0,100),(-128,127),(-128,127),(-128,127),(-128,127)]
+AREA_BOUNDS = (0,65535)
+AREA_STEP_SCALE = 16      # area limits move 16x the LAB step
+
+_samples = None
+_mode = None
+_base = None
+_blob_cache = {}
+
+
+#Tunable parameters of a mode: (config key, index[, index]) and bounds
+def params(mode):
+    if(mode == "quad"):
+        return [(("chemical_thresh",0,k),LAB_BOUNDS[k]) for k in range(6)]
+    out = []
+    for key in ("chemicals_p_thresh","chemicals_n_thresh"):
+        out += [((key,0,k),LAB_BOUNDS[k]) for k in range(6)]
+    for key in ("p_area_range","n_area_range"):
+        out += [((key,k),AREA_BOUNDS) for k in range(2)]
+    return out
+
+
+#Parameter indexes searched together by the grid (one threshold each)
+def grid_blocks(mode):
+    return [range(0,6)] if mode == "quad" else [range(0,6),range(6,12)]
+
+
+def get_vector(config,mode):
+    vector = []
+    for path,_ in params(mode):
+        value = config
+        for p in path:
+            value = value[p]
+        vector.append(int(value))
+    return tuple(vector)
+
+
+def set_vector(config,mode,vector):
+    config = json.loads(json.dumps(config))
+    for (path,_),value in zip(params(mode),vector):
+        target = config
+        for p in path[:-1]:
+            target = target[p]
+        target[path[-1]] = int(value)
+    return config
+
+
+def read_labels(path):
+    rows = []
+    with open(path,newline="") as f:
+        for row in csv.DictReader(f):
+            label = (row.get("label") or row.get("call") or "").strip().lower()
+            if label not in CALL_CODES:
+                continue
+            rows.append((row["source"],int(row.get("frame") or 0),int(row.get("well") or 1),label))
+    return rows
+
+
+def _cache_key(labels_path,mode,config):
+    keys = ("well_rois","rotation") if mode == "quad" else \
+           ("roi","blob_roi","rotation","enable_gaus_smooth","enable_lens_corr","lens_corr_strength",
+            "enable_lens_remap")
+    h = hashlib.sha1()
+    with open(labels_path,"rb") as f:
+        h.update(f.read())
+    h.update(json.dumps([mode]+[config.get(k) for k in keys]).encode())
+    return h.hexdigest()
+
+
+#Prepared wells of every label -> cache_dir/{lab,valid,labels}.npy
+def build_cache(labels_path,mode,config,cache_dir):
+    key = _cache_key(labels_path,mode,config)
+    meta_path = os.path.join(cache_dir,"meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if(json.load(f).get("key") == key):
+                return cache_dir
+
+    rows = read_labels(labels_path)
+    if(mode == "quad"):
+        rows = [r for r in rows if r[3] != "none"]
+        rois = [config["well_rois"][r[2]-1] for r in rows]
+    else:
+        rois = [classify.single_detection(config)[0]]*len(rows)
+    if not rows:
+        raise SystemExit("no usable labels in {}".format(labels_path))
+    h = max(r[3] for r in rois)
+    w = max(r[2] for r in rois)
+    patches = np.zeros((len(rows),h,w),dtype=np.uint16)
+    valid = np.zeros((len(rows),h,w),dtype=bool)
+
+    from .frame_log import FrameLog
+    logs = {}
+    prepared = {}
+    prepare = classify.prepare_quad if mode == "quad" else classify.prepare_single
+    for i,((source,index,_,_),(x,y,rw,rh)) in enumerate(zip(rows,rois)):
+        img = prepared.get((source,index))
+        if img is None:
+            if source.endswith(".flog"):
+                if source not in logs:
+                    logs[source] = FrameLog(source)
+                frame = np.asarray(logs[source][index])
+            else:
+                frame = load_frame(source)
+            prepared.clear()
+            img = prepared[(source,index)] = prepare(frame,config).pixels
+        patch = img[y:y+rh,x:x+rw]
+        patches[i,:patch.shape[0],:patch.shape[1]] = patch
+        valid[i,:patch.shape[0],:patch.shape[1]] = True
+    for log in logs.values():
+        log.close()
+
+    table = lab_table()
+    lab = np.stack([table[c][patches] for c in range(3)])
+    os.makedirs(cache_dir,exist_ok=True)
+    np.save(os.path.join(cache_dir,"lab.npy"),lab)
+    np.save(os.path.join(cache_dir,"valid.npy"),valid)
+    np.save(os.path.join(cache_dir,"labels.npy"),np.array([CALL_CODES[r[3]] for r in rows],dtype=np.uint8))
+    with open(os.path.join(cache_dir,"sources.json"),"w") as f:
+        json.dump([r[:3] for r in rows],f)
+    with open(meta_path,"w") as f:
+        json.dump({"key":key,"mode":mode,"samples":len(rows)},f)
+    return cache_dir
+
+
+class Samples:
+    """
+    Cached LAB wells (memory-mapped) and their labels.
+    """
+
+    def __init__(self,cache_dir,index=None):
+        self.lab = np.load(os.path.join(cache_dir,"lab.npy"),mmap_mode="r")
+        self.valid = np.load(os.path.join(cache_dir,"valid.npy"),mmap_mode="r")
+        self.labels = np.load(os.path.join(cache_dir,"labels.npy"))
+        if index is not None:
+            self.lab = self.lab[:,index]
+            self.valid = self.valid[index]
+            self.labels = self.labels[index]
+
+    def mask(self,threshold):
+        mask = np.array(self.valid)
+        for c in range(3):
+            lo,hi = sorted((threshold[2*c],threshold[2*c+1]))
+            mask &= (self.lab[c] >= lo) & (self.lab[c] <= hi)
+        return mask
+
+    #Pixel counts of the merged blobs of every sample (find_blobs order)
+    def blob_pixels(self,threshold,pixels_threshold,area_threshold):
+        key = (tuple(threshold),pixels_threshold,area_threshold)
+        pixels = _blob_cache.get(key)
+        if pixels is None:
+            if(len(_blob_cache) > 64):
+                _blob_cache.clear()
+            blobs = find_blobs_masks(self.mask(threshold),pixels_threshold=pixels_threshold,
+                                     area_threshold=area_threshold,merge=True)
+            pixels = _blob_cache[key] = [[b[4] for b in found] for found in blobs]
+        return pixels
+
+
+#Best area_thresh_n for the largest blob areas: negative if area >= cut
+def best_area_cut(areas,negative):
+    cuts = np.unique(np.concatenate((areas,areas+1)))
+    neg = np.sort(areas[negative])
+    pos = np.sort(areas[~negative])
+    correct = (len(neg)-np.searchsorted(neg,cuts,side="left")) + np.searchsorted(pos,cuts,side="left")
+    tied = np.flatnonzero(correct == correct.max())
+    best = tied[len(tied)//2]
+    return int(correct[best]),int(cuts[best])
+
+
+def _init_worker(cache_dir,mode,config,index):
+    global _samples,_mode,_base
+    _samples = Samples(cache_dir,index)
+    _mode,_base = mode,config
+    _blob_cache.clear()
+
+
+#Accuracy of one parameter vector -> (accuracy, area_thresh_n or None)
+def score(vector):
+    s = _samples
+    config = set_vector(_base,_mode,vector)
+    if(_mode == "quad"):
+        pixels = s.blob_pixels(config["chemical_thresh"][0],1,1)
+        areas = np.array([max(p) if p else 0 for p in pixels],dtype=np.int64)
+        correct,cut = best_area_cut(areas,s.labels == CALL_CODES["negative"])
+        return correct/len(areas),cut
+
+    _,p_filter,n_filter = classify.single_detection(config)
+    p_lo,p_hi = p_filter[2:]
+    n_lo,n_hi = n_filter[2:]
+    p_pixels = s.blob_pixels(config["chemicals_p_thresh"][0],p_filter[0],p_filter[1])
+    n_pixels = s.blob_pixels(config["chemicals_n_thresh"][0],n_filter[0],n_filter[1])
+    correct = 0
+    for label,ps,ns in zip(s.labels,p_pixels,n_pixels):
+        p_area = n_area = 0
+        for p in ps:
+            if(p_lo < p < p_hi):
+                p_area = p
+        for n in ns:
+            if(n_lo < n < n_hi):
+                n_area = n
+        correct += CALLS[label] == classify.single_call(p_area,n_area)
+    return correct/len(s.labels),None
+
+
+def _clip(value,bounds):
+    return min(max(value,bounds[0]),bounds[1])
+
+
+class Search:
+    """
+    Grid + coordinate descent over the parameter vector of a mode.
+    """
+
+    def __init__(self,mode,evaluate):
+        self.mode = mode
+        self.params = params(mode)
+        self.evaluate = evaluate
+        self.scores = {}
+
+    def _score_all(self,vectors):
+        todo = [v for v in dict.fromkeys(vectors) if v not in self.scores]
+        for v,result in zip(todo,self.evaluate(todo)):
+            self.scores[v] = result
+        return [self.scores[v] for v in vectors]
+
+    def _step(self,i,step):
+        return step*AREA_STEP_SCALE if self.params[i][1] is AREA_BOUNDS else step
+
+    #Best of candidates, keeps current unless strictly better
+    def _pick(self,current,candidates):
+        best = current
+        best_acc = self._score_all([current])[0][0]
+        for v,(acc,_) in zip(candidates,self._score_all(candidates)):
+            if(acc > best_acc):
+                best,best_acc = v,acc
+        return best
+
+    def grid(self,start,step):
+        current = start
+        for block in grid_blocks(self.mode):
+            candidates = []
+            for offsets in itertools.product((-step,0,step),repeat=len(block)):
+                v = list(current)
+                for i,o in zip(block,offsets):
+                    v[i] = _clip(v[i]+o,self.params[i][1])
+                candidates.append(tuple(v))
+            current = self._pick(current,candidates)
+        return current
+
+    def descend(self,start,step):
+        current = start
+        while(step >= 1):
+            while True:
+                candidates = []
+                for i,(_,bounds) in enumerate(self.params):
+                    for d in (self._step(i,step),-self._step(i,step)):
+                        v = list(current)
+                        v[i] = _clip(v[i]+d,bounds)
+                        candidates.append(tuple(v))
+                best = self._pick(current,candidates)
+                if(best == current):
+                    break
+                current = best
+            step //= 2
+        return current
+
+
+def tune(labels_path,mode="quad",config=None,cache_dir=None,workers=None,step=8,holdout=0.0):
+    if not 0 <= holdout < 1:
+        raise ValueError("holdout must be in [0, 1), got {}".format(holdout))
+    config = config or classify.load_config(mode)
+    cache_dir = cache_dir or os.path.splitext(labels_path)[0] + ".tune_cache"
+    t0 = time.perf_counter()
+    build_cache(labels_path,mode,config,cache_dir)
+    t_cache = time.perf_counter()-t0
+
+    #Holdout split by frame (crc of source and frame index)
+    with open(os.path.join(cache_dir,"sources.json")) as f:
+        sources = json.load(f)
+    held = np.array([(zlib.crc32("{}:{}".format(s,i).encode()) % 1000) < holdout*1000
+                     for s,i,_ in sources],dtype=bool)
+    train = np.flatnonzero(~held)
+    if not len(train):
+        raise ValueError("no training samples left ({} samples, holdout {})".format(len(sources),holdout))
+
+    index = train if held.any() else None
+    workers = workers or os.cpu_count()
+    pool = None
+    if(workers == 1):
+        _init_worker(cache_dir,mode,config,index)
+        evaluate = lambda vectors: list(map(score,vectors))
+    else:
+        pool = multiprocessing.Pool(workers,initializer=_init_worker,initargs=(cache_dir,mode,config,index))
+        evaluate = lambda vectors: pool.map(score,vectors,chunksize=max(1,len(vectors)//(4*workers)))
+    try:
+        search = Search(mode,evaluate)
+        start = get_vector(config,mode)
+        best = search.descend(search.grid(start,step),step)
+        start_acc,_ = search.scores[start]
+        best_acc,cut = search.scores[best]
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    result = set_vector(config,mode,best)
+    if cut is not None:
+        result["area_thresh_n"] = cut
+    report = {"samples":len(sources),"train":len(train),"evaluations":len(search.scores),
+              "cache_s":t_cache,"search_s":time.perf_counter()-t0-t_cache,
+              "start_accuracy":start_acc,"best_accuracy":best_acc}
+    if held.any():
+        _init_worker(cache_dir,mode,config,np.flatnonzero(held))
+        report["holdout"] = int(held.sum())
+        report["holdout_start_accuracy"] = score(start)[0]
+        report["holdout_best_accuracy"] = score(best)[0]
+    return result,report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the blob thresholds on labeled frames")
+    parser.add_argument("labels",help="CSV with source, frame, well, label columns")
+    parser.add_argument("-o","--out",required=True,help="output config JSON")
+    parser.add_argument("--mode",choices=("quad","single"),default="quad")
+    parser.add_argument("--config",help="start config JSON (default: camera script values)")
+    parser.add_argument("--cache",help="cache directory (default: <labels>.tune_cache)")
+    parser.add_argument("--workers",type=int,help="processes (default: all cores)")
+    parser.add_argument("--step",type=int,default=8,help="grid / first descent step (LAB units)")
+    parser.add_argument("--holdout",type=float,default=0.0,help="fraction of frames kept out")
+    args = parser.parse_args()
+    if not 0 <= args.holdout < 1:
+        parser.error("--holdout must be in [0, 1)")
+
+    config = classify.load_config(args.mode,args.config)
+    try:
+        result,report = tune(args.labels,args.mode,config,args.cache,args.workers,args.step,args.holdout)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    with open(args.out,"w") as f:
+        json.dump(result,f,indent=1)
+    print("samples:{} train:{} evaluations:{} cache:{:.1f}s search:{:.1f}s".format(
+          report["samples"],report["train"],report["evaluations"],report["cache_s"],report["search_s"]))
+    print("accuracy {:.1f}% -> {:.1f}%".format(100*report["start_accuracy"],100*report["best_accuracy"]))
+    if "holdout" in report:
+        print("holdout ({}) {:.1f}% -> {:.1f}%".format(report["holdout"],100*report["holdout_start_accuracy"],
+                                                      100*report["holdout_best_accuracy"]))
+    for key in ("chemical_thresh","area_thresh_n") if args.mode == "quad" else \
+               ("chemicals_p_thresh","chemicals_n_thresh","p_area_range","n_area_range"):
+        print("{}: {} -> {}".format(key,config[key],result[key]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""
+@@@ Name  : UART Packet Decoder (host)
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+"""
+
+"""
+Remark:
+1. Decodes both formats of the README from a byte stream:
+   - ASCII packages "A" + index + 2 x "XXXX" + "B" (uart_package_manager)
+   - binary frames 0xA5 0x5A ... CRC16 (uart_frame_builder)
+2. ASCII packages 1..k are reassembled into one reading of 2k values.
+   Without ascii_wells, k is learned from the stream: the first reading is
+   emitted when package 1 follows a complete run 1..k, and k is learned
+   again if a higher package index shows up later.
+3. Parsing is incremental: feed() accepts any chunk size and resyncs on
+   the delimiters / sync bytes after noise or corruption.
+4. SerialReader reads a serial port or pty with asyncio (Linux, no pyserial).
+
+Usage:
+    python -m host.uart_decoder --port /dev/ttyACM0
+    python -m host.uart_decoder --port /dev/ttyACM0 --ascii-wells 12
+    python -m host.uart_decoder --loopback 20000    # pty self test + throughput
+"""
+
+import argparse
+import asyncio
+import binascii
+import os
+import struct
+import termios
+import time
+import tty
+from collections import namedtuple
+
+#ASCII package
+ASCII_START = 0x41        # "A"
+ASCII_STOP = 0x42         # "B"
+ASCII_SIZE = 11
+ASCII_SAMPLE_DIGITS = 4
+ASCII_MAX_PACKAGES = 48   # 96 wells
+
+#Binary frame
+FRAME_SYNC = b"\xa5\x5a"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<BBBBHHB")    # sync1 sync2 version type length seq count
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+FRAME_CRC_SIZE = 2
+FRAME_MAX_LENGTH = 2*255*8                  # Largest payload accepted before resync
+
+#Frame types
+FRAME_READING = 1
+FRAME_TELEMETRY = 2       # Profiler stage times (quad_sample_pipeline.py, host.telemetry)
+FRAME_ACK = 3             # Command acknowledgement (host.command)
+
+#One decoded reading/frame: values is a tuple of ints (count x values per record)
+Frame = namedtuple("Frame","type seq count values")
+
+_DIGITS = frozenset(b"0123456789")
+
+
+#CRC16-CCITT (poly 0x1021, init 0xFFFF), same as crc16() on the camera
+def crc16(data):
+    return binascii.crc_hqx(data,0xFFFF)
+
+
+#Binary frame with every value, same layout as uart_frame_builder()
+def encode_frame(values,seq=0,frame_type=FRAME_READING,count=None):
+    if count is None:
+        count = len(values)
+    payload = struct.pack("<%dH" % len(values),*values)
+    head = FRAME_HEADER.pack(0xA5,0x5A,FRAME_VERSION,frame_type,len(payload),seq & 0xFFFF,count)
+    body = head + payload
+    return body + struct.pack("<H",crc16(body[2:]))
+
+
+#ASCII packages of one reading, same layout as uart_package_manager()
+def encode_ascii(values):
+    packages = []
+    for k in range(0,len(values),2):
+        pair = list(values[k:k+2]) + [0]*(2-len(values[k:k+2]))
+        packages.append(b"A%c%04d%04dB" % (0x31+k//2,pair[0],pair[1]))
+    return packages
+
+
+class PacketDecoder:
+    """
+    Incremental decoder of the UART stream.
+
+    feed(data) returns the list of complete Frames found so far. Bytes are
+    kept in one bytearray and parsed through a memoryview; consumed bytes
+    are dropped in bulk so the cost stays linear in the stream length.
+    """
+
+    def __init__(self,ascii_wells=None):
+        #None: number of ASCII packages per reading learned from the stream
+        self.ascii_auto = ascii_wells is None
+        self.ascii_packages = None if self.ascii_auto else (ascii_wells+1)//2
+        self._buf = bytearray()
+        self._pos = 0
+        self._pending = [] if self.ascii_auto else [None]*self.ascii_packages
+        self._next_package = 1
+        self._ascii_seq = 0
+        self._last_seq = None
+        self._formats = {}
+
+        #Counters
+        self.frames = 0
+        self.crc_errors = 0
+        self.resyncs = 0
+        self.dropped = 0
+
+    def feed(self,data):
+        buf = self._buf
+        buf += data
+        out = []
+        view = memoryview(buf)
+        try:
+            self._parse(buf,view,out)
+        finally:
+            view.release()
+
+        #Drop consumed bytes once they dominate the buffer
+        if(self._pos > 4096 or self._pos == len(buf)):
+            del buf[:self._pos]
+            self._pos = 0
+        return out
+
+    def _parse(self,buf,view,out):
+        pos = self._pos
+        end = len(buf)
+        #Next position of each marker, searched again only once pos passes it
+        #(-1: none left in this chunk), so a stream without one is scanned once
+        a = buf.find(ASCII_START,pos)
+        s = buf.find(FRAME_SYNC,pos)
+        while(pos < end):
+            if(0 <= a < pos):
+                a = buf.find(ASCII_START,pos)
+            if(0 <= s < pos):
+                s = buf.find(FRAME_SYNC,pos)
+            if(a < 0 and s < 0):
+                #Keep a possible first sync byte for the next chunk
+                if(buf[end-1] == 0xA5):
+                    pos = end-1
+                else:
+                    pos = end
+                break
+            if(s < 0 or (0 <= a < s)):
+                if(a > pos):
+                    self.resyncs += 1
+                pos = a
+                if(end-pos < ASCII_SIZE):
+                    break
+                if(self._ascii(buf,pos,out)):
+                    pos += ASCII_SIZE
+                else:
+                    pos += 1
+                    self.resyncs += 1
+            else:
+                if(s > pos):
+                    self.resyncs += 1
+                pos = s
+                if(end-pos < FRAME_HEADER_SIZE):
+                    break
+                size = self._frame(buf,view,pos,out)
+                if(size == 0):
+                    break
+                if(size < 0):
+                    pos += 1
+                else:
+                    pos += size
+        self._pos = pos
+
+    #Returns frame size, 0 if incomplete, -1 if invalid
+    def _frame(self,buf,view,pos,out):
+        _,_,version,frame_type,length,seq,count = FRAME_HEADER.unpack_from(buf,pos)
+        if(version != FRAME_VERSION or length & 1 or length > FRAME_MAX_LENGTH):
+            self.resyncs += 1
+            return -1
+        size = FRAME_HEADER_SIZE+length+FRAME_CRC_SIZE
+        if(len(buf)-pos < size):
+            return 0
+        crc_at = pos+FRAME_HEADER_SIZE+length
+        if(crc16(view[pos+2:crc_at]) != (buf[crc_at] | (buf[crc_at+1] << 8))):
+            self.crc_errors += 1
+            return -1
+
+        fmt = self._formats.get(length)
+        if(fmt is None):
+            fmt = self._formats[length] = struct.Struct("<%dH" % (length//2))
+        values = fmt.unpack_from(buf,pos+FRAME_HEADER_SIZE)
+
+        if(frame_type == FRAME_READING):
+            if(self._last_seq is not None):
+                self.dropped += (seq-self._last_seq-1) & 0xFFFF
+            self._last_seq = seq
+        self.frames += 1
+        out.append(Frame(frame_type,seq,count,values))
+        return size
+
+    #Returns True if buf[pos:pos+11] is a valid ASCII package
+    def _ascii(self,buf,pos,out):
+        if(buf[pos+ASCII_SIZE-1] != ASCII_STOP):
+            return False
+        index = buf[pos+1]-0x30
+        limit = ASCII_MAX_PACKAGES if self.ascii_auto else self.ascii_packages
+        if(index < 1 or index > limit):
+            return False
+        for i in range(pos+2,pos+ASCII_SIZE-1):
+            if(buf[i] not in _DIGITS):
+                return False
+        pair = (int(buf[pos+2:pos+6]),int(buf[pos+6:pos+10]))
+
+        if(self.ascii_packages is not None and index > self.ascii_packages):
+            #More packages than learned (auto only): learn again from the next package 1
+            self.ascii_packages = None
+            self._pending = []
+            self._next_package = 1
+            return True
+        if(self.ascii_packages is None):
+            if(index != 1 or self._next_package == 1):
+                #Collect a run 1..k, restart on a gap
+                if(index != self._next_package):
+                    self._pending = []
+                    self._next_package = 1
+                    if(index != 1):
+                        return True
+                self._pending.append(pair)
+                self._next_package = index+1
+                return True
+            #Package 1 again: the run before it is one reading
+            self.ascii_packages = len(self._pending)
+            self._ascii_reading(self._pending,out)
+            self._pending = [None]*self.ascii_packages
+            self._next_package = 1
+
+        #Reassemble packages 1..k in order, restart on a gap
+        if(index != self._next_package):
+            if(self._next_package != 1):
+                self.dropped += 1
+            self._next_package = 1
+            if(index != 1):
+                return True
+        self._pending[index-1] = pair
+        if(index == self.ascii_packages):
+            self._ascii_reading(self._pending,out)
+            self._next_package = 1
+        else:
+            self._next_package = index+1
+        return True
+
+    def _ascii_reading(self,pairs,out):
+        values = []
+        for pair in pairs:
+            values.extend(pair)
+        self._ascii_seq = (self._ascii_seq+1) & 0xFFFF
+        self.frames += 1
+        out.append(Frame(FRAME_READING,self._ascii_seq,len(values),tuple(values)))
+
+
+#Open a serial device / pty in raw non-blocking mode
+def open_tty(path,baudrate=115200):
+    fd = os.open(path,os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    tty.setraw(fd)
+    speed = getattr(termios,"B%d" % baudrate,None)
+    if speed is not None:
+        attrs = termios.tcgetattr(fd)
+        attrs[4] = attrs[5] = speed
+        termios.tcsetattr(fd,termios.TCSANOW,attrs)
+    return fd
+
+
+#pty pair for loopback testing: returns (master fd, slave fd, slave path)
+def open_pty_pair():
+    master,slave = os.openpty()
+    tty.setraw(master)
+    os.set_blocking(master,False)
+    path = os.ttyname(slave)
+    tty.setraw(slave)
+    return master,slave,path
+
+
+class SerialReader:
+    """
+    Reads one serial port with loop.add_reader() and decodes it.
+
+    on_frame(reader, frame) is called for every decoded Frame. Without a
+    callback, frames are queued and can be consumed with `async for`.
+    """
+
+    def __init__(self,path,baudrate=115200,decoder=None,on_frame=None,name=None):
+        self.path = path
+        self.baudrate = baudrate
+        self.name = name or path
+        self.decoder = decoder or PacketDecoder()
+        self.on_frame = on_frame
+        self.bytes = 0
+        self.closed = None
+        self._fd = None
+        self._queue = None
+        self._loop = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.closed = self._loop.create_future()
+        if self.on_frame is None:
+            self._queue = asyncio.Queue()
+        self._fd = open_tty(self.path,self.baudrate)
+        self._loop.add_reader(self._fd,self._on_readable)
+        return self
+
+    def close(self):
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+            if self._queue is not None:
+                self._queue.put_nowait(None)
+            if not self.closed.done():
+                self.closed.set_result(self.bytes)
+
+    #Send bytes to the camera (commands), waits with loop.add_writer() while the tty is full
+    async def write(self,data):
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[os.write(self._fd,view):]
+            except BlockingIOError:
+                writable = self._loop.create_future()
+                self._loop.add_writer(self._fd,lambda: writable.done() or writable.set_result(None))
+                try:
+                    await writable
+                finally:
+                    self._loop.remove_writer(self._fd)
+
+    #Stop reading (backpressure): the stream waits in the kernel tty buffer
+    def pause(self):
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+
+    def resume(self):
+        if self._fd is not None:
+            self._loop.add_reader(self._fd,self._on_readable)
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._fd,65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            #pty master closed / device unplugged
+            data = b""
+        if not data:
+            self.close()
+            return
+        self.bytes += len(data)
+        frames = self.decoder.feed(data)
+        if self._queue is not None:
+            for frame in frames:
+                self._queue.put_nowait(frame)
+        else:
+            for frame in frames:
+                self.on_frame(self,frame)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        frame = await self._queue.get()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+
+#Print every frame of a serial port
+async def monitor(path,baudrate,ascii_wells=None):
+    reader = await SerialReader(path,baudrate,PacketDecoder(ascii_wells)).start()
+    async for frame in reader:
+        print("#{} type:{} count:{} values:{}".format(frame.seq,frame.type,frame.count,frame.values))
+
+
+#Write frames into a pty and decode them on the other side
+async def loopback(n,wells=4):
+    master,slave,path = open_pty_pair()
+    received = [0]
+    reader = SerialReader(path,decoder=PacketDecoder(wells),
+                          on_frame=lambda r,f: received.__setitem__(0,received[0]+1))
+    await reader.start()
+    os.close(slave)
+
+    frames = [encode_frame([(i+k) & 0x3FF for k in range(wells)],seq=i) for i in range(min(n,0x10000))]
+    packages = b"".join(encode_ascii(range(wells)))
+    t0 = time.perf_counter()
+    for i in range(n):
+        #Alternate binary frames and ASCII package pairs
+        chunk = frames[(i >> 1) % len(frames)] if i & 1 else packages
+        while chunk:
+            try:
+                chunk = chunk[os.write(master,chunk):]
+            except BlockingIOError:
+                await asyncio.sleep(0)
+        if(i & 63 == 0):
+            await asyncio.sleep(0)
+
+    deadline = time.perf_counter()+10
+    while(received[0] < n and time.perf_counter() < deadline):
+        await asyncio.sleep(0.001)
+    dt = time.perf_counter()-t0
+    reader.close()
+    os.close(master)
+    d = reader.decoder
+    print("frames:{}/{} crc_errors:{} resyncs:{} dropped:{} -> {:.0f} frames/s".format(
+        received[0],n,d.crc_errors,d.resyncs,d.dropped,received[0]/dt))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode the COVID19-Tester UART stream")
+    parser.add_argument("--port",help="serial device or pty path")
+    parser.add_argument("--baud",type=int,default=115200)
+    parser.add_argument("--ascii-wells",type=int,help="values per ASCII reading (default: learned from the stream)")
+    parser.add_argument("--loopback",type=int,metavar="N",help="pty self test with N frames")
+    args = parser.parse_args()
+    if(args.ascii_wells is not None and not 1 <= args.ascii_wells <= 2*ASCII_MAX_PACKAGES):
+        parser.error("--ascii-wells must be 1..{}".format(2*ASCII_MAX_PACKAGES))
+    if args.loopback:
+        asyncio.run(loopback(args.loopback,args.ascii_wells or 4))
+    elif args.port:
+        asyncio.run(monitor(args.port,args.baud,args.ascii_wells))
+    else:
+        parser.error("--port or --loopback is required")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,11 @@ Remark:
 1. Message of four samples (string) will be sent every 500ms.
 2. Message header = "A" and Message tail = "B"
 3. Each sample will be represented by a constant of four digits length.
+4. Wells are described by well_rois, any number of wells (4/24/48/96) is supported.
+5. uart_binary_frame sends every well in one binary frame with CRC16 instead.
+6. enable_windowing reads out only the bounding box of well_rois from the
+   sensor (well_rois are given in full QVGA coordinates and rebased to the
+   window at startup, the image is not rotated).
 """
 
 """
@@ -23,7 +28,9 @@ Image rotation:
 import sensor, image, time
 import pyb
 from pyb import UART
-import ustruct
+import array
+from quad_sample_common import roi_window,rebase_rois,frame_builder,frame_type_reading, \
+                               frame_header_size,uart_package_manager,message_padding
 
 #System wakeup GPIO
 ready = pyb.Pin("P2",pyb.Pin.OUT_PP)
@@ -38,18 +45,31 @@ sensor.skip_frames(time = 2000)
 #FPS Clock
 clock = time.clock()
 
-#Digital Zoom Areas
-area1_xmin, area1_ymin, area1_h, area1_w = 22,84,30,38
-area2_xmin, area2_ymin, area2_h, area2_w = 96,area1_ymin,area1_h,area1_w
-area3_xmin, area3_ymin, area3_h, area3_w = 172,area1_ymin,area1_h,area1_w
-area4_xmin, area4_ymin, area4_h, area4_w = 250,area1_ymin,area1_h,area1_w
+#Digital Zoom Areas (x,y,w,h), one entry per well
+well_rois = [(22,84,38,30),
+             (96,84,38,30),
+             (172,84,38,30),
+             (250,84,38,30)]
+#24-well plate (plate_rois from quad_sample_common): well_rois = plate_rois(16,30,38,30,50,50,6,4)
+#96-well plate: well_rois = plate_rois(10,10,22,16,25,28,12,8)
+
+#Sensor Windowing (read out the well band only)
+enable_windowing = True   # ON/OFF Sensor windowing
+window_margin = 2         # Pixels kept around the ROIs
+sensor_window = (0,0,sensor.width(),sensor.height())
+if enable_windowing:
+    sensor_window = roi_window(well_rois,window_margin,sensor.width(),sensor.height())
+    sensor.set_windowing(sensor_window)
+    well_rois = rebase_rois(well_rois,sensor_window)
+    sensor.skip_frames(time = 200)
 
 #System Control Variables
 enable_roi = True         # ON/OFF Digital Zoom
-area_counter = 1          # Area Indicator
+scan_all_areas = True     # Measure all wells on every snapshot (False -> one well per dwell_frames)
+well_index = 0            # Well Indicator
 max_FPS = 19              # FPS for this program
-delay = 0                 # Delay counter
-max_area_num = 4          # Total number of digital zoom areas
+dwell_frames = 3          # Frames for each well (2 is shortest)
+well_num = len(well_rois) # Total number of wells
 message_index = 0         # UART Message index
 uart_msg_start = "A"      # UART Message header
 uart_msg_tail = "B"       # UART Message tailer
@@ -62,52 +82,29 @@ uart = UART(1,115200)
 uart_led = pyb.LED(3)
 uart_led_status = False
 uart_package_index = 1
+uart_package_num = (well_num+1)//2   # Two samples per package
+uart_binary_frame = True             # All wells in one binary frame (False -> ASCII packages)
+
+#Binary UART frame (see README and quad_sample_common.py)
+frame_seq = 0                        # Frame sequence number
+uart_frame = bytearray(frame_header_size+2*well_num+2)
 
 #Blob Detection
 chemical_thresh = [(44, 100, 70, -124, 28, 80)]  #Blob Detection Threshold
 
 area_thresh_n = 200                             #Detection area threshold for negative samples
 
-area1_total_n = 0                               #Area1 Total area for negative samples
-area1_total_p = 0                               #Area1 Total area for positive samples
-area1_num = 0                                   #Sample size
-
-area2_total_n = 0                               #Area2 Total area for negative samples
-area2_total_p = 0                               #Area2 Total area for positive samples
-area2_num = 0                                   #Sample size
-
-area3_total_n = 0                               #Area3 Total area for negative samples
-area3_total_p = 0                               #Area3 Total area for positive samples
-area3_num = 0                                   #Sample size
-
-area4_total_n = 0                               #Area4 Total area for negative samples
-area4_total_p = 0                               #Area4 Total area for positive samples
-area4_num = 0                                   #Sample size
-
-#UART Message Packet Control
-def uart_package_manager(system_msg):
-    global uart_package_index
-    head,tail = system_msg[0],system_msg[-1]
-    data_index = '0'
-    sample_1 = '0000'
-    sample_2 = '0000'
-
-    if(uart_package_index == 1):
-        # Only send sample 1 & 2
-        data_index = str(uart_package_index)
-        sample_1 = system_msg[1:5]
-        sample_2 = system_msg[5:9]
-        uart_package_index = 2
-    else:
-        # Only send sample 3 & 4
-        data_index = str(uart_package_index)
-        sample_1 = system_msg[9:13]
-        sample_2 = system_msg[13:17]
-        uart_package_index = 1
-
+well_total_n = array.array('L',[0]*well_num)    #Total area for negative samples of each well
+well_samples = array.array('H',[0]*well_num)    #Sample size of each well
+well_result = array.array('H',[0]*well_num)     #Averaged area of each well (last message)
+well_blob = [None]*well_num                     #Largest blob of each well (visualization)
 
-    msg = head + data_index + sample_1 + sample_2 + tail
-    return msg
+#Binary UART frame carrying every well, built in place in uart_frame
+def uart_frame_builder(values):
+    global frame_seq
+    frame_builder(uart_frame,frame_type_reading,frame_seq,values,len(values))
+    frame_seq = (frame_seq+1) & 0xFFFF
+    return uart_frame
 
 
 #UART LED Control
@@ -120,31 +117,50 @@ def uart_led_control(led,enable=True):
             led.off()
         uart_led_status = not(uart_led_status)
 
-#Function to ensure a integer value is padded to constant length string
-def message_padding(int_msg,fixed_length):
-    x = 0
-    pad_msg = "0"
-    zero = "0"
-
-    #Find number of zeros needed
-    l = len(str(int_msg))
-    zeros = fixed_length - l
 
-    #Padding
-    while(x<(zeros-1)):
-        pad_msg += zero
-        x += 1
-
-    #Add original msg after padding
-    if(zeros>0):
-        pad_msg += str(int_msg)
+#Blob Detection Core (largest blob area of one well)
+def measure_well(img,i):
+    blob_area_max = 0
+    well_blob[i] = None
+    for blob in img.find_blobs(chemical_thresh,roi=well_rois[i],pixels_threshold=1, \
+                               area_threshold=1, merge=True):
+        if(blob[4]>blob_area_max):
+            blob_area_max = blob[4]
+            well_blob[i] = blob
+    return blob_area_max
+
+
+#Average every well and send the message
+def send_message():
+    global message_index,uart_package_index
+    for i in range(well_num):
+        #Take average for negative samples
+        well_result[i] = min(int(well_total_n[i]/well_samples[i]),0xFFFF)
+        well_total_n[i] = 0
+        well_samples[i] = 0
+        print("Area{}:".format(i+1),well_result[i])
+
+    if uart_binary_frame:
+        uart_message = uart_frame_builder(well_result)
+        print("#{} Sent through UART->: {} bytes\r\n".format(message_index,len(uart_message)))
     else:
-        pad_msg = str(int_msg)
-    return pad_msg
+        msg = uart_msg_start
+        for i in range(well_num):
+            msg += message_padding(well_result[i],4)
+        msg += uart_msg_tail
+        print("#{} Message->: {}".format(message_index,msg))
+        uart_message,uart_package_index = uart_package_manager(msg,uart_package_index,uart_package_num)
+        print("#{} Sent through UART->: {}\r\n".format(message_index,uart_message))
 
+    # Send UART message
+    uart.write(uart_message)
+    uart_led_control(uart_led)
+    message_index += 1
 
-#Capture and Loop
-while(True):
+
+#Process one frame
+def step():
+    global well_index
 
     #FPS Counter
     clock.tick()
@@ -158,207 +174,50 @@ while(True):
     #Image Rotation
     img = img.replace(img,vflip=False,hmirror=False,transpose=False)
 
-    #Frames for each area (2 is shortest)
-    f = int(max_FPS/1)
-    f = 3
-
-
-    if enable_roi:
-        #Zoom to different defined area
-        if(area_counter == 1):
-
-            #Area 1
-            img = img.crop(roi=(area1_xmin, area1_ymin,area1_w,area1_h))
-
-            #Blob Detection Core
-            areas_in_blob_n = []
-            areas_in_blob_p = []
-            blob_rect = None
-
-            for blob in img.find_blobs(chemical_thresh,pixels_threshold=1, \
-                                       area_threshold=1, merge=True):
-                blob_area = blob[4]
-                blob_rect = blob.rect()
-                blob_cx,blob_cy = blob.cx(), blob.cy()
-                #print("Area:{} CX:{} CY:{}".format(blob_area,blob_cx,blob_cy))
-                areas_in_blob_n.append(blob_area)
-
-            #Finding average for negative/positive
-            if(len(areas_in_blob_n)>0):
-                area1_total_n += max(areas_in_blob_n)
-            else:
-                if(len(areas_in_blob_p)>0):
-                    area1_total_p += max(areas_in_blob_p)
-            area1_num += 1
-
-            if(delay == (f-1)):
-                #Only send once before the end of this period
-                #Take average and majority for negative/positive
-                if(area1_total_n == 0):
-                    area1 = message_padding(int(area1_total_p/area1_num),4)
-                else:
-                    area1 = message_padding(int(area1_total_n/area1_num),4)
-                print("Area1:",area1)
-                uart_msg_start  += area1
-                area1_total_p = 0
-                area1_total_n = 0
-                area1_num = 0
-                #Visualize detection result
-                img = img.draw_string(1,1,"1",color=(255,0,0))
-                if blob_rect is not None:
-                    img = img.draw_rectangle(blob_rect,color=(255,0,0))
-
-
-        if(area_counter == 2):
-            #Area 2
-            img = img.crop(roi=(area2_xmin, area2_ymin,area2_w,area2_h))
-
-            #Blob Detection Core
-            areas_in_blob_n = []
-            areas_in_blob_p = []
-            blob_rect = None
-
-
-            for blob in img.find_blobs(chemical_thresh,pixels_threshold=1, \
-                                       area_threshold=1, merge=True):
-                blob_area = blob[4]
-                blob_rect = blob.rect()
-                blob_cx,blob_cy = blob.cx(), blob.cy()
-                #print("Area:{} CX:{} CY:{}".format(blob_area,blob_cx,blob_cy))
-                areas_in_blob_n.append(blob_area)
-
-
-
-            #Finding average for negative/positive
-            if(len(areas_in_blob_n)>0):
-                area2_total_n += max(areas_in_blob_n)
-            else:
-                if(len(areas_in_blob_p)>0):
-                    area2_total_p += max(areas_in_blob_p)
-            area2_num += 1
-
-            if(delay == (f-1)):
-                #Only send once before the end of this period
-                #Take average and majority for negative/positive
-                if(area2_total_n == 0):
-                    area2 = message_padding(int(area2_total_p/area2_num),4)
-                else:
-                    area2 = message_padding(int(area2_total_n/area2_num),4)
-
-                print("Area2:",area2)
-                uart_msg_start  += area2
-                area2_total_p = 0
-                area2_total_n = 0
-                area2_num = 0
-                #Visualize detection result
-                img = img.draw_string(1,1,"2",color=(255,0,0))
-                if blob_rect is not None:
-                    img = img.draw_rectangle(blob_rect,color=(255,0,0))
-
-        if(area_counter == 3):
-            #Area 3
-            img = img.crop(roi=(area3_xmin, area3_ymin,area3_w,area1_h))
-
-            #Blob Detection Core
-            areas_in_blob_n = []
-            areas_in_blob_p = []
-            blob_rect = None
-
-            for blob in img.find_blobs(chemical_thresh,pixels_threshold=1, \
-                                       area_threshold=1, merge=True):
-                blob_area = blob[4]
-                blob_rect = blob.rect()
-                blob_cx,blob_cy = blob.cx(), blob.cy()
-                #print("Area:{} CX:{} CY:{}".format(blob_area,blob_cx,blob_cy))
-                areas_in_blob_n.append(blob_area)
-
-            #Finding average for negative/positive
-            if(len(areas_in_blob_n)>0):
-                area3_total_n += max(areas_in_blob_n)
-            else:
-                if(len(areas_in_blob_p)>0):
-                    area3_total_p += max(areas_in_blob_p)
-            area3_num += 1
-
-            if(delay == (f-1)):
-                #Only send once before the end of this period
-                #Take average and majority for negative/positive
-                if(area3_total_n == 0):
-                    area3 = message_padding(int(area3_total_p/area3_num),4)
-                else:
-                    area3 = message_padding(int(area3_total_n/area3_num),4)
-
-                print("Area3:",area3)
-                uart_msg_start  += area3
-                area3_total_p = 0
-                area3_total_n = 0
-                area3_num = 0
-                #Visualize detection result
-                img = img.draw_string(1,1,"3",color=(255,0,0))
-                if blob_rect is not None:
-                    img = img.draw_rectangle(blob_rect,color=(255,0,0))
-
-        if(area_counter == 4):
-            #Area 4
-            img = img.crop(roi=(area4_xmin, area4_ymin,area4_w,area4_h))
-
-            #Blob Detection Core
-            areas_in_blob_n = []
-            areas_in_blob_p = []
-            blobk_rect = None
-
-            for blob in img.find_blobs(chemical_thresh,pixels_threshold=1, \
-                                       area_threshold=1, merge=True):
-                blob_area = blob[4]
-                blob_rect = blob.rect()
-                blob_cx,blob_cy = blob.cx(), blob.cy()
-                #print("Area:{} CX:{} CY:{}".format(blob_area,blob_cx,blob_cy))
-                areas_in_blob_n.append(blob_area)
-
-            #Finding average for negative/positive
-            if(len(areas_in_blob_n)>0):
-                area4_total_n += max(areas_in_blob_n)
-            else:
-                if(len(areas_in_blob_p)>0):
-                    area4_total_p += max(areas_in_blob_p)
-            area4_num += 1
-
-            if(delay == (f-1)):
-                #Only send once before the end of this period
-                #Take average and majority for negative/positive
-                if(area4_total_n == 0):
-                    area4 = message_padding(int(area4_total_p/area4_num),4)
-                else:
-                    area4 = message_padding(int(area4_total_n/area4_num),4)
-
-                print("Area4:",area4)
-                uart_msg_start  += area4
-                uart_msg_start  += uart_msg_tail
-                area4_total_p = 0
-                area4_total_n = 0
-                area4_num = 0
-                #Visualize detection result
-                img = img.draw_string(1,1,"4",color=(255,0,0))
-                if blob_rect is not None:
-                    img = img.draw_rectangle(blob_rect,color=(255,0,0))
-
-        if(area_counter == (max_area_num+1)):
-            #Reset
-            area_counter = 1
-
-            # Send UART message
-            print("#{} Message->: {}".format(message_index,uart_msg_start))
-            uart_message = uart_package_manager(uart_msg_start)
-            print("#{} Sent through UART->: {}\r\n".format(message_index,uart_message))
-            uart.write(uart_message)
-            uart_led_control(uart_led)
-            uart_msg_start = "A"
-            message_index += 1
-
-        #Frame Delay
-        if(delay == f):
-            delay = 0
-            area_counter += 1
-
-    delay += 1
+    #Frames for each well
+    f = dwell_frames
+
+    #Wells measured on this snapshot
+    if scan_all_areas:
+        first,last = 0,well_num
+    else:
+        first,last = well_index,well_index+1
+
+    for i in range(first,last):
+        well_total_n[i] += measure_well(img,i)
+        well_samples[i] += 1
+
+    #Visualize detection result
+    if scan_all_areas:
+        for i in range(well_num):
+            img.draw_rectangle(well_rois[i],color=(0,255,0))
+            if well_blob[i] is not None:
+                img.draw_rectangle(well_blob[i].rect(),color=(255,0,0))
+    elif enable_roi:
+        #Zoom to the current well
+        blob = well_blob[well_index]
+        img = img.crop(roi=well_rois[well_index])
+        img = img.draw_string(1,1,str(well_index+1),color=(255,0,0))
+        if blob is not None:
+            x,y,w,h = blob.rect()
+            img = img.draw_rectangle((x-well_rois[well_index][0],y-well_rois[well_index][1],w,h), \
+                                     color=(255,0,0))
+
+    #Frame Delay
+    if(well_samples[last-1] >= f):
+        well_index = last
+        if(well_index == well_num):
+            well_index = 0
+            send_message()
+
+    return img
+
+
+#Capture and Loop
+def main():
+    while(True):
+        step()
+
 
+if __name__ == "__main__":
+    main()
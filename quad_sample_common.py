@@ -0,0 +1,118 @@
+"""
+@@@ Name  : Quad COVID-19 Samples Common Helpers
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+@@@ MCU   : STM32H743
+"""
+
+"""
+Remark:
+1. Shared by quad_sample_classifier.py, quad_sample_intensity.py and
+   quad_sample_pipeline.py: ROI tables, sensor windowing, the binary UART
+   frame (CRC16) and the ASCII packages.
+2. Copy this file to the camera (flash or SD card) next to the script,
+   MicroPython imports it from there.
+"""
+
+import ustruct
+import array
+
+#Binary UART frame (see README), little endian
+#SYNC(0xA5 0x5A) VERSION TYPE LENGTH(u16) SEQ(u16) COUNT(u8) | LENGTH/2 x u16 | CRC16(u16)
+frame_version = 1                    # Frame format version
+frame_type_reading = 1               # Frame type of a well reading
+frame_header_size = 9                # Bytes before the payload
+
+#Function to generate the ROI table of a regular plate (row by row)
+def plate_rois(x0,y0,w,h,pitch_x,pitch_y,cols,rows):
+    rois = []
+    for r in range(rows):
+        for c in range(cols):
+            rois.append((x0+c*pitch_x,y0+r*pitch_y,w,h))
+    return rois
+
+#Function to get the bounding window of all ROIs (x and width even)
+def roi_window(rois,margin,frame_w,frame_h):
+    x0 = max(0,min([r[0] for r in rois])-margin) & ~1
+    y0 = max(0,min([r[1] for r in rois])-margin)
+    x1 = min(frame_w,max([r[0]+r[2] for r in rois])+margin)
+    y1 = min(frame_h,max([r[1]+r[3] for r in rois])+margin)
+    w = min((x1-x0+1) & ~1,frame_w-x0)
+    return (x0,y0,w,y1-y0)
+
+#Function to move ROIs into window coordinates
+def rebase_rois(rois,window):
+    return [(x-window[0],y-window[1],w,h) for (x,y,w,h) in rois]
+
+
+#CRC16-CCITT (poly 0x1021, init 0xFFFF) lookup table
+crc16_table = array.array('H',[0]*256)
+for i in range(256):
+    crc = i << 8
+    for _ in range(8):
+        if(crc & 0x8000):
+            crc = ((crc << 1) ^ 0x1021) & 0xFFFF
+        else:
+            crc = (crc << 1) & 0xFFFF
+    crc16_table[i] = crc
+
+#CRC16 of buf[start:end]
+def crc16(buf,start,end):
+    crc = 0xFFFF
+    for i in range(start,end):
+        crc = ((crc << 8) & 0xFFFF) ^ crc16_table[((crc >> 8) ^ buf[i]) & 0xFF]
+    return crc
+
+#Binary frame of values in buf (count records, len(values)/count values each)
+def frame_builder(buf,frame_type,seq,values,count):
+    n = len(values)
+    end = frame_header_size+2*n
+    ustruct.pack_into("<BBBBHHB",buf,0,0xA5,0x5A,frame_version, \
+                      frame_type,2*n,seq,count)
+    for i in range(n):
+        ustruct.pack_into("<H",buf,frame_header_size+2*i,values[i])
+    ustruct.pack_into("<H",buf,end,crc16(buf,2,end))
+    return buf
+
+
+#UART Message Packet Control: package package_index of package_num -> (package, next index)
+def uart_package_manager(system_msg,package_index,package_num):
+    head,tail = system_msg[0],system_msg[-1]
+    body = system_msg[1:-1]
+    sample_2 = '0000'
+
+    # Only send sample (2k-1) & (2k) in package k
+    data_index = chr(0x30+package_index)
+    start = (package_index-1)*8
+    sample_1 = body[start:start+4]
+    if(start+8 <= len(body)):
+        sample_2 = body[start+4:start+8]
+
+    package_index += 1
+    if(package_index > package_num):
+        package_index = 1
+
+    msg = head + data_index + sample_1 + sample_2 + tail
+    return msg,package_index
+
+#Function to ensure a integer value is padded to constant length string
+def message_padding(int_msg,fixed_length):
+    x = 0
+    pad_msg = "0"
+    zero = "0"
+
+    #Find number of zeros needed
+    l = len(str(int_msg))
+    zeros = fixed_length - l
+
+    #Padding
+    while(x<(zeros-1)):
+        pad_msg += zero
+        x += 1
+
+    #Add original msg after padding
+    if(zeros>0):
+        pad_msg += str(int_msg)
+    else:
+        pad_msg = str(int_msg)
+    return pad_msg
@@ -10,6 +10,16 @@ Remark:
 1. Message of four samples (string) will be sent every 500ms.
 2. Message header = "A" and Message tail = "B"
 3. Each sample will be represented by a constant of four digits length.
+4. Wells are described by well_rois, any number of wells (4/24/48/96) is supported.
+5. uart_binary_frame sends every well in one binary frame with CRC16 instead.
+6. enable_gray_sensor captures GRAYSCALE frames (half the size, luma from
+   the sensor). A startup calibration fits RGB565 luma = gain*gray + offset
+   over the wells so intensities stay on the intensity_config scale; it is
+   saved to gray_cal_path (delete the file to recalibrate). It is off by
+   default: the first boot spends 2 x gray_cal_frames frames calibrating.
+7. enable_windowing reads out only the bounding box of well_rois from the
+   sensor (well_rois are given in full QVGA coordinates and rebased to the
+   window at startup, the image is not rotated).
 """
 
 """
@@ -23,7 +33,10 @@ Image rotation:
 import sensor, image, time
 import pyb
 from pyb import UART
-import ustruct
+import ujson
+import array
+from quad_sample_common import roi_window,rebase_rois,frame_builder,frame_type_reading, \
+                               frame_header_size,uart_package_manager,message_padding
 
 #System wakeup GPIO
 ready = pyb.Pin("P2",pyb.Pin.OUT_PP)
@@ -38,23 +51,41 @@ sensor.skip_frames(time = 2000)
 #FPS Clock
 clock = time.clock()
 
-#Digital Zoom Areas
-area1_xmin, area1_ymin, area1_h, area1_w = 33,95,20,38
-area2_xmin, area2_ymin, area2_h, area2_w = 106,area1_ymin,area1_h,area1_w
-area3_xmin, area3_ymin, area3_h, area3_w = 184,area1_ymin,area1_h,area1_w
-area4_xmin, area4_ymin, area4_h, area4_w = 257,area1_ymin,area1_h,area1_w
+#Digital Zoom Areas (x,y,w,h), one entry per well
+well_rois = [(33,95,38,20),
+             (106,95,38,20),
+             (184,95,38,20),
+             (257,95,38,20)]
+#24-well plate (plate_rois from quad_sample_common): well_rois = plate_rois(16,30,38,30,50,50,6,4)
+#96-well plate: well_rois = plate_rois(10,10,22,16,25,28,12,8)
+
+#Sensor Windowing (read out the well band only)
+enable_windowing = True   # ON/OFF Sensor windowing
+window_margin = 2         # Pixels kept around the ROIs
+sensor_window = (0,0,sensor.width(),sensor.height())
+if enable_windowing:
+    sensor_window = roi_window(well_rois,window_margin,sensor.width(),sensor.height())
+    sensor.set_windowing(sensor_window)
+    well_rois = rebase_rois(well_rois,sensor_window)
+    sensor.skip_frames(time = 200)
 
 #System Control Variables
 enable_roi = True         # ON/OFF Digital Zoom
 #enable_roi = False         # ON/OFF Digital Zoom
-area_counter = 1          # Area Indicator
+scan_all_areas = True     # Measure all wells on every snapshot (False -> one well per dwell_frames)
+well_index = 0            # Well Indicator
 max_FPS = 19              # FPS for this program
-delay = 0                 # Delay counter
-max_area_num = 4          # Total number of digital zoom areas
+dwell_frames = 3          # Frames for each well (2 is shortest)
+well_num = len(well_rois) # Total number of wells
 message_index = 0         # UART Message index
 uart_msg_start = "A"      # UART Message header
 uart_msg_tail = "B"       # UART Message tailer
 intensity_config = 4     # Multiple of average intensity
+enable_native_luma = True # Luma from one get_statistics() call per well (False -> per-pixel rgb_to_yuv loop)
+enable_gray_sensor = False # GRAYSCALE capture, calibrated to the RGB565 luma scale (startup calibration)
+gray_cal_frames = 10      # Frames of each format for the calibration
+gray_cal_path = "/sd/gray_cal.json"
+gray_gain,gray_offset = 1.0,0.0   # RGB565 luma = gray_gain*gray + gray_offset
 
 #UART
 #OPENMV PO (UART1 RX) <-> Arduino MEGA 11 (TX)
@@ -64,42 +95,24 @@ uart = UART(1,115200)
 uart_led = pyb.LED(3)
 uart_led_status = False
 uart_package_index = 1
+uart_package_num = (well_num+1)//2   # Two samples per package
+uart_binary_frame = True             # All wells in one binary frame (False -> ASCII packages)
 
+#Binary UART frame (see README and quad_sample_common.py)
+frame_seq = 0                        # Frame sequence number
+uart_frame = bytearray(frame_header_size+2*well_num+2)
 
-area1_num = 0          #Sample size of area 1
-total_intensity_1 = 0  #Cummulative intensity
-area2_num = 0          #Sample size of area 2
-total_intensity_2 = 0  #Cummulative intensity
-area3_num = 0          #Sample size of area 3
-total_intensity_3 = 0  #Cummulative intensity
-area4_num = 0          #Sample size of area 4
-total_intensity_4 = 0  #Cummulative intensity
-
-#UART Message Packet Control
-def uart_package_manager(system_msg):
-    global uart_package_index
-    print("debug:",system_msg)
-    head,tail = system_msg[0],system_msg[-1]
-    data_index = '0'
-    sample_1 = '0000'
-    sample_2 = '0000'
-
-    if(uart_package_index == 1):
-        # Only send sample 1 & 2
-        data_index = str(uart_package_index)
-        sample_1 = system_msg[1:5]
-        sample_2 = system_msg[5:9]
-        uart_package_index = 2
-    else:
-        # Only send sample 3 & 4
-        data_index = str(uart_package_index)
-        sample_1 = system_msg[9:13]
-        sample_2 = system_msg[13:17]
-        uart_package_index = 1
-
+well_total_intensity = array.array('f',[0]*well_num)  #Cummulative intensity of each well
+well_samples = array.array('H',[0]*well_num)          #Sample size of each well
+well_result = array.array('H',[0]*well_num)           #Averaged intensity of each well (last message)
+well_luma_var = array.array('f',[0]*well_num)         #Normalized intensity variance inside each well (last frame)
 
-    msg = head + data_index + sample_1 + sample_2 + tail
-    return msg
+#Binary UART frame carrying every well, built in place in uart_frame
+def uart_frame_builder(values):
+    global frame_seq
+    frame_builder(uart_frame,frame_type_reading,frame_seq,values,len(values))
+    frame_seq = (frame_seq+1) & 0xFFFF
+    return uart_frame
 
 
 #UART LED Control
@@ -112,31 +125,117 @@ def uart_led_control(led,enable=True):
             led.off()
         uart_led_status = not(uart_led_status)
 
-#Function to ensure a integer value is padded to constant length string
-def message_padding(int_msg,fixed_length):
-    x = 0
-    pad_msg = "0"
-    zero = "0"
-
-    #Find number of zeros needed
-    l = len(str(int_msg))
-    zeros = fixed_length - l
 
-    #Padding
-    while(x<(zeros-1)):
-        pad_msg += zero
-        x += 1
-
-    #Add original msg after padding
-    if(zeros>0):
-        pad_msg += str(int_msg)
+#Normalized intensity of one well
+def measure_well(img,i):
+    if(enable_native_luma or enable_gray_sensor):
+        #Grayscale pixels are the Y channel, so mean/stdev come from one native pass
+        stats = img.get_statistics(roi=well_rois[i])
+        mean,stdev = stats.mean(),stats.stdev()
+        if enable_gray_sensor:
+            mean,stdev = gray_gain*mean+gray_offset,gray_gain*stdev
+        well_luma_var[i] = (stdev*intensity_config)**2
+        return mean*intensity_config
+
+    roi_x,roi_y,roi_w,roi_h = well_rois[i]
+
+    #RGB TO YUV Conversion
+    intensity = 0
+    for y in range(roi_y,roi_y+roi_h):
+        for x in range(roi_x,roi_x+roi_w):
+            intensity += image.rgb_to_yuv(img.get_pixel(x,y))[0]
+
+    #Normalization
+    return (intensity/(roi_w*roi_h))*intensity_config
+
+
+#Average every well and send the message
+def send_message():
+    global message_index,uart_package_index
+    for i in range(well_num):
+        #Take average among different frames
+        well_result[i] = min(int(well_total_intensity[i]/well_samples[i]),0xFFFF)
+        well_total_intensity[i] = 0
+        well_samples[i] = 0
+        print("Intensity {}:".format(i+1),well_result[i],"Var:",int(well_luma_var[i]))
+
+    if uart_binary_frame:
+        uart_message = uart_frame_builder(well_result)
+        print("#{} Sent through UART->: {} bytes\r\n".format(message_index,len(uart_message)))
     else:
-        pad_msg = str(int_msg)
-    return pad_msg
-
-
-#Capture and Loop
-while(True):
+        msg = uart_msg_start
+        for i in range(well_num):
+            msg += message_padding(well_result[i],4)
+        msg += uart_msg_tail
+        print("#{} Message->: {}".format(message_index,msg))
+        uart_message,uart_package_index = uart_package_manager(msg,uart_package_index,uart_package_num)
+        print("#{} Sent through UART->: {}\r\n".format(message_index,uart_message))
+
+    # Send UART message
+    uart.write(uart_message)
+    uart_led_control(uart_led)
+    message_index += 1
+
+
+#Mean luma of every well over n frames (current pixel format)
+def well_lumas(n):
+    total = [0.0]*well_num
+    for _ in range(n):
+        img = sensor.snapshot()
+        if(sensor.get_pixformat() == sensor.RGB565):
+            img = img.to_grayscale()
+        for i in range(well_num):
+            total[i] += img.get_statistics(roi=well_rois[i]).mean()
+    return [t/n for t in total]
+
+
+#Grayscale sensor calibration (least squares over the wells)
+def calibrate_gray():
+    sensor.set_pixformat(sensor.RGB565)
+    sensor.skip_frames(n = 5)
+    rgb = well_lumas(gray_cal_frames)
+    sensor.set_pixformat(sensor.GRAYSCALE)
+    sensor.skip_frames(n = 5)
+    gray = well_lumas(gray_cal_frames)
+
+    n = len(gray)
+    mean_g,mean_r = sum(gray)/n,sum(rgb)/n
+    var_g = sum([(g-mean_g)**2 for g in gray])
+    cov = sum([(g-mean_g)*(r-mean_r) for g,r in zip(gray,rgb)])
+    gain = 1.0
+    if(var_g >= n*16):
+        #Enough spread between the wells for a slope, otherwise offset only
+        gain = cov/var_g
+    return gain,mean_r-gain*mean_g
+
+
+#Saved calibration or a new one
+def load_gray_cal():
+    try:
+        with open(gray_cal_path) as f:
+            cal = ujson.load(f)
+        return cal["gain"],cal["offset"]
+    except (OSError,ValueError,KeyError):
+        pass
+    gain,offset = calibrate_gray()
+    try:
+        with open(gray_cal_path,"w") as f:
+            f.write(ujson.dumps({"gain":gain,"offset":offset}))
+    except OSError:
+        pass
+    return gain,offset
+
+
+#Grayscale capture
+if enable_gray_sensor:
+    gray_gain,gray_offset = load_gray_cal()
+    sensor.set_pixformat(sensor.GRAYSCALE)
+    print("Gray calibration: gain {} offset {}".format(gray_gain,gray_offset))
+
+
+#Process one frame
+def step():
+    global well_index
 
     #FPS Counter
     clock.tick()
@@ -150,148 +249,47 @@ while(True):
     #Image Rotation
     img = img.replace(img,vflip=False,hmirror=False,transpose=False)
 
-    #Frames for each area (2 is shortest)
-    f = int(max_FPS/1)
-    f = 3
-
-
-    if enable_roi:
-        #Zoom to different defined area
-        if(area_counter == 1):
-
-            #Area 1
-            img = img.crop(roi=(area1_xmin, area1_ymin,area1_w,area1_h))
-
-
-            #RGB TO YUV Conversion
-            intensity = 0
-            Y = None
-            for x in range(0,(area1_w*area1_h)):
-                Y = image.rgb_to_yuv(img[x])
-                intensity += Y[0]
+    #Keep only the Y channel (in place, no extra frame buffer)
+    if(enable_native_luma and not enable_gray_sensor):
+        img = img.to_grayscale()
 
-            #Normalization
-            norm_intensity = (intensity/(area1_w*area1_h))*intensity_config
-
-            #Save all intensity among different frames
-            total_intensity_1 += norm_intensity
-
-            area1_num += 1
-
-            if(delay == (f-1)):
-                intensity_1 = message_padding(int(total_intensity_1/area1_num),4)
-                print("Intensity 1:",intensity_1)
-                uart_msg_start  += intensity_1
-                #Visualize detection result
-                img = img.draw_string(1,1,"1",color=(255,0,0))
-                total_intensity_1 = 0
-                area1_num = 0
-
-
-
-        if(area_counter == 2):
-            #Area 2
-            img = img.crop(roi=(area2_xmin, area2_ymin,area2_w,area2_h))
-
-            #RGB TO YUV Conversion
-            intensity = 0
-            Y = None
-            for x in range(0,(area2_w*area2_h)):
-                Y = image.rgb_to_yuv(img[x])
-                intensity += Y[0]
-
-            #Normalization
-            norm_intensity = (intensity/(area2_w*area2_h))*intensity_config
-
-            #Save all intensity among different frames
-            total_intensity_2 += norm_intensity
-
-
-            area2_num += 1
-
-            if(delay == (f-1)):
-                intensity_2 = message_padding(int(total_intensity_2/area2_num),4)
-                print("Intensity 2:",intensity_2)
-                uart_msg_start  += intensity_2
-                #Visualize detection result
-                img = img.draw_string(1,1,"2",color=(255,0,0))
-                total_intensity_2 = 0
-                area2_num = 0
+    #Frames for each well
+    f = dwell_frames
 
+    #Wells measured on this snapshot
+    if scan_all_areas:
+        first,last = 0,well_num
+    else:
+        first,last = well_index,well_index+1
 
+    for i in range(first,last):
+        well_total_intensity[i] += measure_well(img,i)
+        well_samples[i] += 1
 
-        if(area_counter == 3):
-            #Area 3
-            img = img.crop(roi=(area3_xmin, area3_ymin,area3_w,area1_h))
-            #RGB TO YUV Conversion
-            intensity = 0
-            Y = None
-            for x in range(0,(area3_w*area3_h)):
-                Y = image.rgb_to_yuv(img[x])
-                intensity += Y[0]
+    #Visualize detection area
+    if scan_all_areas:
+        for i in range(well_num):
+            img.draw_rectangle(well_rois[i],color=(255,0,0))
+    elif enable_roi:
+        #Zoom to the current well
+        img = img.crop(roi=well_rois[well_index])
+        img = img.draw_string(1,1,str(well_index+1),color=(255,0,0))
 
-            #Normalization
-            norm_intensity = (intensity/(area3_w*area3_h))*intensity_config
+    #Frame Delay
+    if(well_samples[last-1] >= f):
+        well_index = last
+        if(well_index == well_num):
+            well_index = 0
+            send_message()
 
-            #Save all intensity among different frames
-            total_intensity_3 += norm_intensity
+    return img
 
-            area3_num += 1
 
-            if(delay == (f-1)):
-                intensity_3 = message_padding(int(total_intensity_3/area3_num),4)
-                print("Intensity 3:",intensity_3)
-                uart_msg_start  += intensity_3
-                #Visualize detection result
-                img = img.draw_string(1,1,"3",color=(255,0,0))
-                total_intensity_3 = 0
-                area3_num = 0
+#Capture and Loop
+def main():
+    while(True):
+        step()
 
-        if(area_counter == 4):
-            #Area 4
-            img = img.crop(roi=(area4_xmin, area4_ymin,area4_w,area4_h))
-            #RGB TO YUV Conversion
-            intensity = 0
-            Y = None
-            for x in range(0,(area4_w*area4_h)):
-                Y = image.rgb_to_yuv(img[x])
-                intensity += Y[0]
-
-            #Normalization
-            norm_intensity = (intensity/(area4_w*area4_h))*intensity_config
-
-            #Save all intensity among different frames
-            total_intensity_4 += norm_intensity
-
-            area4_num += 1
-
-            if(delay == (f-1)):
-                intensity_4 = message_padding(int(total_intensity_4/area4_num),4)
-                print("Intensity 4:",intensity_4)
-                uart_msg_start  += intensity_4
-                #Visualize detection result
-                img = img.draw_string(1,1,"4",color=(255,0,0))
-                total_intensity_4 = 0
-                area4_num = 0
-
-        if(area_counter == (max_area_num+1)):
-            #Reset
-            area_counter = 1
-
-            # Send UART message
-            uart_msg_start = uart_msg_start + 'B'
-            print("#{} Message->: {}".format(message_index,uart_msg_start))
-            uart_message = uart_package_manager(uart_msg_start)
-            print("#{} Sent through UART->: {}\r\n".format(message_index,uart_message))
-            uart.write(uart_message)
-            uart_led_control(uart_led)
-            uart_msg_start = "A"
-            message_index += 1
-
-        #Frame Delay
-        if(delay == f):
-            delay = 0
-            area_counter += 1
-
-    delay += 1
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1252 @@
+"""
+@@@ Name  : Quad COVID-19 Samples Pipeline
+@@@ Author: VincentChan
+@@@ Date  : 18/10/2026
+@@@ MCU   : STM32H743
+"""
+
+"""
+Remark:
+1. One capture feeds every metric: blob area (quad_sample_classifier.py) and
+   luma statistics (quad_sample_intensity.py) of each well are measured on
+   the same snapshot and sent together.
+2. Metrics are pluggable stages (metric_stages), enabled_metrics selects
+   them and their order in the message. Colour stages (blobs) run first,
+   then the frame is converted to grayscale in place once and the luma
+   stages share one get_statistics() call per well.
+3. Every message carries well_num x metric_num values: one binary frame
+   (COUNT = wells, LENGTH/COUNT/2 values per well) or the ASCII packages
+   with two values per package.
+4. well_rois are the blob areas, luma_rois the intensity areas (the same
+   table by default), both in full QVGA coordinates.
+5. Every value has running estimators updated each frame: mean and
+   variance from exact integer sums shifted by the first value (reset per
+   message), EMA with its exponentially weighted variance and a
+   ring-buffer median. estimator selects the one that is
+   sent; stream_mode sends it every frame instead of once per dwell period
+   and enable_confidence adds a confidence value per metric (standard
+   error, EMA deviation or half the interquartile range of the window).
+   Bounds: values are clamped to value_max (2047) and a message takes at
+   most samples_max (255) frames of a well, so the sums fit the 32 bit
+   arrays and every product stays a MicroPython small integer (no heap
+   use). The defaults stay well below (ROI area 1140 pixels, 255 x
+   intensity_config 4); value_clamps counts clamped values in the GC report.
+6. enable_early_decision replaces the fixed dwell with a sequential test on
+   decision_metric: a well is called (negative when its mean reaches
+   decision_thresh, as area_thresh_n in quad_sample_classifier.py) as soon
+   as the mean is more than decision_z standard errors from the threshold,
+   and is no longer measured. The reading is sent once every well has a
+   call (or decision_max_frames is reached, the call is then forced on the
+   mean) with the call code after the well values, and the next plate
+   starts from fresh estimators.
+7. enable_low_alloc keeps the script's own per-frame work off the heap:
+   the estimator, median, binary frame, ASCII package, TX ring and command
+   buffers are allocated at startup, numbers are written in place, nothing
+   is printed per frame and the estimators run on integers. The frame is not
+   allocation-free: the firmware allocates the find_blobs / get_statistics
+   results (and blob objects) on every frame, and the confidence values and
+   the scheduler priorities are floats (boxed once per message). gc.collect()
+   therefore still runs between frames, but only once gc_alloc_limit bytes
+   were allocated, or gc_idle_alloc bytes when the frame finished within
+   frame_time_us, so the pause is bounded instead of paid every frame. The
+   bytes allocated per frame (alloc/frame max) and the collection pauses are
+   counted and reported every gc_report_every messages.
+8. enable_profiler times every stage of a frame with time.ticks_us into a
+   ring buffer of the last profile_window frames. Every telemetry_every
+   messages (or when telemetry_pending is set) a telemetry frame (TYPE 2,
+   COUNT = stages, min / mean / p99 / max in us per stage, in
+   profile_stages order) follows the reading; host.telemetry decodes it.
+   It is off by default so the stream only carries readings; a telemetry
+   request is then answered with "bad value".
+9. The host can reconfigure the camera while it runs (host.command): the
+   commands are binary frames in the README format (TYPE 0x10..0x17),
+   polled with uart.any() between frames and parsed from a preallocated
+   buffer, each answered with an ack frame (TYPE 3: command type, command
+   SEQ, status). New ROI tables must keep the well count and fit in the
+   sensor window; ROI / threshold changes restart the estimators.
+   Parameters outside their command_params range are refused. It is off
+   by default (enable_commands), nothing is read from the UART then.
+10. enable_auto_roi (off by default, the hand-measured ROI tables are used
+   as they are) locates the wells once on a full frame (largest
+   well_find_thresh blobs, row by row) and centres the hand-measured ROI
+   sizes on them (luma ROIs keep their offset to the blob ROI). The table
+   and a reference centroid per well are cached in roi_cal_path and reused
+   at the next boot. Every drift_check_every messages the wells are looked
+   up again inside their ROIs (+ drift_margin) only; a well missing or
+   moved by more than drift_tolerance pixels triggers a recalibration.
+   Calibration: load a plate with every well lit, check that
+   well_find_thresh / well_find_area give one blob per well on a full
+   frame, set enable_auto_roi = True and boot once; the located ROIs are
+   printed and cached. Delete roi_cal_path (or send host.command
+   calibrate) to calibrate again.
+11. enable_scheduler replaces the fixed dwell with a frame budget per
+   message (frame_budget well-frames): every well first gets
+   sched_min_frames, the rest goes to the wells with the largest
+   variance / (distance of decision_metric to decision_thresh)^2, i.e. the
+   ones whose call is least certain. One well per snapshot
+   (scan_all_areas = False) this spends camera time, with all wells per
+   snapshot it spends processing time (finished wells are skipped).
+12. enable_pipeline overlaps the stages: with sensor_framebuffers = 3 the
+   sensor fills the next buffer while the current frame is processed
+   (re-applied after every windowing change), and UART messages are copied
+   into a preallocated ring buffer. A timer interrupt (tx_timer_freq, below
+   the character rate) sends up to tx_burst bytes per tick, only when
+   uart.txdone() reports the line idle, so neither the vision loop nor the
+   interrupt waits on the UART. The ring and tx_timer_freq are sized at
+   startup for a reading (and a telemetry frame) on every frame at max_FPS
+   plus 25% (1000 ticks/s at least, the line rate at most). Traffic above
+   the line rate (e.g. 96 wells with confidence) fills the ring: the ring is
+   then flushed and the message sent with a blocking uart.write, counted in
+   tx_stalls, so no reading is lost.
+"""
+
+"""
+Image rotation:
+- vflip=False, hmirror=False, transpose=False -> 0 degree rotation
+- vflip=True, hmirror=False, transpose=True -> 90 degree rotation
+- vflip=True, hmirror=True, transpose=False -> 180 degree rotation
+- vflip=False, hmirror=True, transpose=True -> 270 degree rotation
+"""
+
+import sensor, image, time
+import pyb
+from pyb import UART
+import array
+import math
+import gc
+import ujson
+import micropython
+from quad_sample_common import roi_window,rebase_rois,crc16,frame_builder,frame_version, \
+                               frame_type_reading,frame_header_size,uart_package_manager,message_padding
+
+micropython.alloc_emergency_exception_buf(100)
+
+#System wakeup GPIO
+ready = pyb.Pin("P2",pyb.Pin.OUT_PP)
+ready.high()
+
+#Camera sensor setup
+sensor.reset()
+sensor.set_pixformat(sensor.RGB565)
+sensor.set_framesize(sensor.QVGA)
+sensor.skip_frames(time = 2000)
+
+#FPS Clock
+clock = time.clock()
+
+#Full frame size (before windowing)
+frame_w,frame_h = sensor.width(),sensor.height()
+
+#Blob Areas (x,y,w,h), one entry per well
+well_rois = [(22,84,38,30),
+             (96,84,38,30),
+             (172,84,38,30),
+             (250,84,38,30)]
+#24-well plate (plate_rois from quad_sample_common): well_rois = plate_rois(16,30,38,30,50,50,6,4)
+#96-well plate: well_rois = plate_rois(10,10,22,16,25,28,12,8)
+
+#Luma Areas, one entry per well (e.g. the well_rois of quad_sample_intensity.py)
+luma_rois = list(well_rois)
+
+#Automatic Well Localization (cached ROI calibration)
+enable_auto_roi = False           # ON -> locate the wells on a full frame (cached in roi_cal_path)
+roi_cal_path = "/sd/well_cal.json"
+well_find_thresh = [(60, 100, -128, 127, -128, 127)]  # Bright (lit) well windows
+well_find_area = (100,6000)       # Pixel range of one well blob
+drift_margin = 8                  # Pixels searched around each ROI by the drift check
+drift_tolerance = 3               # Centroid shift (pixels) that triggers a recalibration
+drift_check_every = 50            # Messages between drift checks (0 -> never)
+plate_well_rois = well_rois       # Full frame ROI tables (well_rois / luma_rois are in window coordinates)
+plate_luma_rois = luma_rois
+well_ref = [None]*len(well_rois)  # Reference centroid of every well (full frame, None -> no check)
+
+#Centres of the wells on a full frame, row by row (None if fewer than the ROI table)
+def locate_wells(img):
+    n = len(plate_well_rois)
+    blobs = [b for b in img.find_blobs(well_find_thresh,pixels_threshold=well_find_area[0], \
+                                       area_threshold=well_find_area[0],merge=True) \
+             if b.pixels() <= well_find_area[1]]
+    if(len(blobs) < n):
+        return None
+    blobs = sorted(blobs,key=lambda b: -b.pixels())[:n]
+
+    #Rows: centres closer than half a blob height
+    blobs.sort(key=lambda b: b.cy())
+    rows = [[blobs[0]]]
+    for b in blobs[1:]:
+        if(b.cy()-rows[-1][0].cy() > rows[-1][0].h()//2):
+            rows.append([b])
+        else:
+            rows[-1].append(b)
+    centers = []
+    for row in rows:
+        row.sort(key=lambda b: b.cx())
+        centers += [(b.cx(),b.cy()) for b in row]
+    return centers
+
+#Centroid (full frame) of the largest well blob around roi, img offset by (ox,oy)
+def drift_centroid(img,roi,ox,oy):
+    x0 = max(roi[0]-drift_margin-ox,0)
+    y0 = max(roi[1]-drift_margin-oy,0)
+    x1 = min(roi[0]+roi[2]+drift_margin-ox,img.width())
+    y1 = min(roi[1]+roi[3]+drift_margin-oy,img.height())
+    if(x1 <= x0 or y1 <= y0):
+        return None
+    best = None
+    for blob in img.find_blobs(well_find_thresh,roi=(x0,y0,x1-x0,y1-y0),pixels_threshold=10, \
+                               area_threshold=10,merge=True):
+        if(best is None or blob.pixels() > best.pixels()):
+            best = blob
+    if best is None:
+        return None
+    return (best.cx()+ox,best.cy()+oy)
+
+#Locate the wells on a full frame (windowing off) and move the ROI tables onto them
+def calibrate():
+    global plate_well_rois,plate_luma_rois
+    img = sensor.snapshot()
+    centers = locate_wells(img)
+    if centers is None:
+        print("Well localization failed, keeping the current ROIs")
+        return False
+    wells,lumas = [],[]
+    for i in range(len(plate_well_rois)):
+        x,y,w,h = plate_well_rois[i]
+        nx = min(max(centers[i][0]-w//2,0),frame_w-w)
+        ny = min(max(centers[i][1]-h//2,0),frame_h-h)
+        lx,ly,lw,lh = plate_luma_rois[i]
+        wells.append((nx,ny,w,h))
+        lumas.append((lx+nx-x,ly+ny-y,lw,lh))
+    plate_well_rois,plate_luma_rois = wells,lumas
+    for i in range(len(wells)):
+        well_ref[i] = drift_centroid(img,wells[i],0,0)
+    print("Wells located:",plate_well_rois)
+    save_roi_cal()
+    return True
+
+#Cache the calibration (flash / SD)
+def save_roi_cal():
+    try:
+        with open(roi_cal_path,"w") as f:
+            ujson.dump({"frame":[frame_w,frame_h],"well_rois":plate_well_rois, \
+                        "luma_rois":plate_luma_rois,"ref":well_ref},f)
+    except OSError:
+        print("Cannot write",roi_cal_path)
+
+#Load the cached calibration (same frame size and well count)
+def load_roi_cal():
+    global plate_well_rois,plate_luma_rois
+    try:
+        with open(roi_cal_path) as f:
+            cal = ujson.load(f)
+    except (OSError,ValueError):
+        return False
+    n = len(plate_well_rois)
+    if(cal.get("frame") != [frame_w,frame_h] or len(cal.get("well_rois",())) != n or \
+       len(cal.get("luma_rois",())) != n):
+        return False
+    plate_well_rois = [tuple(r) for r in cal["well_rois"]]
+    plate_luma_rois = [tuple(r) for r in cal["luma_rois"]]
+    for i in range(n):
+        ref = cal.get("ref",[None]*n)[i]
+        well_ref[i] = tuple(ref) if ref else None
+    print("Wells loaded from",roi_cal_path)
+    return True
+
+if enable_auto_roi:
+    if not load_roi_cal():
+        calibrate()
+
+#Sensor Windowing (read out the well band only)
+enable_windowing = True   # ON/OFF Sensor windowing
+window_margin = 2         # Pixels kept around the ROIs
+sensor_window = (0,0,frame_w,frame_h)
+
+#Pipelined Capture
+enable_pipeline = True    # ON -> multi-buffered capture + interrupt driven UART output
+sensor_framebuffers = 3   # Frame buffers (3 -> capture of frame N+1 overlaps processing of frame N)
+
+#Window the sensor around the plate ROI tables, rebase well_rois / luma_rois
+def apply_window():
+    global sensor_window,well_rois,luma_rois
+    sensor_window = (0,0,frame_w,frame_h)
+    if enable_windowing:
+        margin = max(window_margin,drift_margin) if enable_auto_roi else window_margin
+        sensor_window = roi_window(plate_well_rois+plate_luma_rois,margin,frame_w,frame_h)
+        sensor.set_windowing(sensor_window)
+        sensor.skip_frames(time = 200)
+    well_rois = rebase_rois(plate_well_rois,sensor_window)
+    luma_rois = rebase_rois(plate_luma_rois,sensor_window)
+
+    #Frame buffers are allocated for the current window
+    if enable_pipeline:
+        sensor.set_framebuffers(sensor_framebuffers)
+
+apply_window()
+
+#System Control Variables
+enable_roi = True         # ON/OFF Digital Zoom
+scan_all_areas = True     # Measure all wells on every snapshot (False -> one well per dwell_frames)
+well_index = 0            # Well Indicator
+max_FPS = 19              # FPS for this program
+dwell_frames = 3          # Frames for each well (2 is shortest)
+well_num = len(well_rois) # Total number of wells
+message_index = 0         # UART Message index
+uart_msg_start = "A"      # UART Message header
+uart_msg_tail = "B"       # UART Message tailer
+intensity_config = 4      # Multiple of average intensity
+
+#Blob Detection
+chemical_thresh = [(44, 100, 70, -124, 28, 80)]  #Blob Detection Threshold
+well_blob = [None]*well_num                     #Largest blob of each well (visualization)
+
+
+#Metric Stages: value of well i (stats = luma statistics of the well, None for colour stages)
+#Largest blob area (quad_sample_classifier.py)
+def metric_blob_area(img,i,stats):
+    blob_area_max = 0
+    well_blob[i] = None
+    for blob in img.find_blobs(chemical_thresh,roi=well_rois[i],pixels_threshold=1, \
+                               area_threshold=1, merge=True):
+        if(blob[4]>blob_area_max):
+            blob_area_max = blob[4]
+            well_blob[i] = blob
+    return blob_area_max
+
+#Normalized mean intensity (quad_sample_intensity.py)
+def metric_luma_mean(img,i,stats):
+    return stats.mean()*intensity_config
+
+#Normalized intensity spread
+def metric_luma_stdev(img,i,stats):
+    return stats.stdev()*intensity_config
+
+#Histogram statistics
+def metric_luma_median(img,i,stats):
+    return stats.median()*intensity_config
+
+def metric_luma_lq(img,i,stats):
+    return stats.lq()*intensity_config
+
+def metric_luma_uq(img,i,stats):
+    return stats.uq()*intensity_config
+
+#name -> (function, needs grayscale)
+metric_stages = {"blob_area":(metric_blob_area,False),
+                 "luma_mean":(metric_luma_mean,True),
+                 "luma_stdev":(metric_luma_stdev,True),
+                 "luma_median":(metric_luma_median,True),
+                 "luma_lq":(metric_luma_lq,True),
+                 "luma_uq":(metric_luma_uq,True)}
+
+#Metrics sent for every well, in message order
+enabled_metrics = ["blob_area","luma_mean","luma_stdev"]
+metric_num = len(enabled_metrics)
+color_stages = [(k,metric_stages[name][0]) for k,name in enumerate(enabled_metrics) \
+                if not metric_stages[name][1]]
+gray_stages = [(k,metric_stages[name][0]) for k,name in enumerate(enabled_metrics) \
+               if metric_stages[name][1]]
+
+#Running Estimators
+estimator = "mean"        # Value sent: "mean" (shifted sums), "ema" or "median" (ring buffer)
+ema_alpha = 0.25          # EMA weight of the newest frame (in 1/256 steps)
+median_window = 5         # Frames in the median ring buffer
+stream_mode = False       # ON -> send every frame (OFF -> once per dwell period)
+enable_confidence = False # ON/OFF Confidence value of every metric after the well values
+
+#Estimator state, value k of well i at i*metric_num+k
+#(integers: with these bounds |sum| < 2^19 and sum of squares < 2^30, see Remark 5)
+value_max = 2047                                            #Largest value, larger ones are clamped
+samples_max = 255                                           #Frames of a well per message at most
+value_clamps = 0                                            #Values clamped since the last report
+value_num = well_num*metric_num
+well_value = array.array('l',[0]*value_num)                 #Values of the latest frame
+well_first = array.array('l',[0]*value_num)                 #First value of the message (shift of the sums)
+well_sum = array.array('l',[0]*value_num)                   #Sum of value-first (per message)
+well_sq = array.array('l',[0]*value_num)                    #Sum of (value-first)^2
+well_ema = array.array('l',[0]*value_num)                   #EMA x 16
+well_emv = array.array('l',[0]*value_num)                   #EMA variance
+well_ring = array.array('l',[0]*(value_num*median_window))  #Last median_window values
+well_samples = array.array('H',[0]*well_num)                #Sample size of each well (per message)
+well_frames = array.array('L',[0]*well_num)                 #Frames of each well since startup
+
+#Early Decision (sequential test per well)
+enable_early_decision = False   # ON -> stop sampling a well once its call is stable
+decision_metric = "blob_area"   # Metric tested against decision_thresh
+decision_thresh = 200           # Negative when the mean reaches it (area_thresh_n)
+decision_z = 3.0                # Confidence bound in standard errors
+decision_se_min = 1.0           # Standard error floor (identical frames)
+decision_min_frames = 3         # Frames before a call can be made
+decision_max_frames = 16        # Frames before the call is forced
+call_positive,call_negative = 1,2                           #Call codes (0 -> no call)
+well_call = array.array('B',[0]*well_num)                   #Call of each well (current plate)
+plate_frames = 0                                            #Snapshots spent on the current plate
+
+#Adaptive Dwell Scheduler
+enable_scheduler = False        # ON -> spread frame_budget over the wells by uncertainty
+frame_budget = 12               # Well-frames per message (dwell_frames x wells)
+sched_min_frames = 2            # Frames every well gets first (>= 2 for a variance)
+sched_dist_min = 5.0            # Floor of the distance to decision_thresh
+sched_extra = False             # Second pass (extra frames) running
+well_alloc = array.array('H',[sched_min_frames]*well_num)   #Frames allotted to each well
+well_prio = array.array('f',[0]*well_num)                   #Scheduling priority of each well
+
+#Index of decision_metric in a well's values (early decision and scheduler only)
+decision_k = 0
+if(enable_early_decision or enable_scheduler):
+    if decision_metric not in enabled_metrics:
+        raise ValueError("decision_metric '{}' is not in enabled_metrics {}".format(decision_metric,enabled_metrics))
+    decision_k = enabled_metrics.index(decision_metric)
+
+well_values = metric_num*(2 if enable_confidence else 1)    #Values per well in a message
+if enable_early_decision:
+    well_values += 1                                        #Call code
+well_result = array.array('H',[0]*(well_num*well_values))   #Values of the last message
+ring_sorted = array.array('l',[0]*median_window)           #Median scratch (sorted window)
+
+#Fixed point copies of the float parameters (fixed_params() after every change)
+ema_q = 0                   # ema_alpha x 256
+z2_q = 0                    # decision_z^2 x 16
+se_min2_q = 0               # decision_se_min^2 x 16
+
+def fixed_params():
+    global ema_q,z2_q,se_min2_q
+    ema_q = min(max(int(ema_alpha*256+0.5),1),256)
+    z2_q = max(int(decision_z*decision_z*16+0.5),1)
+    se_min2_q = int(decision_se_min*decision_se_min*16+0.5)
+
+fixed_params()
+
+#Memory (low-allocation hot loop, see Remark 7)
+enable_low_alloc = True     # ON -> preallocated buffers, in-place formatting, no prints per frame
+gc_alloc_limit = 16384      # Bytes allocated since the last collection that force one
+gc_idle_alloc = 2048        # Bytes collected early when the frame ended within frame_time_us
+frame_time_us = 1000000//max_FPS  # Frame time target (spare time goes to the collection)
+gc_report_every = 20        # Messages between GC reports (0 -> never)
+gc_frames = 0               # Frames since the last report
+gc_collects = 0             # Collections since the last report
+gc_total_us = 0             # Collection time since the last report
+gc_max_us = 0               # Longest collection since the last report
+gc_alloc_max = 0            # Most bytes allocated by one frame since the last report
+gc_base = 0                 # gc.mem_alloc() after the last collection
+gc_last = 0                 # gc.mem_alloc() at the end of the previous frame
+frame_t0 = 0                # Start of the current frame (time.ticks_us)
+
+#Profiler (per-stage time.ticks_us, ring buffer of the last profile_window frames)
+enable_profiler = False     # ON/OFF Stage timing and telemetry frames (diagnostics)
+profile_window = 128        # Frames kept per stage
+telemetry_every = 20        # Messages between telemetry frames (0 -> on request only)
+telemetry_pending = False   # Send a telemetry frame after the next message
+profile_stages = ("snapshot","color","gray","estimators","draw","send","gc","frame")
+stage_snapshot,stage_color,stage_gray,stage_estimators,stage_draw,stage_send,stage_gc,stage_frame = range(8)
+stage_num = len(profile_stages)
+prof_ring = array.array('L',[0]*(stage_num*profile_window))   #Stage time (us) of every frame
+prof_top = array.array('L',[0]*(profile_window//100+2))       #Largest values of one stage (p99)
+prof_pos = 0                #Ring position of the current frame
+prof_count = 0              #Frames in the ring
+prof_t0 = 0                 #Start of the current frame
+prof_t = 0                  #End of the previous stage
+
+#Drawing colours and well labels (no per-frame tuples / strings)
+roi_color = (0,255,0)
+blob_color = (255,0,0)
+well_labels = [str(i+1) for i in range(well_num)]
+
+#UART
+#OPENMV PO (UART1 RX) <-> Arduino MEGA 11 (TX)
+#OPENMV P1 (UART1 TX) <-> Arduino MEGA 10 (RX)
+#UART LED -> BLUE
+uart_baudrate = 115200
+uart = UART(1,uart_baudrate)
+uart_led = pyb.LED(3)
+uart_led_status = False
+uart_package_index = 1
+uart_package_num = (well_num*well_values+1)//2  # Two values per package
+uart_binary_frame = True                        # All wells in one binary frame (False -> ASCII packages)
+
+#Binary UART frame (see README and quad_sample_common.py)
+frame_seq = 0                        # Frame sequence number
+uart_frame = bytearray(frame_header_size+2*well_num*well_values+2)
+uart_package = bytearray(11)         # ASCII package (START DATA XXXX XXXX STOP)
+frame_type_ack = 3                   # Frame type of a command acknowledgement
+ack_seq = 0                          # Ack sequence number
+ack_values = array.array('H',[0,0,0])   # Command type, command SEQ, status
+ack_frame = bytearray(frame_header_size+2*len(ack_values)+2)
+
+#UART Command Channel (host -> camera, same frame format)
+enable_commands = False   # ON/OFF Command polling between frames
+paused = False            # Measurement paused (commands are still polled)
+cmd_set_roi,cmd_set_luma_roi,cmd_set_thresh,cmd_set_param,cmd_telemetry,cmd_pause,cmd_resume,cmd_calibrate = \
+    range(0x10,0x18)
+ack_ok,ack_bad_length,ack_bad_value,ack_unknown = range(4)
+#cmd_set_param: (parameter index, value) pairs, value = parameter x scale
+command_params = (("dwell_frames",1,1,255),           # (name, scale, minimum, maximum value)
+                  ("intensity_config",1,1,8),         # 255 x 8 stays below value_max
+                  ("decision_thresh",1,0,2047),       # value_max
+                  ("decision_z",100,1,1000),
+                  ("decision_min_frames",1,2,255),    # samples_max
+                  ("decision_max_frames",1,1,255),
+                  ("ema_alpha",1000,1,1000),
+                  ("telemetry_every",1,0,1000),
+                  ("stream_mode",1,0,1),
+                  ("frame_budget",1,1,10000))         # well_alloc is u16
+cmd_buf = bytearray(frame_header_size+8*well_num+64)  # Received bytes not parsed yet
+cmd_rx = bytearray(32)                                # One uart.readinto() chunk
+cmd_len = 0
+frame_type_telemetry = 2             # Frame type of the profiler telemetry
+telemetry_seq = 0                    # Telemetry sequence number
+telemetry_values = array.array('H',[0]*(stage_num*4))
+telemetry_frame = bytearray(frame_header_size+2*len(telemetry_values)+2)
+
+#UART ring buffer (enable_pipeline), written by the main loop, drained by tx_timer
+#Sized for the worst case: a reading (and a telemetry frame) on every frame at max_FPS
+tx_burst = 2                                    # Bytes per tick: shift + data register, taken without waiting
+tx_message_bytes = len(uart_frame) if uart_binary_frame else len(uart_package)
+if enable_profiler:
+    tx_message_bytes += len(telemetry_frame)
+tx_rate = tx_message_bytes*max_FPS              # Bytes/s queued at most
+tx_line_freq = uart_baudrate//10//tx_burst      # Ticks per second that keep the line busy
+tx_timer_freq = min(max(1000,(5*tx_rate//4)//tx_burst+1),tx_line_freq)  # 25% headroom, 1000 at least
+tx_ring_size = 1024                             # Bytes (power of two, 2 worst case frames at least)
+while(tx_ring_size < 2*tx_message_bytes):
+    tx_ring_size *= 2
+tx_timer_id = 4                                 # Timer draining the ring
+tx_ring = bytearray(tx_ring_size)
+tx_mask = tx_ring_size-1
+tx_head = 0                                     # Next byte written by the main loop
+tx_tail = 0                                     # Next byte sent by the interrupt
+tx_active = False                               # Timer callback running
+tx_stalls = 0                                   # Messages sent blocking (ring full)
+tx_timer = pyb.Timer(tx_timer_id,freq=tx_timer_freq) if enable_pipeline else None
+
+#Write value as 4 ASCII digits at buf[pos] (clamped to 9999)
+def put_digits(buf,pos,value):
+    if(value > 9999):
+        value = 9999
+    for p in range(pos+3,pos-1,-1):
+        buf[p] = 0x30+value % 10
+        value //= 10
+
+#ASCII package k of values, built in place in uart_package (same as uart_package_manager)
+def uart_package_builder(values):
+    global uart_package_index
+    start = (uart_package_index-1)*2
+    uart_package[0] = 0x41
+    uart_package[1] = 0x30+uart_package_index
+    put_digits(uart_package,2,values[start])
+    put_digits(uart_package,6,values[start+1] if start+1 < len(values) else 0)
+    uart_package[10] = 0x42
+
+    uart_package_index += 1
+    if(uart_package_index > uart_package_num):
+        uart_package_index = 1
+    return uart_package
+
+
+#Binary UART frame carrying every well (count wells, len(values)/count values each)
+def uart_frame_builder(values,count):
+    global frame_seq
+    frame_builder(uart_frame,frame_type_reading,frame_seq,values,count)
+    frame_seq = (frame_seq+1) & 0xFFFF
+    return uart_frame
+
+
+#Timer interrupt: once the line is idle send up to tx_burst bytes of the ring (never waits,
+#no heap allocation), stop when the ring is empty
+def uart_tx_irq(timer):
+    global tx_tail,tx_active
+    if not uart.txdone():
+        return
+    n = tx_burst
+    while(n and tx_tail != tx_head):
+        uart.writechar(tx_ring[tx_tail])
+        tx_tail = (tx_tail+1) & tx_mask
+        n -= 1
+    if(tx_tail == tx_head):
+        timer.callback(None)
+        tx_active = False
+
+#Stop the timer and send what is left in the ring (blocking, main loop only)
+def uart_drain():
+    global tx_tail,tx_active
+    tx_timer.callback(None)
+    tx_active = False
+    while(tx_tail != tx_head):
+        uart.writechar(tx_ring[tx_tail])
+        tx_tail = (tx_tail+1) & tx_mask
+
+#Queue a message for the UART (blocking uart.write when the pipeline is off or the ring is full)
+def uart_send(buf):
+    global tx_head,tx_active,tx_stalls
+    if not enable_pipeline:
+        uart.write(buf)
+        return
+    if isinstance(buf,str):
+        buf = buf.encode()
+    n = len(buf)
+    if(n > tx_mask-((tx_head-tx_tail) & tx_mask)):
+        #More traffic than the line carries: wait for it instead of losing a reading
+        tx_stalls += 1
+        uart_drain()
+        uart.write(buf)
+        return
+    head = tx_head
+    for i in range(n):
+        tx_ring[head] = buf[i]
+        head = (head+1) & tx_mask
+    tx_head = head
+    if not tx_active:
+        tx_active = True
+        tx_timer.callback(uart_tx_irq)
+
+
+#UART LED Control
+def uart_led_control(led,enable=True):
+    if(enable):
+        global uart_led_status
+        if(uart_led_status):
+            led.on()
+        else:
+            led.off()
+        uart_led_status = not(uart_led_status)
+
+
+#Run every metric stage on wells first..last-1 of one frame
+#(wells that have a call or all their scheduled frames are skipped)
+def run_stages(img,first,last):
+    for i in range(first,last):
+        if(well_skip(i)):
+            continue
+        for k,fn in color_stages:
+            well_value[i*metric_num+k] = fn(img,i,None)
+    prof_mark(stage_color)
+
+    if gray_stages:
+        #Keep only the Y channel (in place, no extra frame buffer)
+        img = img.to_grayscale()
+        for i in range(first,last):
+            if(well_skip(i)):
+                continue
+            stats = img.get_statistics(roi=luma_rois[i])
+            for k,fn in gray_stages:
+                well_value[i*metric_num+k] = fn(img,i,stats)
+    prof_mark(stage_gray)
+
+    for i in range(first,last):
+        if(well_skip(i)):
+            continue
+        update_estimators(i)
+        if enable_early_decision:
+            update_call(i)
+    prof_mark(stage_estimators)
+    return img
+
+
+#Update the estimators of well i with the values of the latest frame
+def update_estimators(i):
+    global value_clamps
+    well_samples[i] += 1
+    n = well_samples[i]
+    first_frame = (well_frames[i] == 0)
+    pos = well_frames[i] % median_window
+    for j in range(i*metric_num,(i+1)*metric_num):
+        x = well_value[j]
+        if(x > value_max):
+            x = value_max
+            value_clamps += 1
+
+        #Mean / variance from sums shifted by the first value (small, exact integers)
+        if(n == 1):
+            well_first[j] = x
+        d = x-well_first[j]
+        well_sum[j] += d
+        well_sq[j] += d*d
+
+        #EMA (x 16) / exponentially weighted variance, ema_q/256 weight
+        if(first_frame):
+            well_ema[j] = x << 4
+            well_emv[j] = 0
+        else:
+            d = (x << 4)-well_ema[j]
+            well_ema[j] += (ema_q*d+128) >> 8
+            d = (d*d+128) >> 8
+            well_emv[j] = ((256-ema_q)*(well_emv[j]+((ema_q*d+128) >> 8))+128) >> 8
+
+        #Median ring buffer
+        well_ring[j*median_window+pos] = x
+    well_frames[i] += 1
+
+
+#Sort the median window of value j into ring_sorted (insertion sort), returns its size
+def ring_window(j):
+    m = min(well_frames[j//metric_num],median_window)
+    base = j*median_window
+    for a in range(m):
+        x = well_ring[base+a]
+        b = a
+        while(b > 0 and ring_sorted[b-1] > x):
+            ring_sorted[b] = ring_sorted[b-1]
+            b -= 1
+        ring_sorted[b] = x
+    return m
+
+#Mean of value j over the n frames of this message, rounded down
+def well_mean(j,n):
+    return well_first[j]+well_sum[j]//n if n else 0
+
+#Rounded a/n (n > 0)
+def rdiv(a,n):
+    return (2*a+n)//(2*n)
+
+#(mean - first value) x 16 of value j
+def well_shift_q(j,n):
+    return rdiv(well_sum[j] << 4,n)
+
+#Squared standard error of the mean of value j x 16 (sample variance / n), without n^2 sized products
+def well_se2(j,n):
+    if(n < 2):
+        return 0
+    sq = well_sq[j]
+    q = sq//n
+    m = well_shift_q(j,n)
+    v = (q << 4)+rdiv((sq-q*n) << 4,n)-((m*m+8) >> 4)
+    return max(v,0)//(n-1)
+
+#Estimate of value j
+def estimate(j):
+    if(estimator == "ema"):
+        return well_ema[j] >> 4
+    if(estimator == "median"):
+        m = ring_window(j)
+        return ring_sorted[m//2] if m else 0
+    return well_mean(j,well_samples[j//metric_num])
+
+#Confidence of the estimate of value j (same units)
+def confidence(j):
+    if(estimator == "ema"):
+        return math.sqrt(well_emv[j])
+    if(estimator == "median"):
+        m = ring_window(j)
+        return (ring_sorted[(3*(m-1))//4]-ring_sorted[(m-1)//4])/2 if m else 0
+    return math.sqrt(well_se2(j,well_samples[j//metric_num]))/4
+
+#Reset the per-message estimators (all = also EMA / median history and calls)
+def reset_estimators(all=False):
+    global sched_extra
+    sched_extra = False
+    for j in range(value_num):
+        well_sum[j] = 0
+        well_sq[j] = 0
+    for i in range(well_num):
+        well_samples[i] = 0
+        well_alloc[i] = sched_min_frames
+        if(all):
+            well_frames[i] = 0
+            well_call[i] = 0
+
+
+#(mean - decision_thresh) x 16 of well i
+def decision_dist(i,n):
+    j = i*metric_num+decision_k
+    return ((well_first[j]-decision_thresh) << 4)+well_shift_q(j,n)
+
+#Sequential test of well i: call it once the mean is decision_z standard errors off the threshold
+#(|mean-thresh| > z*se  <=>  (mean-thresh)^2 / z^2 > se^2, x 16 in small integers)
+def update_call(i):
+    n = well_samples[i]
+    if(n < decision_min_frames or n < 2):
+        return
+    d = decision_dist(i,n)
+    se2 = max(well_se2(i*metric_num+decision_k,n),se_min2_q)
+    if((d*d)//z2_q > se2):
+        well_call[i] = call_negative if d >= 0 else call_positive
+
+#Call of well i on the mean alone (decision_max_frames reached)
+def force_call(i):
+    if(well_call[i] == 0):
+        well_call[i] = call_negative if decision_dist(i,well_samples[i]) >= 0 else call_positive
+
+#Well i is finished after f frames, its scheduled frames or, in early decision mode, once it has a call
+def well_done(i,f):
+    if(well_call[i] or well_samples[i] >= samples_max):
+        return True
+    if enable_scheduler:
+        return well_samples[i] >= well_alloc[i]
+    if enable_early_decision:
+        return well_samples[i] >= decision_max_frames
+    return well_samples[i] >= f
+
+#Well i needs no more frames in this message (skipped by the metric stages)
+def well_skip(i):
+    return well_call[i] != 0 or well_samples[i] >= samples_max or \
+           (enable_scheduler and well_samples[i] >= well_alloc[i])
+
+#First well from i on that still needs frames (well_num if none)
+def next_well(i):
+    if enable_scheduler:
+        while(i < well_num and well_skip(i)):
+            i += 1
+    return i
+
+#Spread the frames left in frame_budget over the wells by var / distance^2, returns True if any
+def schedule_extra():
+    spare = frame_budget-sched_min_frames*well_num
+    if(spare <= 0):
+        return False
+    total = 0
+    for i in range(well_num):
+        well_prio[i] = 0
+        n = well_samples[i]
+        if(well_call[i] or n < 2):
+            continue
+        d = max(abs(decision_dist(i,n))/16,sched_dist_min)
+        well_prio[i] = n*well_se2(i*metric_num+decision_k,n)/16/(d*d)
+        total += well_prio[i]
+    if(total <= 0):
+        return False
+
+    #Proportional share, leftover frames to the highest priorities
+    given = 0
+    for i in range(well_num):
+        extra = int(spare*well_prio[i]/total)
+        well_alloc[i] += extra
+        given += extra
+    while(given < spare):
+        best = 0
+        for i in range(1,well_num):
+            if(well_prio[i] > well_prio[best]):
+                best = i
+        if(well_prio[best] <= 0):
+            break
+        well_alloc[best] += 1
+        well_prio[best] = 0
+        given += 1
+    return True
+
+
+#Collect the estimates of every well and send the message
+def send_message():
+    global message_index,uart_package_index
+    for i in range(well_num):
+        base = i*well_values
+        for k in range(metric_num):
+            well_result[base+k] = min(int(estimate(i*metric_num+k)),0xFFFF)
+            if enable_confidence:
+                well_result[base+metric_num+k] = min(int(confidence(i*metric_num+k)+0.5),0xFFFF)
+        if enable_early_decision:
+            well_result[base+well_values-1] = well_call[i]
+        if not enable_low_alloc:
+            print("Well{}:".format(i+1),well_result[base:base+well_values], \
+                  "frames:{}".format(well_samples[i]) if enable_scheduler else "")
+
+    if uart_binary_frame:
+        uart_message = uart_frame_builder(well_result,well_num)
+        if not enable_low_alloc:
+            print("#{} Sent through UART->: {} bytes\r\n".format(message_index,len(uart_message)))
+    elif enable_low_alloc:
+        uart_message = uart_package_builder(well_result)
+    else:
+        msg = uart_msg_start
+        for value in well_result:
+            msg += message_padding(value,4)
+        msg += uart_msg_tail
+        print("#{} Message->: {}".format(message_index,msg))
+        uart_message,uart_package_index = uart_package_manager(msg,uart_package_index,uart_package_num)
+        print("#{} Sent through UART->: {}\r\n".format(message_index,uart_message))
+
+    # Send UART message
+    uart_send(uart_message)
+    uart_led_control(uart_led)
+    message_index += 1
+    if(gc_report_every and message_index % gc_report_every == 0):
+        gc_report()
+
+    #Profiler telemetry after the reading
+    if(enable_profiler and (telemetry_pending or \
+       (telemetry_every and uart_binary_frame and message_index % telemetry_every == 0))):
+        send_telemetry()
+
+
+#Start timing a frame (every stage is marked on every frame, skipped ones take ~0 us)
+def prof_start():
+    global prof_t0,prof_t
+    if not enable_profiler:
+        return
+    prof_t0 = time.ticks_us()
+    prof_t = prof_t0
+
+#Time of the stage that just ended
+def prof_mark(stage):
+    global prof_t
+    if not enable_profiler:
+        return
+    now = time.ticks_us()
+    prof_ring[stage*profile_window+prof_pos] = time.ticks_diff(now,prof_t)
+    prof_t = now
+
+#Total time of the frame, move to the next ring slot
+def prof_end():
+    global prof_pos,prof_count
+    if not enable_profiler:
+        return
+    prof_ring[stage_frame*profile_window+prof_pos] = time.ticks_diff(time.ticks_us(),prof_t0)
+    prof_pos = (prof_pos+1) % profile_window
+    if(prof_count < profile_window):
+        prof_count += 1
+
+#min / mean / p99 / max of stage s into telemetry_values[v:v+4] (p99 = nearest rank)
+#over the finished frames of the ring (the slot of the current frame is skipped)
+def stage_summary(s,v):
+    m = prof_count
+    if(m == profile_window):
+        m -= 1
+    if(m == 0):
+        return
+    k = m-(99*m+99)//100+1     # p99 is the k-th largest value
+    base = s*profile_window
+    for a in range(k):
+        prof_top[a] = 0
+    lo = 0xFFFF
+    total = 0
+    for a in range(prof_count):
+        if(a == prof_pos):
+            continue
+        x = prof_ring[base+a]
+        total += x
+        if(x < lo):
+            lo = x
+        if(x > prof_top[k-1]):
+            b = k-1
+            while(b > 0 and prof_top[b-1] < x):
+                prof_top[b] = prof_top[b-1]
+                b -= 1
+            prof_top[b] = x
+    telemetry_values[v] = min(lo,0xFFFF)
+    telemetry_values[v+1] = min(total//m,0xFFFF)
+    telemetry_values[v+2] = min(prof_top[k-1],0xFFFF)
+    telemetry_values[v+3] = min(prof_top[0],0xFFFF)
+
+#Send the stage summaries as a telemetry frame
+def send_telemetry():
+    global telemetry_seq,telemetry_pending
+    for s in range(stage_num):
+        stage_summary(s,s*4)
+    frame_builder(telemetry_frame,frame_type_telemetry,telemetry_seq,telemetry_values,stage_num)
+    telemetry_seq = (telemetry_seq+1) & 0xFFFF
+    telemetry_pending = False
+    uart_send(telemetry_frame)
+    if not enable_low_alloc:
+        print("#{} Telemetry->: {} bytes\r\n".format(message_index,len(telemetry_frame)))
+
+
+#Garbage collection between frames: once gc_alloc_limit bytes were allocated, or
+#gc_idle_alloc bytes if the frame left time before frame_time_us (pause and allocation counters)
+def gc_between_frames():
+    global gc_frames,gc_collects,gc_total_us,gc_max_us,gc_alloc_max,gc_base,gc_last
+    gc_frames += 1
+    now = gc.mem_alloc()
+    if(now-gc_last > gc_alloc_max):
+        gc_alloc_max = now-gc_last
+    gc_last = now
+    alloc = now-gc_base
+    if(alloc < gc_idle_alloc):
+        return
+    if(alloc < gc_alloc_limit and time.ticks_diff(time.ticks_us(),frame_t0) >= frame_time_us):
+        return
+    t0 = time.ticks_us()
+    gc.collect()
+    dt = time.ticks_diff(time.ticks_us(),t0)
+    gc_base = gc.mem_alloc()
+    gc_last = gc_base
+    gc_collects += 1
+    gc_total_us += dt
+    if(dt > gc_max_us):
+        gc_max_us = dt
+
+#Print and clear the GC counters
+def gc_report():
+    global gc_frames,gc_collects,gc_total_us,gc_max_us,gc_alloc_max,value_clamps
+    print("GC: frames:{} collects:{} mean:{}us max:{}us alloc/frame max:{}B free:{}B tx stalls:{} clamps:{}".format(
+          gc_frames,gc_collects,gc_total_us//max(gc_collects,1),gc_max_us,gc_alloc_max,gc.mem_free(),tx_stalls,
+          value_clamps))
+    gc_frames,gc_collects,gc_total_us,gc_max_us,gc_alloc_max,value_clamps = 0,0,0,0,0,0
+
+
+#Command value i (u16) of the frame payload at cmd_buf[data]
+def cmd_value(data,i):
+    return cmd_buf[data+2*i] | (cmd_buf[data+2*i+1] << 8)
+
+#Replace an ROI table and its plate table (full frame coordinates, count == well_num, inside the sensor window)
+def set_rois(rois,plate,count,data,n):
+    if(count != well_num or n != 4*count):
+        return ack_bad_length
+    for i in range(count):
+        x,y = cmd_value(data,4*i)-sensor_window[0],cmd_value(data,4*i+1)-sensor_window[1]
+        w,h = cmd_value(data,4*i+2),cmd_value(data,4*i+3)
+        if(x < 0 or y < 0 or w == 0 or h == 0 or x+w > sensor_window[2] or y+h > sensor_window[3]):
+            return ack_bad_value
+    for i in range(count):
+        plate[i] = (cmd_value(data,4*i),cmd_value(data,4*i+1),cmd_value(data,4*i+2),cmd_value(data,4*i+3))
+        rois[i] = (plate[i][0]-sensor_window[0],plate[i][1]-sensor_window[1],plate[i][2],plate[i][3])
+        well_ref[i] = None
+    return ack_ok
+
+#Replace the LAB thresholds (count x 6 values, int16)
+def set_thresh(count,data,n):
+    global chemical_thresh
+    if(count == 0 or n != 6*count):
+        return ack_bad_length
+    thresh = []
+    for t in range(count):
+        v = [cmd_value(data,6*t+c) for c in range(6)]
+        thresh.append(tuple([x-0x10000 if x & 0x8000 else x for x in v]))
+    chemical_thresh = thresh
+    return ack_ok
+
+#Set parameters of command_params (count x (index, value)), all or none
+def set_params(count,data,n):
+    if(count == 0 or n != 2*count):
+        return ack_bad_length
+    for p in range(count):
+        index,value = cmd_value(data,2*p),cmd_value(data,2*p+1)
+        if(index >= len(command_params) or value < command_params[index][2] or \
+           value > command_params[index][3]):
+            return ack_bad_value
+    g = globals()
+    for p in range(count):
+        name,scale,_,_ = command_params[cmd_value(data,2*p)]
+        value = cmd_value(data,2*p+1)
+        g[name] = value if scale == 1 else value/scale
+    fixed_params()
+    return ack_ok
+
+#Execute one command frame and acknowledge it
+def run_command(cmd,seq,count,data,n):
+    global paused,telemetry_pending,ack_seq,well_index
+    status = ack_ok
+    if(cmd == cmd_set_roi):
+        status = set_rois(well_rois,plate_well_rois,count,data,n)
+    elif(cmd == cmd_set_luma_roi):
+        status = set_rois(luma_rois,plate_luma_rois,count,data,n)
+    elif(cmd == cmd_calibrate):
+        status = ack_ok if recalibrate() else ack_bad_value
+    elif(cmd == cmd_set_thresh):
+        status = set_thresh(count,data,n)
+    elif(cmd == cmd_set_param):
+        status = set_params(count,data,n)
+    elif(cmd == cmd_telemetry):
+        if enable_profiler:
+            telemetry_pending = True
+        else:
+            status = ack_bad_value
+    elif(cmd == cmd_pause):
+        paused = True
+    elif(cmd == cmd_resume):
+        paused = False
+    else:
+        status = ack_unknown
+
+    #New ROIs / thresholds: restart the reading
+    if(status == ack_ok and cmd in (cmd_set_roi,cmd_set_luma_roi,cmd_set_thresh)):
+        reset_estimators(True)
+        well_index = 0
+
+    ack_values[0],ack_values[1],ack_values[2] = cmd,seq,status
+    frame_builder(ack_frame,frame_type_ack,ack_seq,ack_values,1)
+    ack_seq = (ack_seq+1) & 0xFFFF
+    uart_send(ack_frame)
+
+    #Telemetry requested while paused (no message to follow)
+    if(telemetry_pending and paused):
+        send_telemetry()
+
+#Full frame calibration while running (windowing off, then back on the new ROIs)
+def recalibrate():
+    global well_index
+    if enable_windowing:
+        sensor.set_windowing((0,0,frame_w,frame_h))
+        sensor.skip_frames(time = 200)
+    ok = calibrate()
+    apply_window()
+    reset_estimators(True)
+    well_index = 0
+    return ok
+
+#Look up every calibrated well inside its ROI (+ drift_margin), recalibrate if one moved
+def check_drift():
+    img = sensor.snapshot()
+    for i in range(well_num):
+        ref = well_ref[i]
+        if ref is None:
+            continue
+        c = drift_centroid(img,plate_well_rois[i],sensor_window[0],sensor_window[1])
+        if(c is None or abs(c[0]-ref[0]) > drift_tolerance or abs(c[1]-ref[1]) > drift_tolerance):
+            print("Well{} drifted ({} -> {}), recalibrating".format(i+1,ref,c))
+            recalibrate()
+            return False
+    return True
+
+
+#Read the pending UART bytes (non-blocking) and run every complete command frame
+def poll_commands():
+    global cmd_len
+    n = min(uart.any(),len(cmd_buf)-cmd_len,len(cmd_rx))
+    if(n <= 0):
+        return
+    got = uart.readinto(cmd_rx,n)
+    if got:
+        for a in range(got):
+            cmd_buf[cmd_len+a] = cmd_rx[a]
+        cmd_len += got
+
+    pos = 0
+    while(True):
+        #Sync bytes
+        while(pos+1 < cmd_len and not(cmd_buf[pos] == 0xA5 and cmd_buf[pos+1] == 0x5A)):
+            pos += 1
+        if(cmd_len-pos < frame_header_size):
+            break
+        version,cmd,count = cmd_buf[pos+2],cmd_buf[pos+3],cmd_buf[pos+8]
+        length = cmd_buf[pos+4] | (cmd_buf[pos+5] << 8)
+        seq = cmd_buf[pos+6] | (cmd_buf[pos+7] << 8)
+        size = frame_header_size+length+2
+        if(version != frame_version or length & 1 or size > len(cmd_buf)):
+            pos += 1
+            continue
+        if(cmd_len-pos < size):
+            break
+        end = pos+frame_header_size+length
+        if(crc16(cmd_buf,pos+2,end) != (cmd_buf[end] | (cmd_buf[end+1] << 8))):
+            pos += 1
+            continue
+        run_command(cmd,seq,count,pos+frame_header_size,length//2)
+        pos += size
+
+    #Keep the unparsed tail (a full buffer without a frame is noise)
+    if(pos):
+        for a in range(cmd_len-pos):
+            cmd_buf[a] = cmd_buf[pos+a]
+        cmd_len -= pos
+    if(cmd_len == len(cmd_buf)):
+        cmd_len = 0
+
+
+#Process one frame
+def step():
+    global well_index,plate_frames,sched_extra,frame_t0
+
+    #Paused by command: preview only, keep polling the commands
+    if paused:
+        img = sensor.snapshot()
+        poll_commands()
+        return img
+
+    #FPS Counter
+    clock.tick()
+    frame_t0 = time.ticks_us()
+    prof_start()
+
+    #Send GPIO signal (System Ready)
+    ready.low()
+
+    #Image capture
+    img = sensor.snapshot()
+
+    #Image Rotation
+    img = img.replace(img,vflip=False,hmirror=False,transpose=False)
+    prof_mark(stage_snapshot)
+
+    #Frames for each well (2 is shortest, dwell_frames can be changed by command)
+    f = dwell_frames
+
+    #Wells measured on this snapshot
+    if scan_all_areas:
+        first,last = 0,well_num
+    else:
+        first,last = well_index,well_index+1
+
+    img = run_stages(img,first,last)
+
+    #Visualize detection result
+    if scan_all_areas:
+        for i in range(well_num):
+            img.draw_rectangle(well_rois[i],color=roi_color)
+            blob = well_blob[i]
+            if blob is not None:
+                img.draw_rectangle(blob.x(),blob.y(),blob.w(),blob.h(),color=blob_color)
+    elif enable_roi:
+        #Zoom to the current well
+        blob = well_blob[well_index]
+        roi = well_rois[well_index]
+        img = img.crop(roi=roi)
+        img = img.draw_string(1,1,well_labels[well_index],color=blob_color)
+        if blob is not None:
+            img = img.draw_rectangle(blob.x()-roi[0],blob.y()-roi[1],blob.w(),blob.h(), \
+                                     color=blob_color)
+    prof_mark(stage_draw)
+
+    #Frame Delay (every well of this snapshot finished)
+    plate_frames += 1
+    reading_done = True
+    for i in range(first,last):
+        if not well_done(i,f):
+            reading_done = False
+    if(reading_done):
+        well_index = next_well(last)
+        reading_done = (well_index == well_num)
+
+        #Scheduler: second pass over the uncertain wells
+        if(reading_done and enable_scheduler and not sched_extra):
+            sched_extra = True
+            if schedule_extra():
+                well_index = next_well(0)
+                reading_done = (well_index == well_num)
+        if(reading_done):
+            sched_extra = False
+            well_index = 0
+            if enable_early_decision:
+                for i in range(well_num):
+                    force_call(i)
+                if not enable_low_alloc:
+                    print("Plate called in {} frames".format(plate_frames))
+
+    #Send the reading (streaming -> current estimates every frame)
+    if(stream_mode or reading_done):
+        send_message()
+    if(reading_done):
+        reset_estimators(enable_early_decision)
+        plate_frames = 0
+
+        #Tray drift check on the cached ROIs
+        if(enable_auto_roi and drift_check_every and message_index % drift_check_every == 0):
+            check_drift()
+
+    #Host commands (between frames)
+    if enable_commands:
+        poll_commands()
+    prof_mark(stage_send)
+
+    #Garbage collection between frames
+    if enable_low_alloc:
+        gc_between_frames()
+    prof_mark(stage_gc)
+    prof_end()
+
+    return img
+
+
+#Automatic collection stays on as a fallback (heap exhausted between two collections)
+if enable_low_alloc:
+    gc.collect()
+    gc_base = gc.mem_alloc()
+    gc_last = gc_base
+
+
+#Capture and Loop
+def main():
+    while(True):
+        step()
+
+
+if __name__ == "__main__":
+    main()
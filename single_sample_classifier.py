@@ -3,7 +3,7 @@
 @@@ Author: VincentChan
 @@@ Date:   12/21/2020
 """
-import sensor, image, time
+import sensor, image, time, math
 
 sensor.reset()                      # Reset and initialize the sensor.
 sensor.set_pixformat(sensor.RGB565) # Set pixel format to RGB565 (or GRAYSCALE)
@@ -26,15 +26,105 @@ negative = False
 chemicals_n_thresh = [(59, 100, 26, -48, -44, 49)]
 chemicals_p_thresh = [(40, 90, -1, 90, -85, -22)]
 blob_roi = (0,0,110,42)
+enable_fused_blobs = True   # One find_blobs call for both chemicals (separated by blob code)
+
+#Blob filters (pixels_threshold, area_threshold, min blob area, max blob area)
+p_filter = (1,300,300,1000)
+n_filter = (20,80,80,500)
 
 #Remove fish eye effect
 enable_lens_corr = True
+lens_corr_strength = 2.2
+enable_lens_remap = False   # Map blob_roi through the lens model once instead of warping every frame
 
 #Output data
 p_area,p_cx,p_cy = 0,0,0
 n_area,n_cx,n_cy = 0,0,0
 
-while(True):
+
+#Source pixel of lens_corr() for a pixel of the corrected image
+def lens_corr_point(x,y,w,h,strength,zoom=1.0):
+    half_w,half_h = w//2,h//2
+    dx,dy = x-half_w,y-half_h
+    r = strength/math.sqrt(w*w+h*h)*math.sqrt(dx*dx+dy*dy)
+    theta = 1.0
+    if(r > 0.0000001):
+        theta = math.atan(r)/r
+    return half_w+int(round(theta*dx/zoom)),half_h+int(round(theta*dy/zoom))
+
+
+#Bounding box in the uncorrected image of a roi of the corrected image
+def lens_remap_roi(roi,w,h,strength):
+    x,y,rw,rh = roi
+    border = [(x+i,y) for i in range(rw)]+[(x+i,y+rh-1) for i in range(rw)]+ \
+             [(x,y+j) for j in range(rh)]+[(x+rw-1,y+j) for j in range(rh)]
+    xs,ys = [],[]
+    for px,py in border:
+        sx,sy = lens_corr_point(px,py,w,h,strength)
+        xs.append(sx)
+        ys.append(sy)
+    return (min(xs),min(ys),max(xs)-min(xs)+1,max(ys)-min(ys)+1)
+
+
+#Lens remap: detect on the uncorrected image, areas scaled to uncorrected pixels
+detect_roi = blob_roi
+if(enable_lens_corr and enable_lens_remap):
+    if enable_roi:
+        lens_w,lens_h = roi_w,roi_h
+    else:
+        lens_w,lens_h = sensor.height(),sensor.width()   # transpose=True
+    detect_roi = lens_remap_roi(blob_roi,lens_w,lens_h,lens_corr_strength)
+    lens_area_scale = (blob_roi[2]*blob_roi[3])/(detect_roi[2]*detect_roi[3])
+    p_filter = tuple([max(1,int(v/lens_area_scale)) for v in p_filter])
+    n_filter = tuple([max(1,int(v/lens_area_scale)) for v in n_filter])
+
+#Codes of the positive thresholds in the fused pass
+p_codes = (1 << len(chemicals_p_thresh))-1
+fused_thresh = chemicals_p_thresh+chemicals_n_thresh
+
+
+#Per chemical filter before merging (same as the separate passes)
+def blob_filter(blob):
+    if(blob.code() & p_codes):
+        f = p_filter
+    else:
+        f = n_filter
+    return (blob.pixels() >= f[0]) and (blob.area() >= f[1])
+
+
+#Only merge blobs of the same chemical
+def same_chemical(blob_a,blob_b):
+    return (blob_a.code() & p_codes == 0) == (blob_b.code() & p_codes == 0)
+
+
+#Last blob of each chemical inside its area range -> (p_blob,n_blob)
+def detect_blobs(img):
+    p_blob,n_blob = None,None
+    if enable_fused_blobs:
+        for blob in img.find_blobs(fused_thresh,roi=detect_roi,pixels_threshold=min(p_filter[0],n_filter[0]), \
+                                   area_threshold=min(p_filter[1],n_filter[1]),merge=True, \
+                                   threshold_cb=blob_filter,merge_cb=same_chemical):
+            if(blob.code() & p_codes):
+                if((blob[4]<p_filter[3])and(blob[4]>p_filter[2])):
+                    p_blob = blob
+            elif((blob[4]<n_filter[3])and(blob[4]>n_filter[2])):
+                n_blob = blob
+        return p_blob,n_blob
+
+    for blob in img.find_blobs(chemicals_p_thresh,roi=detect_roi,pixels_threshold=p_filter[0], \
+                               area_threshold=p_filter[1],merge=True):
+        if((blob[4]<p_filter[3])and(blob[4]>p_filter[2])):
+            p_blob = blob
+    for blob in img.find_blobs(chemicals_n_thresh,roi=detect_roi,pixels_threshold=n_filter[0], \
+                               area_threshold=n_filter[1],merge=True):
+        if((blob[4]<n_filter[3])and(blob[4]>n_filter[2])):
+            n_blob = blob
+    return p_blob,n_blob
+
+
+#Process one frame
+def step():
+    global positive,negative,p_area,p_cx,p_cy,n_area,n_cx,n_cy
 
     clock.tick()
     img = sensor.snapshot()
@@ -54,38 +144,19 @@ while(True):
           img = img.gaussian(1)
 
     #Unfisy-eye
-    if enable_lens_corr: img.lens_corr(2.2)
-
-
-    #Blob detection (COVID Positive)
-    for blob in img.find_blobs(chemicals_p_thresh, roi=blob_roi ,pixels_threshold=1, \
-                               area_threshold=300, merge=True):
-        blob_area = blob[4]
-        blob_rect = blob.rect()
-        blob_cx,blob_cy = blob.cx(), blob.cy()
-        if((blob_area<1000)and(blob_area>300)):
-            #Green for positive
-            #print("Detection Result:")
-            #print("Area:{} CX:{} CY:{} Result: Positive".format(blob_area,blob_cx,blob_cy))
-            #img = img.draw_rectangle(blob_rect,color=(0,255,0))
-            p_area,p_cx,p_cy = blob_area,blob_cx,blob_cy
-            p_rect = blob_rect
-            positive = True
-
-    #Blob detection (COVID Negative)
-    for blob in img.find_blobs(chemicals_n_thresh, roi=blob_roi ,pixels_threshold=20, \
-                           area_threshold=80, merge=True):
-        blob_area = blob[4]
-        blob_rect = blob.rect()
-        blob_cx,blob_cy = blob.cx(), blob.cy()
-        if((blob_area<500)and(blob_area>80)):
-            #Blue for negative
-            #print("Detection Result:")
-            #print("Area:{} CX:{} CY:{} Result: Negative".format(blob_area,blob_cx,blob_cy))
-            #img = img.draw_rectangle(blob_rect,color=(0,0,255))
-            n_area,n_cx,n_cy = blob_area,blob_cx,blob_cy
-            n_rect = blob_rect
-            negative = True
+    if(enable_lens_corr and not enable_lens_remap): img.lens_corr(lens_corr_strength)
+
+
+    #Blob detection (Green for positive, Blue for negative)
+    p_blob,n_blob = detect_blobs(img)
+    if p_blob:
+        p_area,p_cx,p_cy = p_blob[4],p_blob.cx(),p_blob.cy()
+        p_rect = p_blob.rect()
+        positive = True
+    if n_blob:
+        n_area,n_cx,n_cy = n_blob[4],n_blob.cx(),n_blob.cy()
+        n_rect = n_blob.rect()
+        negative = True
 
     #print("Positive:{} Negative:{}".format(positive,negative))
     #Visualization
@@ -110,3 +181,14 @@ while(True):
 
 
     #print("=======================EOF=======================")
+    return img
+
+
+#Capture and Loop
+def main():
+    while(True):
+        step()
+
+
+if __name__ == "__main__":
+    main()
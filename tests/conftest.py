@@ -0,0 +1,13 @@
+import os
+
+import pytest
+
+from host.emulator import load_script,synthetic_frames
+
+PIPELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),"quad_sample_pipeline.py")
+
+
+#quad_sample_pipeline.py loaded on the emulator shims (module configuration at its defaults)
+@pytest.fixture
+def pipeline():
+    return load_script(PIPELINE,synthetic_frames(4))
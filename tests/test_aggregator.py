@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from host.aggregator import Aggregator,Device,parse_metrics
+from host.result_store import ResultStore,ResultWriter
+from host.uart_decoder import FRAME_READING,FRAME_TELEMETRY,Frame,encode_ascii,encode_frame,open_pty_pair
+
+T0 = 1790000000.0
+
+
+def test_parse_metrics():
+    assert parse_metrics("blob_area") == ("blob_area",)
+    assert parse_metrics("blob_area, -,call") == ("blob_area","-","call")
+    with pytest.raises(ValueError):
+        parse_metrics("blob_area,area")
+
+
+def test_store_columns(tmp_path):
+    device = Device("/dev/ttyACM0",name="bench01")
+    with ResultWriter(str(tmp_path)) as writer:
+        aggregator = Aggregator([device],store=writer,metric="blob_area,-,call")
+        #Two wells of (blob area, luma mean, call code), then a telemetry frame
+        aggregator.update(device,T0,Frame(FRAME_READING,9,2,(300,41,2,12,40,1)))
+        aggregator.update(device,T0+1,Frame(FRAME_TELEMETRY,1,1,(1,2,3,4)))
+    state = aggregator.table["bench01"]
+    assert (state["seq"],state["values"],state["readings"],state["other_frames"]) == (9,(300,41,2,12,40,1),1,1)
+
+    records = ResultStore(str(tmp_path)).query()
+    assert list(records["well"]) == [1,2]
+    assert list(records["blob_area"]) == [300,12]
+    assert list(records["call"]) == [2,1]
+    assert list(records["seq"]) == [9,9]
+
+
+class _Port:
+    paused = False
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+
+def test_full_queue_pauses_the_port():
+    device = Device("/dev/ttyACM0",queue_size=4)
+    device.queue = asyncio.Queue(4)
+    port = _Port()
+    for seq in range(6):
+        device._on_frame(port,Frame(FRAME_READING,seq,1,(seq,)))
+    assert port.paused and device.paused
+    assert device.pauses == 1
+    #A port that keeps reading after the pause overflows, the oldest readings go
+    assert device.overflows == 2
+    assert [device.queue.get_nowait()[1].seq for _ in range(4)] == [2,3,4,5]
+
+
+#Wait until the published table satisfies done(table)
+async def _until(reader,table,done,timeout=3.0):
+    while not done(table):
+        line = await asyncio.wait_for(reader.readline(),timeout)
+        table.update(json.loads(line)["devices"])
+    return table
+
+
+async def _bench(tmp_path):
+    ptys = [open_pty_pair() for _ in range(2)]
+    devices = [Device(ptys[0][2],name="binary",retry=0.05),Device(ptys[1][2],name="ascii",retry=0.05),
+               Device(str(tmp_path / "unplugged"),name="unplugged",retry=0.05)]
+    aggregator = Aggregator(devices,interval=0.02)
+    path = str(tmp_path / "aggregator.sock")
+    server,tasks = await aggregator.serve(unix=path)
+    try:
+        reader,writer = await asyncio.open_unix_connection(path)
+        table = json.loads(await reader.readline())["devices"]
+        assert sorted(table) == ["ascii","binary","unplugged"]
+        await _until(reader,table,lambda t: t["binary"]["online"] and t["ascii"]["online"])
+
+        os.write(ptys[0][0],encode_frame([1,2,3,4],seq=5) + encode_frame([7],seq=1,frame_type=FRAME_TELEMETRY))
+        for seq in range(2):
+            os.write(ptys[1][0],b"".join(encode_ascii([10,20,30,40,50,60+seq])))
+        await _until(reader,table,lambda t: t["binary"]["other_frames"] and t["ascii"]["readings"] >= 2)
+        assert (table["binary"]["seq"],table["binary"]["values"]) == (5,[1,2,3,4])
+        assert table["ascii"]["values"] == [10,20,30,40,50,61]
+        assert not table["unplugged"]["online"]
+
+        #Unplugging a tester marks it offline
+        os.close(ptys[0][0])
+        await _until(reader,table,lambda t: not t["binary"]["online"])
+        assert table["ascii"]["online"]
+        writer.close()
+        return aggregator.readings
+    finally:
+        for task in tasks:
+            task.cancel()
+        for device in devices:
+            device.close()
+        server.close()
+        os.close(ptys[1][0])
+        for _,slave,_ in ptys:
+            os.close(slave)
+
+
+def test_bench(tmp_path):
+    assert asyncio.run(_bench(tmp_path)) == 3
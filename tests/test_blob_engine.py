@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from host.blob_engine import find_blobs,find_blobs_masks,find_blobs_rois,threshold_table
+
+
+def _frame(seed,dtype=np.uint8):
+    rng = np.random.default_rng(seed)
+    if(dtype == np.uint8):
+        return rng.integers(0,256,(60,80),dtype=np.uint8)
+    return rng.integers(0,0x10000,(60,80),dtype=np.uint16)
+
+
+#Blob of a roi moved into roi coordinates
+def _local(blob,roi):
+    x,y = roi[0],roi[1]
+    return (blob.x()-x,blob.y()-y,blob.w(),blob.h(),blob.pixels(),blob.cx()-x,blob.cy()-y,blob.code(),blob.count())
+
+
+def _key(blob):
+    return (blob.x(),blob.y(),blob.w(),blob.h(),blob.pixels(),blob.cx(),blob.cy(),blob.code(),blob.count())
+
+
+@pytest.mark.parametrize("dtype,threshold",[(np.uint8,(120,255)),(np.uint16,(30,100,-20,60,-40,40))])
+@pytest.mark.parametrize("merge",[False,True])
+def test_rois_match_masks(dtype,threshold,merge):
+    frame = _frame(3,dtype)
+    rois = [(0,0,20,15),(25,10,20,15),(60,45,20,15),(5,40,20,15)]
+    table = threshold_table(threshold,dtype == np.uint8)
+    masks = np.stack([table[frame[y:y+h,x:x+w]] for x,y,w,h in rois])
+
+    by_roi = find_blobs_rois(frame,[threshold],rois,area_threshold=2,pixels_threshold=2,merge=merge)
+    by_mask = find_blobs_masks(masks,area_threshold=2,pixels_threshold=2,merge=merge)
+    assert sum(len(blobs) for blobs in by_roi) > 0
+    for roi,a,b in zip(rois,by_roi,by_mask):
+        assert sorted(_local(blob,roi) for blob in a) == sorted(_key(blob) for blob in b)
+        rot_a = sorted((_local(blob,roi),blob.rotation()) for blob in a)
+        rot_b = sorted((_key(blob),blob.rotation()) for blob in b)
+        assert [r for _,r in rot_a] == pytest.approx([r for _,r in rot_b],abs=1e-9)
+
+
+def test_rois_match_single_roi_calls():
+    frame = _frame(5)
+    rois = [(0,0,30,20),(40,30,40,30)]
+    by_roi = find_blobs_rois(frame,[(100,200)],rois,merge=True)
+    for roi,blobs in zip(rois,by_roi):
+        assert blobs == find_blobs(frame,[(100,200)],roi=roi,merge=True)
+
+
+def test_empty_masks():
+    found = find_blobs_masks(np.zeros((3,10,10),dtype=bool))
+    assert found == [[],[],[]]
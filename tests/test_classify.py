@@ -0,0 +1,101 @@
+import csv
+import importlib.util
+
+import numpy as np
+import pytest
+
+from host import batch_classifier,classify,colorspace
+from host.frame_log import FrameLogWriter
+
+ORANGE = 0xFC00    # Inside the chemical_thresh LAB range
+
+
+#QVGA frame with the given quad wells filled with ORANGE
+def _quad_frame(wells,noise=0):
+    frame = np.random.default_rng(noise).integers(0,0x0841,size=(240,320),dtype=np.uint16) if noise \
+        else np.zeros((240,320),dtype=np.uint16)
+    for i in wells:
+        x,y,w,h = classify.QUAD_CONFIG["well_rois"][i]
+        frame[y:y+h,x:x+w] = ORANGE
+    return frame
+
+
+def test_orange_is_a_chemical():
+    l,a,b = (int(c[0,0]) for c in colorspace.rgb565_to_lab(np.array([[ORANGE]],dtype=np.uint16)))
+    lo_l,hi_l,lo_a,hi_a,lo_b,hi_b = classify.QUAD_CONFIG["chemical_thresh"][0]
+    assert lo_l <= l <= hi_l and min(lo_a,hi_a) <= a <= max(lo_a,hi_a) and lo_b <= b <= hi_b
+
+
+def test_classify_quad():
+    rows = classify.classify_quad(_quad_frame([0,2]))
+    assert [r["well"] for r in rows] == [1,2,3,4]
+    assert [r["call"] for r in rows] == ["negative","positive","negative","positive"]
+    x,y,w,h = classify.QUAD_CONFIG["well_rois"][0]
+    assert rows[0]["blob_area"] == w*h
+    assert rows[1]["blob_area"] == 0
+    assert rows[0]["intensity"] > rows[1]["intensity"] == 0
+
+
+@pytest.mark.parametrize("p_area,n_area,call",[(400,0,"positive"),(400,90,"negative"),(0,90,"none"),(0,0,"none")])
+def test_single_call(p_area,n_area,call):
+    assert classify.single_call(p_area,n_area) == call
+
+
+def test_load_config(tmp_path):
+    path = tmp_path / "thresh.json"
+    path.write_text('{"area_thresh_n": 50}')
+    config = classify.load_config("quad",str(path))
+    assert config["area_thresh_n"] == 50
+    assert config["well_rois"] == classify.QUAD_CONFIG["well_rois"]
+    assert classify.QUAD_CONFIG["area_thresh_n"] == 200
+
+
+def _archive(tmp_path):
+    archive = tmp_path / "archive"
+    archive.mkdir()
+    layouts = [[0],[1,2],[],[0,1,2,3],[3]]
+    for k,wells in enumerate(layouts):
+        np.save(archive / ("frame%02d.npy" % k),_quad_frame(wells,noise=k+1))
+    log = str(tmp_path / "run.flog")
+    with FrameLogWriter(log,320,240) as writer:
+        for wells in layouts[:3]:
+            writer.write(_quad_frame(wells))
+    return batch_classifier.frame_paths([str(archive)])+[log],layouts
+
+
+def _read_csv(path):
+    with open(path,newline="") as f:
+        return sorted((r["source"],int(r["frame"]),int(r["well"]),r["call"]) for r in csv.DictReader(f))
+
+
+@pytest.mark.parametrize("workers",[1,2])
+def test_batch_run(tmp_path,workers):
+    paths,layouts = _archive(tmp_path)
+    out = str(tmp_path / ("results%d.csv" % workers))
+    frames,_ = batch_classifier.run(paths,out,workers=workers,chunk_size=2)
+    assert frames == 8
+
+    rows = _read_csv(out)
+    assert len(rows) == 4*8
+    expected = []
+    for k,wells in enumerate(layouts):
+        expected += [(paths[k],k,i+1,"negative" if i in wells else "positive") for i in range(4)]
+    for k,wells in enumerate(layouts[:3]):
+        expected += [(paths[-1],k,i+1,"negative" if i in wells else "positive") for i in range(4)]
+    assert rows == sorted(expected)
+
+
+def test_make_units(tmp_path):
+    paths,_ = _archive(tmp_path)
+    units = batch_classifier.make_units(paths,2)
+    assert [u for u in units if u[0] == "flog"] == [("flog",paths[-1],0,2),("flog",paths[-1],2,3)]
+    assert [(len(u[1]),u[2]) for u in units if u[0] == "files"] == [(2,0),(2,2),(1,4)]
+
+
+@pytest.mark.skipif(importlib.util.find_spec("PIL") is not None,reason="Pillow reads the file")
+@pytest.mark.parametrize("workers",[1,2])
+def test_worker_error_does_not_stall(tmp_path,workers):
+    bad = tmp_path / "frame.png"
+    bad.write_bytes(b"not an image")
+    with pytest.raises(RuntimeError,match="Pillow"):
+        batch_classifier.run([str(bad)],str(tmp_path / "out.csv"),workers=workers)
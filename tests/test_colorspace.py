@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pytest
+
+from host import colorspace
+
+
+@pytest.fixture(autouse=True)
+def lut_dir(tmp_path,monkeypatch):
+    monkeypatch.setattr(colorspace,"LUT_DIR",str(tmp_path / "luts"))
+    monkeypatch.setattr(colorspace,"_tables",{})
+    return tmp_path / "luts"
+
+
+def _frame():
+    return np.random.default_rng(3).integers(0,65536,size=(24,32),dtype=np.uint32).astype(np.uint16)
+
+
+def test_lookup_matches_direct_conversion():
+    frame = _frame()
+    rgb = colorspace.rgb565_to_rgb888(frame)
+    for lookup,direct in zip(colorspace.rgb565_to_lab(frame),colorspace.rgb888_to_lab(*rgb)):
+        np.testing.assert_array_equal(lookup,direct)
+    for lookup,direct in zip(colorspace.rgb565_to_yuv(frame),colorspace.rgb888_to_yuv(*rgb)):
+        np.testing.assert_array_equal(lookup,direct)
+    np.testing.assert_array_equal(colorspace.rgb565_to_luma(frame),colorspace.rgb888_to_luma(*rgb))
+
+
+@pytest.mark.parametrize("pixel,lab,luma",[(0x0000,(0,0,0),0),(0xFFFF,(100,0,0),255),(0xF800,(53,80,67),75)])
+def test_known_colours(pixel,lab,luma):
+    frame = np.array([[pixel]],dtype=np.uint16)
+    assert tuple(int(c[0,0]) for c in colorspace.rgb565_to_lab(frame)) == lab
+    assert int(colorspace.rgb565_to_luma(frame)[0,0]) == luma
+
+
+def test_rgb565_round_trip():
+    frame = np.arange(65536,dtype=np.uint32).astype(np.uint16)
+    np.testing.assert_array_equal(colorspace.rgb888_to_rgb565(*colorspace.rgb565_to_rgb888(frame)),frame)
+
+
+def test_tables_are_cached(monkeypatch):
+    table = colorspace.lab_table()
+    path = colorspace.lut_path("lab")
+    assert os.path.exists(path)
+    assert colorspace.lab_table() is table
+
+    #A new process maps the saved table instead of rebuilding it
+    monkeypatch.setattr(colorspace,"_tables",{})
+    monkeypatch.setattr(colorspace,"build_table",lambda name: pytest.fail("table rebuilt"))
+    np.testing.assert_array_equal(colorspace.lab_table(),table)
+
+
+def test_bad_cache_is_rebuilt():
+    os.makedirs(colorspace.LUT_DIR)
+    np.save(colorspace.lut_path("yuv"),np.zeros((3,16),dtype=np.int16))
+    table = colorspace.yuv_table()
+    assert table.shape == (3,65536)
+    assert np.load(colorspace.lut_path("yuv")).shape == (3,65536)
+
+
+def test_unwritable_cache(tmp_path,monkeypatch):
+    blocker = tmp_path / "file"
+    blocker.write_bytes(b"")
+    monkeypatch.setattr(colorspace,"LUT_DIR",str(blocker / "luts"))
+    assert colorspace.lab_table().shape == (3,65536)
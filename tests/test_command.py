@@ -0,0 +1,77 @@
+import pytest
+
+from host.command import COMMANDS,PARAMS,encode_command
+from host.uart_decoder import FRAME_ACK,PacketDecoder,encode_frame
+
+
+def _decode(data):
+    return PacketDecoder().feed(data)
+
+
+def test_encode_set():
+    (frame,) = _decode(encode_command("set",["dwell_frames=5","decision_z=2.5"],seq=7))
+    assert frame.type == COMMANDS["set"]
+    assert frame.seq == 7
+    assert frame.count == 2
+    assert frame.values == (0,5,3,250)
+
+
+def test_encode_roi_and_thresh():
+    (frame,) = _decode(encode_command("roi",["1,2,3,4","5,6,7,8"]))
+    assert (frame.type,frame.count,frame.values) == (COMMANDS["roi"],2,(1,2,3,4,5,6,7,8))
+    (frame,) = _decode(encode_command("thresh",["44,100,70,-124,28,80"]))
+    assert frame.values == (44,100,70,0x10000-124,28,80)
+
+
+@pytest.mark.parametrize("name,args",[("set",["shutter=3"]),("set",["dwell_frames=0"]),
+                                      ("set",["dwell_frames=256"]),("set",["decision_z=20"]),
+                                      ("set",["stream_mode=2"]),("set",[]),("roi",["1,2,3"]),
+                                      ("thresh",["1,2,3,4,5"]),("pause",["now"])])
+def test_rejects_bad_commands(name,args):
+    with pytest.raises(ValueError):
+        encode_command(name,args)
+
+
+def test_params_match_the_camera(pipeline):
+    assert len(PARAMS) == len(pipeline.command_params)
+    for name,(index,scale,lo,hi) in PARAMS.items():
+        assert pipeline.command_params[index] == (name,scale,lo,hi)
+
+
+#Feed command bytes to the camera UART, returns the (type, seq, status) of every ack sent back
+def _run(mod,data,chunk=5):
+    mod.uart.tx.clear()
+    for k in range(0,len(data),chunk):
+        mod.uart.feed(data[k:k+chunk])
+        mod.poll_commands()
+    mod.uart_drain()
+    return [f.values for f in _decode(bytes(mod.uart.tx)) if f.type == FRAME_ACK]
+
+
+def test_camera_applies_set(pipeline):
+    mod = pipeline
+    acks = _run(mod,encode_command("set",["dwell_frames=5","decision_z=2.5"],seq=3))
+    assert acks == [(COMMANDS["set"],3,0)]
+    assert mod.dwell_frames == 5
+    assert mod.decision_z == 2.5
+    assert mod.z2_q == 100
+
+
+def test_camera_rejects_out_of_range_values(pipeline):
+    mod = pipeline
+    #Frames the host would refuse to encode: nothing is applied
+    data = encode_frame([0,500,3,250],seq=1,frame_type=COMMANDS["set"],count=2)
+    data += encode_frame([0],seq=2,frame_type=COMMANDS["set"],count=1)
+    data += encode_frame([],seq=3,frame_type=0x1F,count=0)
+    assert _run(mod,data) == [(COMMANDS["set"],1,2),(COMMANDS["set"],2,1),(0x1F,3,3)]
+    assert mod.dwell_frames == 3
+    assert mod.decision_z == 3.0
+
+
+def test_camera_pause_resume_and_noise(pipeline):
+    mod = pipeline
+    acks = _run(mod,b"\x00\xa5\x13" + encode_command("pause",[],seq=1) + b"\xa5" + encode_command("resume",[],seq=2))
+    assert acks == [(COMMANDS["pause"],1,0),(COMMANDS["resume"],2,0)]
+    assert not mod.paused
+    assert _run(mod,encode_command("pause",[],seq=4)) == [(COMMANDS["pause"],4,0)]
+    assert mod.paused
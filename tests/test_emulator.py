@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from host.emulator import load_script,replay,synthetic_frames
+from host.uart_decoder import FRAME_READING,PacketDecoder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _readings(module):
+    if hasattr(module,"uart_drain"):
+        module.uart_drain()
+    return [f for f in PacketDecoder().feed(bytes(module.uart.tx)) if f.type == FRAME_READING]
+
+
+@pytest.mark.parametrize("script,values_per_well",[("quad_sample_classifier.py",1),
+                                                   ("quad_sample_intensity.py",1),
+                                                   ("quad_sample_pipeline.py",3)])
+def test_replay_quad_scripts(script,values_per_well):
+    module = load_script(os.path.join(ROOT,script),synthetic_frames(12))
+    latencies = replay(module)
+    assert len(latencies) == 12
+    readings = _readings(module)
+    #Every well on every frame, one reading per dwell_frames
+    assert [f.seq for f in readings] == list(range(12//module.dwell_frames))
+    for frame in readings:
+        assert frame.count == 4
+        assert len(frame.values) == 4*values_per_well
+
+
+def test_replay_max_frames():
+    module = load_script(os.path.join(ROOT,"quad_sample_pipeline.py"),synthetic_frames(12))
+    assert len(replay(module,max_frames=5)) == 5
+    assert len(_readings(module)) == 1
+
+
+def test_replay_single_sample():
+    module = load_script(os.path.join(ROOT,"single_sample_classifier.py"),synthetic_frames(3))
+    assert len(replay(module)) == 3
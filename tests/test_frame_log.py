@@ -0,0 +1,149 @@
+import fcntl
+import os
+import struct
+import termios
+import threading
+
+import numpy as np
+import pytest
+
+from host import frame_log,uart_decoder
+from host.frame_log import FrameLog,FrameLogWriter,GRAYSCALE,HEADER,RGB565
+from host.uart_decoder import open_pty_pair
+
+
+def _frames(n,width,height,dtype):
+    rng = np.random.default_rng(7)
+    return [rng.integers(0,np.iinfo(dtype).max,(height,width),dtype=dtype) for _ in range(n)]
+
+
+@pytest.mark.parametrize("pixformat,dtype",[(RGB565,np.uint16),(GRAYSCALE,np.uint8)])
+def test_write_read(tmp_path,pixformat,dtype):
+    path = str(tmp_path / "frames.flog")
+    frames = _frames(5,16,8,dtype)
+    with FrameLogWriter(path,16,8,pixformat,metadata={"rois":[[0,0,4,4]]}) as writer:
+        for i,frame in enumerate(frames):
+            writer.write(frame,ticks_ms=100*i,exposure_us=i)
+
+    log = FrameLog(path)
+    assert len(log) == 5
+    assert log.metadata == {"rois":[[0,0,4,4]]}
+    for i,frame in enumerate(frames):
+        np.testing.assert_array_equal(log[i],frame)
+    assert list(log.records["index"]) == [0,1,2,3,4]
+    assert list(log.records["exposure_us"]) == [0,1,2,3,4]
+    assert len(log.time_slice(100,300)) == 2
+    log.close()
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    path = str(tmp_path / "frames.flog")
+    with FrameLogWriter(path,8,4) as writer:
+        for frame in _frames(3,8,4,np.uint16):
+            writer.write(frame)
+    os.truncate(path,os.path.getsize(path)-5)
+    log = FrameLog(path)
+    assert len(log) == 2
+    log.close()
+
+
+def test_write_rejects_wrong_shape(tmp_path):
+    with FrameLogWriter(str(tmp_path / "frames.flog"),8,4) as writer:
+        with pytest.raises(ValueError):
+            writer.write(np.zeros((8,4),dtype=np.uint16))
+
+
+def test_metadata_too_large():
+    with pytest.raises(ValueError):
+        frame_log.make_header(8,4,metadata={"note":"x"*300})
+
+
+#Header as frame_recorder.py would write it with a larger header_size
+def _header(width,height,header_size,metadata=b'{"source":"test"}'):
+    frame_bytes = width*height*2
+    header = bytearray(header_size)
+    HEADER.pack_into(header,0,frame_log.MAGIC,frame_log.VERSION,header_size,width,height,RGB565,0,0,
+                     frame_log.RECORD_HEAD.size+frame_bytes,frame_bytes)
+    header[HEADER.size:HEADER.size+len(metadata)] = metadata
+    return bytes(header)
+
+
+def _stream(frames,width,height,header_size):
+    stream = b"boot log\r\n" + _header(width,height,header_size)
+    for i,frame in enumerate(frames):
+        stream += frame_log.RECORD_HEAD.pack(frame_log.RECORD_MAGIC,i,10*i,0) + frame.astype("<u2").tobytes()
+    return stream
+
+
+#Run capture() on a pty fed with stream; close_after closes the port once everything is read
+def _capture(monkeypatch,tmp_path,stream,frames=None,close_after=False):
+    master,slave,path = open_pty_pair()
+    os.set_blocking(master,True)
+    done = threading.Event()
+    opened = threading.Event()
+    open_tty = uart_decoder.open_tty
+
+    #open_tty() flushes pending input, feed only once capture() has the port open
+    def open_and_signal(*args):
+        fd = open_tty(*args)
+        opened.set()
+        return fd
+    monkeypatch.setattr(uart_decoder,"open_tty",open_and_signal)
+
+    def feed():
+        opened.wait(5)
+        for k in range(0,len(stream),61):
+            os.write(master,stream[k:k+61])
+        if close_after:
+            #Let the reader drain the tty (pty input arrives asynchronously), then hang up
+            idle = 0
+            while(idle < 5 and not done.wait(0.02)):
+                idle = 0 if _pending(slave) else idle+1
+            os.close(master)
+
+    out = str(tmp_path / "capture.flog")
+    feeder = threading.Thread(target=feed,daemon=True)
+    feeder.start()
+    try:
+        count = frame_log.capture(path,out,frames=frames)
+    finally:
+        done.set()
+        feeder.join(5)
+        os.close(slave)
+        if not close_after:
+            os.close(master)
+    return count,out
+
+
+def _pending(fd):
+    return struct.unpack("i",fcntl.ioctl(fd,termios.FIONREAD,b"\0\0\0\0"))[0]
+
+
+@pytest.mark.parametrize("header_size",[frame_log.HEADER_SIZE,512])
+def test_capture(monkeypatch,tmp_path,header_size):
+    width,height = 8,4
+    frames = _frames(4,width,height,np.uint16)
+    count,out = _capture(monkeypatch,tmp_path,_stream(frames,width,height,header_size),frames=len(frames))
+
+    assert count == len(frames)
+    log = FrameLog(out)
+    assert log.info["header_size"] == header_size
+    assert log.metadata == {"source":"test"}
+    assert len(log) == len(frames)
+    for i,frame in enumerate(frames):
+        np.testing.assert_array_equal(log[i],frame)
+    log.close()
+
+
+def test_capture_until_end_of_stream(monkeypatch,tmp_path):
+    width,height = 8,4
+    frames = _frames(3,width,height,np.uint16)
+    #Open-ended capture, the stream ends in the middle of a fourth record
+    stream = _stream(frames,width,height,frame_log.HEADER_SIZE) + frame_log.RECORD_MAGIC + b"\0"*10
+    count,out = _capture(monkeypatch,tmp_path,stream,close_after=True)
+
+    assert count == 3
+    log = FrameLog(out)
+    assert len(log) == 3
+    np.testing.assert_array_equal(log[2],frames[2])
+    log.close()
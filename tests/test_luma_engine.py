@@ -0,0 +1,32 @@
+import numpy as np
+
+from host.colorspace import rgb565_to_luma
+from host.luma_engine import integral_image,roi_luma_stats
+
+ROIS = [(33,95,38,20),(106,95,38,20),(0,0,1,1),(0,0,320,240)]
+
+
+def test_integral_image():
+    channel = np.arange(12,dtype=np.float64).reshape(3,4)
+    table = integral_image(channel)
+    assert table.shape == (4,5)
+    assert table[0].sum() == table[:,0].sum() == 0
+    assert table[2,3] == channel[:2,:3].sum()
+    assert table[-1,-1] == channel.sum()
+
+
+def test_roi_stats_match_numpy():
+    frame = np.random.default_rng(5).integers(0,65536,size=(240,320),dtype=np.uint32).astype(np.uint16)
+    mean,var = roi_luma_stats(frame,ROIS,intensity_config=4)
+    luma = rgb565_to_luma(frame).astype(np.float64)
+    for k,(x,y,w,h) in enumerate(ROIS):
+        patch = luma[y:y+h,x:x+w]
+        np.testing.assert_allclose(mean[k],4*patch.mean(),rtol=1e-9)
+        np.testing.assert_allclose(var[k],16*patch.var(),rtol=1e-6,atol=1e-6)
+
+
+def test_precomputed_luma_and_flat_roi():
+    luma = np.full((240,320),100,dtype=np.uint8)
+    mean,var = roi_luma_stats(None,ROIS[:2],intensity_config=1,luma=luma)
+    np.testing.assert_array_equal(mean,[100,100])
+    np.testing.assert_array_equal(var,[0,0])
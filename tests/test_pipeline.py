@@ -0,0 +1,135 @@
+import math
+import statistics
+
+import pytest
+
+
+#Run the estimators of well i on frames (one tuple of metric values per frame)
+def _feed(mod,i,frames):
+    for values in frames:
+        for k,v in enumerate(values):
+            mod.well_value[i*mod.metric_num+k] = v
+        mod.update_estimators(i)
+
+
+def test_mean_and_standard_error(pipeline):
+    mod = pipeline
+    xs = [400,388,421,405,397,412,379,430]
+    _feed(mod,1,[(x,2*x,7) for x in xs])
+    j = 1*mod.metric_num
+    n = len(xs)
+    assert mod.well_samples[1] == n
+    assert mod.estimate(j) == math.floor(statistics.fmean(xs))
+    assert mod.estimate(j+1) == math.floor(statistics.fmean([2*x for x in xs]))
+    assert mod.estimate(j+2) == 7
+    assert mod.confidence(j) == pytest.approx(statistics.stdev(xs)/math.sqrt(n),abs=0.05)
+    assert mod.confidence(j+2) == 0
+
+
+def test_ema_and_median(pipeline):
+    mod = pipeline
+    xs = [100,100,400,100,100,100,700]
+    _feed(mod,0,[(x,0,0) for x in xs])
+    mod.estimator = "median"
+    assert mod.estimate(0) == statistics.median(xs[-mod.median_window:])
+    mod.estimator = "ema"
+    ema = xs[0]
+    for x in xs[1:]:
+        ema += mod.ema_alpha*(x-ema)
+    assert abs(mod.estimate(0)-ema) <= 1
+
+
+def test_values_are_clamped(pipeline):
+    mod = pipeline
+    _feed(mod,0,[(5000,0,0)]*3)
+    assert mod.estimate(0) == mod.value_max
+    assert mod.value_clamps == 3
+
+
+def test_bounds_keep_small_integers(pipeline):
+    mod = pipeline
+    #Worst case spread for a whole message: the sums stay small integers, the well is done
+    xs = [0,mod.value_max]*(mod.samples_max//2)+[0]
+    _feed(mod,2,[(x,0,0) for x in xs])
+    j = 2*mod.metric_num
+    assert mod.well_samples[2] == mod.samples_max
+    assert abs(mod.well_sq[j]) < 2**30 and abs(mod.well_sum[j]) < 2**30
+    assert mod.well_done(2,mod.dwell_frames)
+    assert mod.well_skip(2)
+    assert mod.confidence(j) == pytest.approx(statistics.stdev(xs)/math.sqrt(len(xs)),rel=1e-3)
+
+
+def test_reset_estimators(pipeline):
+    mod = pipeline
+    _feed(mod,0,[(10,0,0),(20,0,0)])
+    mod.reset_estimators()
+    assert mod.well_samples[0] == 0
+    assert mod.estimate(0) == 0
+    _feed(mod,0,[(30,0,0)])
+    assert mod.estimate(0) == 30
+
+
+#Early decision on the blob area of well i (other metrics held at 0)
+def _feed_calls(mod,i,xs):
+    for x in xs:
+        _feed(mod,i,[(x,0,0)])
+        mod.update_call(i)
+
+
+def test_early_decision_calls(pipeline):
+    mod = pipeline
+    mod.enable_early_decision = True
+    t = mod.decision_thresh
+    _feed_calls(mod,0,[t-150,t-148,t-152])
+    _feed_calls(mod,1,[t+150,t+152,t+148])
+    assert mod.well_call[0] == mod.call_positive
+    assert mod.well_call[1] == mod.call_negative
+    assert mod.well_done(0,mod.dwell_frames) and mod.well_skip(0)
+
+
+def test_early_decision_waits_for_min_frames_and_evidence(pipeline):
+    mod = pipeline
+    mod.enable_early_decision = True
+    t = mod.decision_thresh
+    _feed_calls(mod,0,[t-150,t-150])
+    assert mod.well_call[0] == 0
+    #Noisy well around the threshold: no call until it is forced on the mean
+    _feed_calls(mod,1,[t-40,t+60,t-50,t+45,t-10])
+    assert mod.well_call[1] == 0
+    assert not mod.well_done(1,mod.dwell_frames)
+    mod.force_call(1)
+    assert mod.well_call[1] == mod.call_negative
+    mod.reset_estimators(True)
+    assert list(mod.well_call) == [0]*mod.well_num
+
+
+def test_scheduler_gives_extra_frames_to_uncertain_wells(pipeline):
+    mod = pipeline
+    mod.enable_scheduler = True
+    mod.enable_early_decision = True
+    t = mod.decision_thresh
+    _feed(mod,0,[(t-150,0,0),(t-149,0,0)])
+    _feed(mod,1,[(t+150,0,0),(t+151,0,0)])
+    _feed(mod,2,[(t-30,0,0),(t+40,0,0)])
+    _feed(mod,3,[(t-150,0,0),(t-150,0,0)])
+    mod.well_call[3] = mod.call_positive
+    assert all(mod.well_done(i,mod.dwell_frames) for i in range(mod.well_num))
+
+    spare = mod.frame_budget-mod.sched_min_frames*mod.well_num
+    assert mod.schedule_extra()
+    #The well near the threshold takes the whole budget, the called well none
+    assert [a-mod.sched_min_frames for a in mod.well_alloc] == [0,0,spare,0]
+    assert mod.next_well(0) == 2
+    _feed(mod,2,[(t,0,0)]*spare)
+    assert mod.next_well(0) == mod.well_num
+
+
+def test_scheduler_without_spare_frames(pipeline):
+    mod = pipeline
+    mod.enable_scheduler = True
+    mod.frame_budget = mod.sched_min_frames*mod.well_num
+    for i in range(mod.well_num):
+        _feed(mod,i,[(10,0,0),(90,0,0)])
+    assert not mod.schedule_extra()
+    assert list(mod.well_alloc) == [mod.sched_min_frames]*mod.well_num
+    assert mod.next_well(0) == mod.well_num
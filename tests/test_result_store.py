@@ -0,0 +1,61 @@
+import calendar
+import os
+
+import numpy as np
+
+from host.result_store import BLOCK,DAY,ResultStore,ResultWriter
+
+T0 = calendar.timegm((2026,10,1,0,0,0))
+
+
+def _fill(store,n,step,devices=("bench01","bench02"),buffer_size=1000):
+    with ResultWriter(store,buffer_size=buffer_size) as writer:
+        for i in range(n):
+            writer.append(T0+i*step,devices[i % len(devices)],i % 4+1,blob_area=i,call="positive",seq=i)
+
+
+def test_append_query_across_days(tmp_path):
+    store = str(tmp_path)
+    n = 3*BLOCK
+    step = 3*DAY/n                  # three days, one BLOCK per day
+    _fill(store,n,step)
+    assert sorted(f for f in os.listdir(store) if f.endswith(".res")) == ["20261001.res","20261002.res","20261003.res"]
+
+    results = ResultStore(store)
+    assert len(results) == n
+    every = results.query()
+    assert len(every) == n
+    np.testing.assert_array_equal(every["seq"],np.arange(n))
+
+    #Range over the first day boundary, stop excluded
+    start,stop = T0+DAY-3600,T0+DAY+3600
+    r = results.query(start,stop)
+    t = T0+np.arange(n)*step
+    assert len(r) == np.count_nonzero((t >= start) & (t < stop))
+    assert r["t"].min() >= start and r["t"].max() < stop
+
+    #Filters
+    r = results.query(T0,T0+2*DAY,device="bench02",well=2)
+    assert len(r) and (r["device"] == results.devices["bench02"]).all() and (r["well"] == 2).all()
+    assert len(results.query(device="unknown")) == 0
+    assert len(results.query(T0+10*DAY,T0+11*DAY)) == 0
+
+
+def test_reopen_appends(tmp_path):
+    store = str(tmp_path)
+    _fill(store,BLOCK+10,1.0)
+    _fill(store,BLOCK+10,1.0,devices=("bench03",))
+    results = ResultStore(store)
+    assert len(results) == 2*(BLOCK+10)
+    assert set(results.devices) == {"bench01","bench02","bench03"}
+    assert len(results.query(T0,T0+5,device="bench03")) == 5
+
+
+def test_out_of_order_records(tmp_path):
+    store = str(tmp_path)
+    with ResultWriter(store) as writer:
+        for i in range(2*BLOCK):
+            #Records slightly out of order, across midnight
+            writer.append(T0+DAY-BLOCK+i+(5 if i % 2 else -5),"bench01",1)
+    r = ResultStore(store).query(T0+DAY-10,T0+DAY+10)
+    assert len(r) == 20
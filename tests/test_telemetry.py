@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from host.telemetry import FIELDS,STAGES,decode_telemetry,format_table,read_file
+from host.uart_decoder import FRAME_TELEMETRY,PacketDecoder,encode_frame
+
+
+def _frame(values,count,seq=0):
+    (frame,) = PacketDecoder().feed(encode_frame(values,seq,frame_type=FRAME_TELEMETRY,count=count))
+    return frame
+
+
+def test_decode_and_format():
+    values = []
+    for s in range(len(STAGES)+1):
+        values += [10*s,20*s,30*s,40*s]
+    stats = decode_telemetry(_frame(values,len(STAGES)+1))
+    assert list(stats) == list(STAGES)+["stage%d" % len(STAGES)]
+    assert stats["color"] == dict(zip(FIELDS,(10,20,30,40)))
+    table = format_table(5,stats)
+    assert table.startswith("telemetry #5")
+    assert "mean frame 0.14 ms" in table
+
+
+def test_decode_rejects_other_frames():
+    with pytest.raises(ValueError):
+        decode_telemetry(PacketDecoder().feed(encode_frame([1,2,3,4]))[0])
+    with pytest.raises(ValueError):
+        decode_telemetry(_frame([1,2,3],1))
+
+
+def test_read_file_skips_readings(tmp_path):
+    path = tmp_path / "uart.bin"
+    path.write_bytes(encode_frame([5,6,7,8],seq=1) + _frame_bytes(2) + b"noise" + _frame_bytes(3))
+    frames,skipped,decoder = read_file(str(path))
+    assert [f.seq for f in frames] == [2,3]
+    assert skipped == 1
+    assert decoder.crc_errors == 0
+
+
+def _frame_bytes(seq):
+    return encode_frame(list(range(4*len(STAGES))),seq,frame_type=FRAME_TELEMETRY,count=len(STAGES))
+
+
+#Stage times of the camera ring buffer: min / mean / nearest-rank p99 / max
+@pytest.mark.parametrize("frames,pos",[(100,100),(128,5)])
+def test_camera_stage_summary(pipeline,frames,pos):
+    mod = pipeline
+    rng = random.Random(frames)
+    times = [rng.randrange(1,5000) for _ in range(frames)]
+    for a,x in enumerate(times):
+        mod.prof_ring[mod.stage_color*mod.profile_window+a] = x
+    mod.prof_count,mod.prof_pos = frames,pos
+    if(pos < frames):
+        #Slot of the running frame
+        times.pop(pos)
+    mod.stage_summary(mod.stage_color,0)
+    ranked = sorted(times)
+    p99 = ranked[-(len(ranked)-(99*len(ranked)+99)//100+1)]
+    assert list(mod.telemetry_values[:4]) == [ranked[0],sum(times)//len(times),p99,ranked[-1]]
+
+
+def test_camera_sends_telemetry(pipeline):
+    mod = pipeline
+    mod.enable_profiler = True
+    for _ in range(3):
+        mod.step()
+    mod.uart_drain()
+    mod.uart.tx.clear()
+    mod.send_telemetry()
+    mod.uart_drain()
+    (frame,) = PacketDecoder().feed(bytes(mod.uart.tx))
+    stats = decode_telemetry(frame)
+    assert list(stats) == list(STAGES)
+    for row in stats.values():
+        assert row["min"] <= row["mean"] <= row["max"]
+        assert row["min"] <= row["p99"] <= row["max"]
+    assert stats["frame"]["max"] >= stats["snapshot"]["max"]
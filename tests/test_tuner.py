@@ -0,0 +1,95 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pytest
+
+from host import classify,tuner
+
+PALE = 0xABCC      # LAB (56, 18, 20): just below the B range of the default chemical_thresh
+
+
+#Frames and labels in the working directory (relative sources keep the holdout split fixed)
+@pytest.fixture
+def labels(tmp_path,monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return _write_labels(LAYOUTS)
+
+
+def _write_labels(layouts):
+    rows = []
+    for k,wells in enumerate(layouts):
+        frame = np.zeros((240,320),dtype=np.uint16)
+        for i in wells:
+            x,y,w,h = classify.QUAD_CONFIG["well_rois"][i]
+            frame[y+4:y+h-4,x+4:x+w-4] = PALE
+        path = "frame%d.npy" % k
+        np.save(path,frame)
+        rows += [{"source":path,"frame":0,"well":i+1,"label":"negative" if i in wells else "positive"}
+                 for i in range(4)]
+    with open("labels.csv","w",newline="") as f:
+        writer = csv.DictWriter(f,fieldnames=["source","frame","well","label"])
+        writer.writeheader()
+        writer.writerows(rows)
+    return "labels.csv"
+
+
+LAYOUTS = [[0],[1,2],[3],[0,1,2,3],[],[2],[0,3],[1]]
+
+
+def test_best_area_cut():
+    areas = np.array([0,10,300,500,40])
+    negative = np.array([False,False,True,True,False])
+    correct,cut = tuner.best_area_cut(areas,negative)
+    assert correct == 5
+    assert 40 < cut <= 300
+    correct,_ = tuner.best_area_cut(np.array([5,5]),np.array([True,False]))
+    assert correct == 1
+
+
+def test_vector_round_trip():
+    config = classify.load_config("single")
+    vector = tuner.get_vector(config,"single")
+    assert len(vector) == len(tuner.params("single")) == 16
+    changed = tuner.set_vector(config,"single",[v+1 for v in vector])
+    assert tuner.get_vector(changed,"single") == tuple(v+1 for v in vector)
+    assert tuner.get_vector(config,"single") == vector
+
+
+def test_search_finds_the_optimum():
+    target = (30,90,-20,60,10,70)
+    evaluate = lambda vectors: [(-sum(abs(a-b) for a,b in zip(v,target)),None) for v in vectors]
+    search = tuner.Search("quad",evaluate)
+    start = tuner.get_vector(classify.QUAD_CONFIG,"quad")
+    assert search.descend(search.grid(start,8),8) == target
+
+
+@pytest.mark.parametrize("workers",[1,2])
+def test_tune_quad(labels,workers):
+    result,report = tuner.tune(labels,"quad",cache_dir="cache",workers=workers,step=8)
+    assert report["samples"] == 4*len(LAYOUTS)
+    assert report["start_accuracy"] < 1.0
+    assert report["best_accuracy"] == 1.0
+    assert result["chemical_thresh"][0][4] <= 20
+    assert 0 < result["area_thresh_n"] <= (38-8)*(30-8)
+
+    #The tuned config classifies the labeled frames
+    for k,wells in enumerate(LAYOUTS):
+        frame = np.load("frame%d.npy" % k)
+        calls = [r["call"] for r in classify.classify_quad(frame,result)]
+        assert calls == ["negative" if i in wells else "positive" for i in range(4)]
+
+
+def test_cache_is_reused_and_holdout(labels):
+    cache = "cache"
+    tuner.tune(labels,"quad",cache_dir=cache,workers=1)
+    stamp = os.path.getmtime(os.path.join(cache,"lab.npy"))
+    _,report = tuner.tune(labels,"quad",cache_dir=cache,workers=1,holdout=0.5)
+    assert os.path.getmtime(os.path.join(cache,"lab.npy")) == stamp
+    assert 0 < report["holdout"] < report["samples"]
+    assert report["train"]+report["holdout"] == report["samples"]
+    with open(os.path.join(cache,"meta.json")) as f:
+        assert json.load(f)["samples"] == report["samples"]
+    with pytest.raises(ValueError):
+        tuner.tune(labels,"quad",cache_dir=cache,workers=1,holdout=1.0)
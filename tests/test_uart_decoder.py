@@ -0,0 +1,96 @@
+from host.uart_decoder import FRAME_ACK,FRAME_READING,PacketDecoder,encode_ascii,encode_frame
+
+
+def _feed(decoder,data,chunk):
+    frames = []
+    for k in range(0,len(data),chunk):
+        frames += decoder.feed(data[k:k+chunk])
+    return frames
+
+
+def test_binary_round_trip():
+    readings = [[i,2*i,0xFFFF,0] for i in range(50)]
+    stream = b"".join(encode_frame(v,seq=i) for i,v in enumerate(readings))
+    for chunk in (1,7,len(stream)):
+        decoder = PacketDecoder()
+        frames = _feed(decoder,stream,chunk)
+        assert [f.values for f in frames] == [tuple(v) for v in readings]
+        assert [f.seq for f in frames] == list(range(50))
+        assert all(f.type == FRAME_READING and f.count == 4 for f in frames)
+        assert decoder.crc_errors == decoder.resyncs == decoder.dropped == 0
+
+
+def test_frame_types_and_records():
+    decoder = PacketDecoder()
+    frames = decoder.feed(encode_frame([1,2,3,4,5,6],seq=3,count=2) + encode_frame([0x10,1],frame_type=FRAME_ACK))
+    assert frames[0].count == 2 and frames[0].values == (1,2,3,4,5,6)
+    assert frames[1].type == FRAME_ACK and frames[1].values == (0x10,1)
+
+
+def test_ascii_round_trip():
+    decoder = PacketDecoder(ascii_wells=4)
+    frames = decoder.feed(b"".join(encode_ascii([12,345,6789,0]) + encode_ascii([1,2,3,4])))
+    assert [f.values for f in frames] == [(12,345,6789,0),(1,2,3,4)]
+
+
+def test_ascii_learns_package_count():
+    readings = [[100*r+k for k in range(12)] for r in range(3)]
+    stream = b"".join(b"".join(encode_ascii(v)) for v in readings)
+    for chunk in (1,11,len(stream)):
+        decoder = PacketDecoder()
+        frames = _feed(decoder,stream,chunk)
+        assert [f.values for f in frames] == [tuple(v) for v in readings]
+        assert decoder.ascii_packages == 6
+        assert decoder.dropped == 0
+
+
+def test_ascii_explicit_well_count():
+    values = list(range(1,25))
+    decoder = PacketDecoder(ascii_wells=24)
+    frames = decoder.feed(b"".join(encode_ascii(values)))
+    assert [f.values for f in frames] == [tuple(values)]
+
+
+def test_ascii_mid_stream_start_and_relearn():
+    first = encode_ascii(list(range(12)))
+    decoder = PacketDecoder()
+    #Joined in the middle of a reading: packages before the first package 1 are skipped
+    frames = decoder.feed(b"".join(first[3:] + first + first))
+    assert [f.values for f in frames] == [tuple(range(12))]*2
+
+    #A longer reading (more wells configured) is learned again
+    longer = encode_ascii(list(range(16)))
+    frames = decoder.feed(b"".join(longer*3))
+    assert frames[-1].values == tuple(range(16))
+    assert decoder.ascii_packages == 8
+
+
+def test_resync_on_corrupted_byte():
+    frames = [encode_frame([i,i+1,i+2,i+3],seq=i) for i in range(4)]
+    bad = bytearray(frames[1])
+    bad[10] ^= 0xFF
+    decoder = PacketDecoder()
+    out = decoder.feed(frames[0] + bytes(bad) + frames[2] + frames[3])
+    assert [f.seq for f in out] == [0,2,3]
+    assert decoder.crc_errors == 1
+    assert decoder.dropped == 1
+
+
+def test_resync_on_noise():
+    #Noise holding sync bytes, ASCII markers and a truncated frame between valid frames
+    noise = b"\xa5\x00A12\xa5\x5a\x07" + encode_frame([9,9])[:7] + b"A9zzzzzzzzB\xa5"
+    frames = [encode_frame([i]*4,seq=i) for i in range(3)]
+    stream = frames[0] + noise + frames[1] + noise + frames[2]
+    for chunk in (1,5,len(stream)):
+        decoder = PacketDecoder()
+        out = _feed(decoder,stream,chunk)
+        assert [f.values for f in out] == [(0,)*4,(1,)*4,(2,)*4]
+        assert decoder.resyncs > 0
+        assert decoder.dropped == 0
+
+
+def test_split_sync_byte():
+    frame = encode_frame([1,2,3,4])
+    decoder = PacketDecoder()
+    assert decoder.feed(b"junk" + frame[:1]) == []
+    assert [f.values for f in decoder.feed(frame[1:])] == [(1,2,3,4)]